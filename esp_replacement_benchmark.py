@@ -0,0 +1,405 @@
+## esp_replacement_benchmark.py(7つ目)
+
+"""
+置換処理(orchestrate_comprehensive_esperanto_text_replacement / parallel_process)の速度を
+出力形式・入力の大きさ・プロセス数ごとに計測するベンチマーク。
+
+入力には、同梱の PEJVO の語根リスト(E_stem_with_Part_Of_Speech_list)から作った
+合成のエスペラント文を使う (乱数の種を固定すれば毎回同じ文になる)。
+結果は表として表示するほか、JSON / CSV に書き出して、変更の前後で比較できるようにする。
+
+置換用JSONは出力形式ごとに別のもの (その形式で生成したもの) を使う。
+1つの置換用JSONを全ての形式に使い回すと、形式ごとの違いを何も計測しないことになるため。
+
+【使い方】
+  python esp_replacement_benchmark.py (--rule-set-dir <ディレクトリ> | --format-json <出力形式>=<置換用JSON> ...)
+                                      [--sizes 10000,100000,1000000] [--processes 1,2,4]
+                                      [--formats all] [--repeat 3] [--json-out 結果.json] [--csv-out 結果.csv]
+  --format-json で置換用JSONを指定しなかった出力形式は、--rule-set-dir の中の
+  esp_replacement_json_build_cli.py と同じ名前の置換用JSONを使う。そこに無い形式は、
+  同梱の CSV・ユーザー設定 JSON から (JSON生成ページと同じ処理で) 計測の前に生成しておく。
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import platform
+import argparse
+import statistics
+import multiprocessing
+from typing import List, Dict, Tuple, Optional, Sequence
+
+from esp_text_replacement_module import (
+    orchestrate_comprehensive_esperanto_text_replacement,
+    parallel_process
+)
+from esp_replacement_binary_module import (
+    load_replacements_lists_preferring_compiled,
+    compute_file_sha256
+)
+from esp_replacement_constants import (
+    DATA_DIR,
+    FORMAT_TYPES
+)
+
+#=================================================================
+# 1) 既定の設定
+#=================================================================
+DEFAULT_STEM_LIST_FILE = os.path.join(
+    DATA_DIR,
+    "PEJVO(世界语全部单词列表)'全部'について、词尾(a,i,u,e,o,n等)をcutし、comma(,)で隔てて词性と併せて记录した列表(E_stem_with_Part_Of_Speech_list).json"
+)
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_PROCESS_COUNTS = (1, 2, 4)
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 0
+
+# 品詞ごとに付ける語尾 (語根リストは語尾を切ってあるので、文にするときに付け直す)
+ENDINGS_BY_PART_OF_SPEECH = {
+    "名词": ("o", "o", "oj", "on", "ojn"),
+    "形容词": ("a", "a", "aj", "an", "ajn"),
+    "动词": ("as", "is", "os", "i", "u", "us"),
+    "副词": ("e",),
+}
+# 2文字語根の置換も計測に含まれるよう、よく使う短い語を混ぜる
+FUNCTION_WORDS = (
+    "la", "la", "la", "kaj", "de", "en", "al", "mi", "vi", "li", "ŝi", "ĝi", "ni", "ili",
+    "ne", "se", "ke", "ĉu", "aŭ", "da", "je", "po", "tre", "pri", "por", "kun", "el", "ĉe",
+)
+RESULT_FIELDS = (
+    "format_type", "size_chars", "num_processes", "function", "repeat",
+    "min_seconds", "median_seconds", "mean_seconds", "chars_per_second", "output_chars", "rule_set_sha256",
+)
+
+#=================================================================
+# 2) 合成コーパス
+#=================================================================
+def load_corpus_words(stem_list_path: str = DEFAULT_STEM_LIST_FILE) -> List[str]:
+    """
+    語根リスト([語根, 品詞] のリスト)から、語尾を付けた単語のリストを作る
+    (ENDINGS_BY_PART_OF_SPEECH の語尾をすべて付ける。重複している語尾ほど多く現れる)。
+    語根の '/' (語根の区切り) は取り除く。品詞の無い語根・無詞はそのまま使う。
+    """
+    with open(stem_list_path, "r", encoding="utf-8") as f:
+        stems = json.load(f)
+    words = []
+    for item in stems:
+        stem = item[0].replace("/", "")
+        endings = ENDINGS_BY_PART_OF_SPEECH.get(item[1]) if len(item) > 1 else None
+        if endings:
+            words.extend(stem + ending for ending in endings)
+        else:
+            words.append(stem)
+    return words
+
+def generate_synthetic_corpus(words: Sequence[str], n_chars: int, seed: int = DEFAULT_SEED,
+                              marker_ratio: float = 0.01) -> str:
+    """
+    words から単語を無作為に選んで n_chars 文字程度のエスペラント文を作る。
+    文頭の大文字・句読点・段落の改行のほか、marker_ratio の割合で %...% (置換しない部分) と
+    @...@ (局所置換) を混ぜる。seed が同じなら同じ文を返す。
+    """
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    total = 0
+    while total < n_chars:
+        sentences = []
+        for _ in range(rng.randint(2, 6)):
+            tokens = []
+            for i in range(rng.randint(4, 16)):
+                word = rng.choice(FUNCTION_WORDS) if rng.random() < 0.3 else rng.choice(words)
+                r = rng.random()
+                if r < marker_ratio and len(word) <= 48:
+                    word = "%" + word + "%"
+                elif r < 2 * marker_ratio and len(word) <= 16:
+                    word = "@" + word + "@"
+                if i == 0:
+                    word = word[:1].upper() + word[1:]
+                tokens.append(word)
+            sentence = " ".join(tokens)
+            sentence += rng.choice((".", ".", ".", ",", "!", "?"))
+            sentences.append(sentence)
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 1
+    return "\n".join(paragraphs)[:n_chars]
+
+#=================================================================
+# 3) 計測
+#=================================================================
+def time_conversion(
+    text: str,
+    num_processes: int,
+    rules: Tuple[list, list, list],
+    format_type: str,
+    repeat: int = DEFAULT_REPEAT,
+    rule_set_key: Optional[str] = None
+) -> Dict[str, object]:
+    """
+    text の置換を repeat 回計測する。num_processes が 1 なら
+    orchestrate_comprehensive_esperanto_text_replacement、2 以上なら parallel_process を使う。
+    計測の前に1回だけ実行しておく (照合器の構築・ワーカープールの起動を計測に含めないため)。
+    """
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = rules
+
+    if num_processes <= 1:
+        def run() -> str:
+            return orchestrate_comprehensive_esperanto_text_replacement(
+                text,
+                replacements_list_for_localized_string,
+                replacements_final_list,
+                replacements_list_for_2char,
+                format_type
+            )
+        function = "orchestrate_comprehensive_esperanto_text_replacement"
+    else:
+        def run() -> str:
+            return parallel_process(
+                text,
+                num_processes,
+                replacements_list_for_localized_string,
+                replacements_final_list,
+                replacements_list_for_2char,
+                format_type,
+                rule_set_key=rule_set_key
+            )
+        function = "parallel_process"
+
+    output = run()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    return {
+        "format_type": format_type,
+        "size_chars": len(text),
+        "num_processes": max(num_processes, 1),
+        "function": function,
+        "repeat": repeat,
+        "min_seconds": best,
+        "median_seconds": statistics.median(seconds),
+        "mean_seconds": statistics.fmean(seconds),
+        "chars_per_second": len(text) / best if best > 0 else float("inf"),
+        "output_chars": len(output),
+    }
+
+def run_benchmark(
+    format_json_paths: Dict[str, str],
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    process_counts: Sequence[int] = DEFAULT_PROCESS_COUNTS,
+    repeat: int = DEFAULT_REPEAT,
+    seed: int = DEFAULT_SEED,
+    stem_list_path: str = DEFAULT_STEM_LIST_FILE,
+    progress=None,
+    write_compiled: bool = False
+) -> List[Dict[str, object]]:
+    """
+    format_json_paths (出力形式 → 置換用JSON) の各出力形式について、
+    sizes の大きさの合成コーパスを process_counts のプロセス数で置換する時間を計測し、
+    結果(1条件1件の辞書)のリストを返す。progress には結果を1件ずつ受け取る関数を渡せる。
+    write_compiled=True なら、置換用JSONの隣の .esprules が無い・古い場合に作り直す。
+    """
+    missing = [f"{format_type}: {json_path}" for format_type, json_path in format_json_paths.items()
+               if not os.path.isfile(json_path)]
+    if missing:
+        raise FileNotFoundError("置換用JSONが見つかりません (" + ", ".join(missing) + ")")
+    words = load_corpus_words(stem_list_path)
+    corpora = {size: generate_synthetic_corpus(words, size, seed) for size in sizes}
+
+    # 同じ置換用JSONは1回だけ読み込む
+    loaded: Dict[str, Tuple[Tuple[list, list, list], str]] = {}
+    results = []
+    for format_type, json_path in format_json_paths.items():
+        if json_path not in loaded:
+            loaded[json_path] = (
+                load_replacements_lists_preferring_compiled(json_path, refresh_compiled=write_compiled),
+                compute_file_sha256(json_path)
+            )
+        rules, rule_set_key = loaded[json_path]
+        for size in sizes:
+            for num_processes in process_counts:
+                result = time_conversion(corpora[size], num_processes, rules,
+                                         format_type, repeat, rule_set_key)
+                result["rule_set_sha256"] = rule_set_key
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    return results
+
+#=================================================================
+# 3-2) 出力形式ごとの置換用JSON
+#=================================================================
+def resolve_format_json_paths(format_types: Sequence[str], format_json_paths: Dict[str, str],
+                           rule_set_dir: Optional[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    各出力形式の置換用JSONを決める。format_json_paths (明示的な指定) を優先し、
+    無ければ rule_set_dir の中の、生成コマンドラインと同じ名前のファイルを使う。
+    戻り値は (出力形式 → 置換用JSON, rule_set_dir に置換用JSONが無い出力形式のリスト)。
+    """
+    from esp_replacement_json_build_cli import replacement_json_file_name
+    paths = {}
+    missing = []
+    for format_type in format_types:
+        if format_type in format_json_paths:
+            paths[format_type] = format_json_paths[format_type]
+        elif rule_set_dir is not None:
+            paths[format_type] = os.path.join(rule_set_dir, replacement_json_file_name(format_type))
+            if not os.path.isfile(paths[format_type]):
+                missing.append(format_type)
+        else:
+            missing.append(format_type)
+    return paths, missing
+
+def build_rule_sets(format_types: Sequence[str], rule_set_dir: str, num_processes: int = 1,
+                    progress=None) -> None:
+    """
+    同梱の CSV・ユーザー設定 JSON から format_types の置換用JSONを rule_set_dir に生成する
+    (esp_replacement_json_build_cli.py と同じ処理)。progress には生成結果を1件ずつ受け取る関数を渡せる。
+    """
+    # JSON の生成処理 (pandas 等) は、生成が必要なときだけ読み込む
+    from esp_replacement_json_build_cli import build_format_variants, load_build_inputs
+    from esp_replacement_json_build_pipeline import (
+        DEFAULT_CSV_FILE,
+        DEFAULT_STEMMING_JSON_FILE,
+        DEFAULT_REPLACEMENT_JSON_FILE
+    )
+    os.makedirs(rule_set_dir, exist_ok=True)
+    inputs = load_build_inputs(DEFAULT_CSV_FILE, DEFAULT_STEMMING_JSON_FILE, DEFAULT_REPLACEMENT_JSON_FILE)
+    for result in build_format_variants(list(format_types), rule_set_dir, inputs, num_processes=num_processes):
+        if progress is not None:
+            progress(result)
+
+#=================================================================
+# 4) 結果の書き出し
+#=================================================================
+def benchmark_environment() -> Dict[str, object]:
+    """計測した環境の情報 (結果を比べるときに、同じ環境かどうかを確かめるため)"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+def write_results_json(results: List[Dict[str, object]], output_path: str,
+                       settings: Optional[Dict[str, object]] = None) -> None:
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "environment": benchmark_environment(),
+            "settings": settings or {},
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+
+def write_results_csv(results: List[Dict[str, object]], output_path: str) -> None:
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow({field: result.get(field) for field in RESULT_FIELDS})
+
+def format_result_line(result: Dict[str, object]) -> str:
+    return (f"{result['format_type']:<32} {result['size_chars']:>9} chars "
+            f"x{result['num_processes']:<2} {result['min_seconds']:>9.3f} s "
+            f"(median {result['median_seconds']:.3f} s) {result['chars_per_second']:>12,.0f} chars/s")
+
+#=================================================================
+# 5) コマンドライン
+#=================================================================
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="置換処理の速度を、出力形式・入力の大きさ・プロセス数ごとに計測する"
+    )
+    parser.add_argument("--format-json", action="append", default=[], metavar="FORMAT=PATH",
+                        help="出力形式ごとの置換用JSON (繰り返し指定できる)")
+    parser.add_argument("--rule-set-dir", default=None,
+                        help="出力形式ごとの置換用JSONを置くディレクトリ (無い形式は計測の前に生成する)")
+    parser.add_argument("--build-processes", type=int, default=os.cpu_count() or 1,
+                        help="--rule-set-dir に置換用JSONを生成するときのプロセス数")
+    parser.add_argument("--write-compiled", action="store_true",
+                        help="置換用JSONと同じ場所にコンパイル済みファイル(.esprules)を作り、次回の読み込みを速くする")
+    parser.add_argument("--formats", default="all",
+                        help="計測する出力形式 (カンマ区切り、all なら7種類すべて)")
+    parser.add_argument("--sizes", type=parse_int_list, default=list(DEFAULT_SIZES),
+                        help="合成コーパスの文字数 (カンマ区切り)")
+    parser.add_argument("--processes", type=parse_int_list, default=list(DEFAULT_PROCESS_COUNTS),
+                        help="プロセス数 (カンマ区切り。1 は並列化しない)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="1条件あたりの計測回数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成コーパスの乱数の種")
+    parser.add_argument("--stem-list", default=DEFAULT_STEM_LIST_FILE,
+                        help="合成コーパスに使う語根リスト (E_stem_with_Part_Of_Speech_list)")
+    parser.add_argument("--json-out", default=None, help="結果を書き出す JSON ファイル")
+    parser.add_argument("--csv-out", default=None, help="結果を書き出す CSV ファイル")
+    args = parser.parse_args(argv)
+
+    format_types = FORMAT_TYPES if args.formats == "all" else [f for f in args.formats.split(",") if f]
+    unknown = [f for f in format_types if f not in FORMAT_TYPES]
+    if unknown:
+        parser.error(f"未知の出力形式です: {', '.join(unknown)}")
+    explicit_json_paths = {}
+    for item in args.format_json:
+        format_type, sep, path = item.partition("=")
+        if not sep or format_type not in FORMAT_TYPES:
+            parser.error(f"--format-json は <出力形式>=<置換用JSON> の形で指定してください: {item}")
+        if not os.path.isfile(path):
+            parser.error(f"{format_type} の置換用JSONが見つかりません: {path}")
+        explicit_json_paths[format_type] = path
+
+    format_json_paths, missing = resolve_format_json_paths(format_types, explicit_json_paths, args.rule_set_dir)
+    if missing and args.rule_set_dir is None:
+        parser.error(
+            "次の出力形式の置換用JSONが指定されていません: " + ", ".join(missing) + "\n"
+            "  --format-json <出力形式>=<置換用JSON> で形式ごとに指定するか、"
+            "--rule-set-dir <ディレクトリ> を指定してください (無い形式はそこに生成します)。"
+        )
+    shared_paths = [path for path in set(format_json_paths.values())
+                    if list(format_json_paths.values()).count(path) > 1]
+    if shared_paths:
+        print("[注意] 複数の出力形式に同じ置換用JSONを指定しています (形式ごとの違いは計測されません): "
+              + ", ".join(shared_paths), file=sys.stderr)
+    if missing:
+        print(f"[生成] 置換用JSONの無い {len(missing)} 形式を '{args.rule_set_dir}' に生成します。", flush=True)
+        build_rule_sets(
+            missing, args.rule_set_dir, num_processes=args.build_processes,
+            progress=lambda result: print(f"[生成] {result['format_type']}: {result['total_seconds']:.2f} s "
+                                          f"→ '{result['output_path']}'", flush=True)
+        )
+
+    results = run_benchmark(
+        format_json_paths,
+        sizes=args.sizes,
+        process_counts=args.processes,
+        repeat=args.repeat,
+        seed=args.seed,
+        stem_list_path=args.stem_list,
+        progress=lambda result: print(format_result_line(result), flush=True),
+        write_compiled=args.write_compiled
+    )
+    settings = {
+        "format_json_paths": format_json_paths,
+        "rule_set_dir": args.rule_set_dir,
+        "sizes": args.sizes,
+        "processes": args.processes,
+        "repeat": args.repeat,
+        "seed": args.seed,
+    }
+    if args.json_out:
+        write_results_json(results, args.json_out, settings)
+        print(f"[完了] 結果を '{args.json_out}' に保存しました。")
+    if args.csv_out:
+        write_results_csv(results, args.csv_out)
+        print(f"[完了] 結果を '{args.csv_out}' に保存しました。")
+    return 0
+
+
+if __name__ == '__main__':
+    # Windows などでマルチプロセスを正常に動かすため
+    multiprocessing.set_start_method('spawn', force=True)
+    sys.exit(main())
@@ -0,0 +1,563 @@
+## esp_replacement_binary_module.py(5つ目)
+
+"""
+置換用JSON(合并3个JSON文件)を、起動時にすぐ読み込める
+コンパイル済みファイル(.esprules)に変換・読み込みするモジュール。
+
+50MB 程度の JSON を json.load すると毎回数秒かかるため、
+3つのリストと大域置換用の照合器の付帯情報を、パースの要らない形で保存しておく。
+
+【ファイル形式 (バージョン1) / pickle は使わない】
+  先頭 8 バイト : MAGIC (b"ESPRULE\\x00")
+  次の 4 バイト : ヘッダ(JSON, UTF-8)のバイト数 (little endian uint32)
+  ヘッダ        : バージョン、元JSONの sha256・サイズ・更新時刻、
+                  各リストの件数と各列(old/new/placeholder)の本体内の位置、照合器の付帯情報
+  本体          : 列ごとに
+                    - 文字列を '\\x00' 区切りで連結した UTF-8 バイト列 (文字列表)
+                    - 各文字列の開始位置(バイト単位)を並べた uint32 配列 (件数+1 個, オフセット配列)
+                  old 列だけは読み込み時に decode → split して照合器の辞書を作り、
+                  new/placeholder 列はバイト列のまま保持して、必要な要素だけをオフセットで切り出して decode する。
+
+同じ形式のバイト列は multiprocessing.shared_memory にも置ける (SharedRuleSet)。
+並列処理では親プロセスが1回だけ書き込み、各ワーカーは共有メモリの名前だけを受け取って
+コピーせずに参照する (attach_shared_rule_set)。
+
+アプリ(main.py)では、3つのリストと照合器をまとめた CompiledRuleSet を
+JSON の内容ハッシュごとに1回だけ作り、セッションをまたいで使い回す。
+アップロードされたJSONは、メモリ上限付きの RuleSetCache に内容ハッシュごとに保持する。
+
+【使い方】
+  python esp_replacement_binary_module.py <置換用JSON> [-o <出力先.esprules>]
+"""
+
+import os
+import io
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from collections.abc import Sequence
+from typing import List, Tuple, Dict, Optional, Callable
+
+from esp_text_replacement_module import (
+    build_multi_pattern_matcher,
+    register_multi_pattern_matcher,
+    get_multi_pattern_matcher,
+    get_two_char_root_matcher,
+    register_two_char_root_matcher
+)
+
+#=================================================================
+# 1) 定数 (JSON のキー名・ファイル形式)
+#=================================================================
+REPLACEMENTS_FINAL_LIST_KEY = "全域替换用のリスト(列表)型配列(replacements_final_list)"
+REPLACEMENTS_LIST_FOR_LOCALIZED_STRING_KEY = "局部文字替换用のリスト(列表)型配列(replacements_list_for_localized_string)"
+REPLACEMENTS_LIST_FOR_2CHAR_KEY = "二文字词根替换用のリスト(列表)型配列(replacements_list_for_2char)"
+# ロード結果のタプルの並び順 (main.py の load_replacements_lists と同じ)
+REPLACEMENT_LIST_KEYS = (
+    REPLACEMENTS_FINAL_LIST_KEY,
+    REPLACEMENTS_LIST_FOR_LOCALIZED_STRING_KEY,
+    REPLACEMENTS_LIST_FOR_2CHAR_KEY,
+)
+
+COMPILED_RULE_SET_MAGIC = b"ESPRULE\x00"
+COMPILED_RULE_SET_VERSION = 1
+COMPILED_RULE_SET_SUFFIX = ".esprules"
+_SEPARATOR = "\x00"
+
+#=================================================================
+# 2) 補助関数
+#=================================================================
+def compute_file_sha256(path: str) -> str:
+    """ファイル内容の sha256 (16進文字列) を返す。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compiled_rule_set_path(json_path: str) -> str:
+    """置換用JSONに対応するコンパイル済みファイルの既定のパス(拡張子だけ .esprules に変えたもの)"""
+    return os.path.splitext(json_path)[0] + COMPILED_RULE_SET_SUFFIX
+
+def _source_info(json_path: str) -> Dict[str, object]:
+    stat = os.stat(json_path)
+    return {
+        "sha256": compute_file_sha256(json_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+#=================================================================
+# 2-2) 読み込んだリストの入れ物
+#=================================================================
+def _byteswapped(values: array) -> array:
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped
+
+class CompiledRuleList(Sequence):
+    """
+    コンパイル済みファイルから読み込んだ (old, new, placeholder) のリスト。
+    通常のリストと同じく添字アクセス・反復ができる(読み取り専用)。
+    列ごとに「UTF-8 の連結バイト列 + オフセット配列」で持ち、要素は参照されたときに切り出す。
+    バイト列・オフセット配列は bytes/array のほか、共有メモリ上の memoryview でもよい。
+    pickle すると通常のリストになる(multiprocessing で子プロセスに渡す場合など)。
+    """
+    def __init__(self, count: int, columns: List[Tuple[bytes, array]]):
+        self._count = count
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("CompiledRuleList index out of range")
+        return tuple(str(data[offsets[index]:offsets[index + 1] - 1], "utf-8") for data, offsets in self._columns)
+
+    def __iter__(self):
+        if self._count == 0:
+            return iter(())
+        return zip(*(self.column(col) for col in range(len(self._columns))))
+
+    def column(self, col: int) -> List[str]:
+        """指定した列(0: old, 1: new, 2: placeholder)の文字列をまとめてリストで返す。"""
+        if self._count == 0:
+            return []
+        return str(self._columns[col][0], "utf-8").split(_SEPARATOR)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+#=================================================================
+# 3) 書き出し
+#=================================================================
+def _encode_column(rules: Sequence, col: int, key: str) -> Tuple[bytes, bytes]:
+    """1列分の (文字列表のバイト列, オフセット配列のバイト列) を作る。"""
+    if isinstance(rules, CompiledRuleList):
+        # 既にコンパイル済みの列はそのまま使う
+        data, offsets = rules._columns[col]
+        offsets = array("I", offsets)
+    else:
+        values = [str(rule[col]) for rule in rules]
+        if any(_SEPARATOR in v for v in values):
+            raise ValueError(f"{key} に NUL 文字を含む文字列があるため変換できません。")
+        data = _SEPARATOR.join(values).encode("utf-8")
+        offsets = array("I", [0])
+        for v in values:
+            offsets.append(offsets[-1] + len(v.encode("utf-8")) + 1)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return bytes(data), offsets.tobytes()
+
+def serialize_rule_set(lists: Tuple[list, list, list],
+                       source: Optional[Dict[str, object]] = None,
+                       matcher: Optional[Dict[str, object]] = None) -> bytes:
+    """
+    3つのリスト(replacements_final_list, replacements_list_for_localized_string,
+    replacements_list_for_2char)をコンパイル済み形式のバイト列にする。
+    source には元JSONの sha256/size/mtime_ns を、matcher には replacements_final_list 用の
+    照合器(build_multi_pattern_matcher の戻り値)を入れる(不要なら None)。
+    """
+    body = io.BytesIO()
+    list_headers = []
+    for key, rules in zip(REPLACEMENT_LIST_KEYS, lists):
+        columns = []
+        for col in range(3):
+            data, offsets = _encode_column(rules, col, key)
+            text_pos = [body.tell(), len(data)]
+            body.write(data)
+            offsets_pos = [body.tell(), len(offsets)]
+            body.write(offsets)
+            columns.append({"text": text_pos, "offsets": offsets_pos})
+        list_headers.append({"key": key, "count": len(rules), "columns": columns})
+
+    header = {
+        "version": COMPILED_RULE_SET_VERSION,
+        "source": source,
+        "lists": list_headers,
+        "matcher": None,
+    }
+    if matcher is not None:
+        # 大域置換用の照合器のうち、文字列から再構築すると時間のかかる部分を保存しておく
+        header["matcher"] = {
+            "heads": {head: list(lengths) for head, lengths in matcher["heads"].items()},
+            "dups": {old: list(idxs) for old, idxs in matcher["dups"].items()},
+            "single": matcher["single"],
+        }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return b"".join((
+        COMPILED_RULE_SET_MAGIC,
+        struct.pack("<I", len(header_bytes)),
+        header_bytes,
+        body.getvalue(),
+    ))
+
+def write_compiled_rule_set(lists: Tuple[list, list, list], output_path: str,
+                            source: Dict[str, object]) -> str:
+    """
+    3つのリストをコンパイル済みファイルとして書き出す。
+    source には元JSONの sha256/size/mtime_ns を入れる。
+    """
+    blob = serialize_rule_set(lists, source, build_multi_pattern_matcher(lists[0]))
+    # アプリ・コマンドライン・ベンチマークが同じ JSON を同時にコンパイルしても衝突しないよう、
+    # 書き込みごとに別名の一時ファイルに書いてから置き換える (失敗したら一時ファイルを消す)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=directory, prefix=os.path.basename(output_path) + ".", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            f.write(blob)
+        os.replace(tmp_path, output_path)
+        tmp_path = None
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+def compile_replacements_json(json_path: str, output_path: Optional[str] = None) -> str:
+    """
+    既存の「合并3个JSON文件」形式の置換用JSONをコンパイル済みファイルに変換する。
+    戻り値は書き出したファイルのパス。
+    """
+    if output_path is None:
+        output_path = compiled_rule_set_path(json_path)
+    source = _source_info(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    lists = tuple(data.get(key, []) for key in REPLACEMENT_LIST_KEYS)
+    return write_compiled_rule_set(lists, output_path, source)
+
+#=================================================================
+# 4) 読み込み
+#=================================================================
+def _read_header(mm) -> Tuple[Dict[str, object], int]:
+    if mm[:len(COMPILED_RULE_SET_MAGIC)] != COMPILED_RULE_SET_MAGIC:
+        raise ValueError("コンパイル済み置換ファイルではありません。")
+    pos = len(COMPILED_RULE_SET_MAGIC)
+    (header_len,) = struct.unpack("<I", mm[pos:pos + 4])
+    pos += 4
+    header = json.loads(str(mm[pos:pos + header_len], "utf-8"))
+    if header.get("version") != COMPILED_RULE_SET_VERSION:
+        raise ValueError(f"未対応のバージョンです: {header.get('version')}")
+    return header, pos + header_len
+
+def is_compiled_rule_set_fresh(header: Dict[str, object], json_path: str) -> bool:
+    """
+    コンパイル済みファイルが元JSONの現在の内容から作られたものかを判定する。
+    サイズと更新時刻が一致すればそのまま新しいとみなし、
+    どちらかが違う場合(コピーや git checkout 等)は sha256 で内容を照合する。
+    """
+    source = header["source"]
+    stat = os.stat(json_path)
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+    return compute_file_sha256(json_path) == source["sha256"]
+
+def _lists_from_buffer(buf, header: Dict[str, object], body_start: int,
+                       zero_copy: bool = False) -> List[list]:
+    """
+    buf (mmap や共有メモリの memoryview) からヘッダに従って3つのリストを取り出す。
+    zero_copy=True なら列のバイト列をコピーせず buf の memoryview のまま参照する。
+    """
+    view = memoryview(buf) if zero_copy else buf
+    lists = []
+    for list_header in header["lists"]:
+        columns = []
+        for column in list_header["columns"]:
+            start, length = column["text"]
+            data = view[body_start + start:body_start + start + length]
+            start, length = column["offsets"]
+            raw = view[body_start + start:body_start + start + length]
+            if zero_copy and sys.byteorder == "little":
+                offsets = raw.cast("I")
+            else:
+                offsets = array("I")
+                offsets.frombytes(raw)
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+            columns.append((data, offsets))
+        lists.append(CompiledRuleList(list_header["count"], columns))
+    # 局所置換用・2文字語根用のリストは小さく、毎回全件を走査されるので通常のリストにしておく
+    lists[1] = list(lists[1])
+    lists[2] = list(lists[2])
+    return lists
+
+def _restore_matcher(replacements_final_list: CompiledRuleList, header: Dict[str, object]) -> None:
+    """ヘッダに保存した照合器の付帯情報から照合器を復元し、キャッシュに登録する。"""
+    matcher_header = header.get("matcher")
+    if not matcher_header:
+        return
+    olds = replacements_final_list.column(0)
+    # 同じ old が複数ある場合は最初の添字を残す (逆順に入れて先頭側で上書き)
+    table = dict(zip(reversed(olds), range(len(olds) - 1, -1, -1)))
+    table.pop("", None)
+    matcher = {
+        "table": table,
+        "dups": {old: tuple(idxs) for old, idxs in matcher_header["dups"].items()},
+        "heads": {head: tuple(lengths) for head, lengths in matcher_header["heads"].items()},
+        "single": matcher_header["single"],
+    }
+    register_multi_pattern_matcher(replacements_final_list, matcher)
+
+def load_compiled_rule_set(path: str, source_json_path: Optional[str] = None) -> Tuple[list, list, list]:
+    """
+    コンパイル済みファイルを読み込み、
+    (replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char)
+    を返す。各要素は (old, new, placeholder) のタプル。
+    件数の多い replacements_final_list だけは CompiledRuleList として返す。
+    source_json_path を渡した場合、元JSONと内容が一致しなければ ValueError を送出する。
+    大域置換用の照合器も復元し、esp_text_replacement_module のキャッシュに登録する。
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, body_start = _read_header(mm)
+            if source_json_path is not None and not is_compiled_rule_set_fresh(header, source_json_path):
+                raise ValueError(f"コンパイル済みファイルが元のJSONより古くなっています: {path}")
+            lists = _lists_from_buffer(mm, header, body_start)
+    _restore_matcher(lists[0], header)
+    return lists[0], lists[1], lists[2]
+
+def load_replacements_lists_from_json(json_path: str) -> Tuple[list, list, list]:
+    """置換用JSONを json.load で読み込み、3つのリストを返す。"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return tuple(data.get(key, []) for key in REPLACEMENT_LIST_KEYS)
+
+def load_replacements_lists_preferring_compiled(json_path: str,
+                                                refresh_compiled: bool = False) -> Tuple[list, list, list]:
+    """
+    元JSONと内容が一致するコンパイル済みファイルがあればそれを読み、
+    無い(または古い・壊れている)場合は JSON をそのまま読む。
+    refresh_compiled=True なら、JSON を読んだついでにコンパイル済みファイルを作り直す
+    (書き込めない環境ではそのまま諦める)。
+    """
+    compiled_path = compiled_rule_set_path(json_path)
+    if os.path.exists(compiled_path):
+        try:
+            return load_compiled_rule_set(compiled_path, source_json_path=json_path)
+        except (ValueError, KeyError, struct.error):
+            pass  # 古い/壊れたコンパイル済みファイルは無視して JSON を読む
+    lists = load_replacements_lists_from_json(json_path)
+    if refresh_compiled:
+        try:
+            write_compiled_rule_set(lists, compiled_path, _source_info(json_path))
+        except (OSError, ValueError):
+            pass
+    return lists
+
+#=================================================================
+# 5) 共有メモリ上の規則表 (multiprocessing 用)
+#=================================================================
+class SharedRuleSet:
+    """
+    親プロセス側で3つのリストを共有メモリに1回だけ書き込んでおく入れ物。
+    子プロセスには name (共有メモリの名前) だけを渡し、
+    子プロセス側は attach_shared_rule_set(name) でコピーせずに参照する。
+    使い終わったら close() で共有メモリを解放する。
+    """
+    def __init__(self, lists: Tuple[list, list, list], matcher: Optional[Dict[str, object]] = None):
+        blob = serialize_rule_set(lists, matcher=matcher)
+        self._shm = shared_memory.SharedMemory(create=True, size=len(blob))
+        self._shm.buf[:len(blob)] = blob
+        self.name = self._shm.name
+        self.size = len(blob)
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+# 子プロセス側で開いた共有メモリ (参照中に解放されないよう、プロセスが終わるまで保持する)
+_ATTACHED_SHARED_MEMORY: Dict[str, shared_memory.SharedMemory] = {}
+
+def attach_shared_rule_set(name: str) -> Tuple[list, list, list]:
+    """
+    SharedRuleSet が作った共有メモリに接続し、3つのリストを返す。
+    replacements_final_list の文字列表は共有メモリを直接参照する (プロセスごとのコピーを作らない)。
+    """
+    shm = _ATTACHED_SHARED_MEMORY.get(name)
+    if shm is None:
+        # multiprocessing の子プロセスは親と同じ resource_tracker を共有するので、
+        # 解放は作成した親プロセスの SharedRuleSet.close() に任せればよい
+        shm = shared_memory.SharedMemory(name=name)
+        # 表はプロセスが終わるまで参照し続けるので、終了時の後始末で close() しない
+        # (参照中の memoryview があると BufferError になる。解放は親の close() で十分)
+        shm.close = lambda: None
+        _ATTACHED_SHARED_MEMORY[name] = shm
+    header, body_start = _read_header(shm.buf)
+    lists = _lists_from_buffer(shm.buf, header, body_start, zero_copy=True)
+    _restore_matcher(lists[0], header)
+    return lists[0], lists[1], lists[2]
+
+#=================================================================
+# 5-2) 照合器まで構築済みの規則集合 (アプリでセッションをまたいで使い回す)
+#=================================================================
+# json.loads で読み込んだ規則集合が使うメモリは、元JSONのバイト数の3〜4倍程度 (照合器込み)
+RULE_SET_MEMORY_PER_SOURCE_BYTE = 4
+
+class CompiledRuleSet:
+    """
+    3つのリストと、それぞれの照合器(大域置換用・局所置換用・2文字語根用)をまとめて持つ入れ物。
+    内容ハッシュ(key)ごとに1回だけ作り、Streamlit の st.cache_resource などで
+    同じオブジェクトを使い回す (コピーされないので、中身は書き換えないこと)。
+    """
+    def __init__(self, key: str, lists: Tuple[list, list, list], source_size: int = 0):
+        self.key = key
+        (self.replacements_final_list,
+         self.replacements_list_for_localized_string,
+         self.replacements_list_for_2char) = lists
+        # 元JSONのバイト数 (キャッシュの大きさの目安に使う)
+        self.source_size = source_size
+        self.estimated_nbytes = source_size * RULE_SET_MEMORY_PER_SOURCE_BYTE
+        # 照合器はここで1回だけ作る (.esprules から読んだ場合は復元済みのものがキャッシュから返る)
+        self.final_matcher = get_multi_pattern_matcher(self.replacements_final_list)
+        self.localized_matcher = get_multi_pattern_matcher(self.replacements_list_for_localized_string)
+        self.two_char_matcher = get_two_char_root_matcher(self.replacements_list_for_2char)
+
+    @property
+    def lists(self) -> Tuple[list, list, list]:
+        return (self.replacements_final_list,
+                self.replacements_list_for_localized_string,
+                self.replacements_list_for_2char)
+
+    def activate(self) -> None:
+        """
+        照合器を esp_text_replacement_module のキャッシュに登録し直す。
+        照合器のキャッシュは数件分しか持たないので、他の規則集合を使った後でも
+        置換の直前にこれを呼べば照合器を作り直さずに済む。
+        """
+        register_multi_pattern_matcher(self.replacements_final_list, self.final_matcher)
+        register_multi_pattern_matcher(self.replacements_list_for_localized_string, self.localized_matcher)
+        register_two_char_root_matcher(self.replacements_list_for_2char, self.two_char_matcher)
+
+    @classmethod
+    def from_json_file(cls, json_path: str, key: Optional[str] = None,
+                       write_compiled: bool = False) -> "CompiledRuleSet":
+        """
+        置換用JSON(対応する .esprules があればそちら)から作る。
+        key を省略した場合は JSON の sha256 を計算して使う。
+        write_compiled=True なら、.esprules が無い・古い場合に JSON の隣に作り直す
+        (置き場所が読み取り専用・共有の場合もあるので、既定では書き込まない)。
+        """
+        lists = load_replacements_lists_preferring_compiled(json_path, refresh_compiled=write_compiled)
+        return cls(key or compute_file_sha256(json_path), lists,
+                   source_size=os.path.getsize(json_path))
+
+    @classmethod
+    def from_json_bytes(cls, data: bytes, key: Optional[str] = None) -> "CompiledRuleSet":
+        """
+        アップロードされた置換用JSONのバイト列から作る。
+        key を省略した場合は data の sha256 を計算して使う。
+        """
+        combined_data = json.loads(data)
+        lists = tuple(combined_data.get(list_key, []) for list_key in REPLACEMENT_LIST_KEYS)
+        return cls(key or hashlib.sha256(data).hexdigest(), lists, source_size=len(data))
+
+#=================================================================
+# 5-3) アップロードされた規則集合のキャッシュ (内容ハッシュごと・メモリ上限付きの LRU)
+#=================================================================
+DEFAULT_RULE_SET_CACHE_BUDGET_BYTES = 1 << 30
+
+class RuleSetCache:
+    """
+    内容ハッシュ → CompiledRuleSet のキャッシュ。
+    estimated_nbytes の合計が budget_bytes を超えたら、最も長く使われていないものから捨てる
+    (直近の1件は上限を超えていても残す)。
+    Streamlit では複数のセッションが別スレッドから同時に使うので、操作はロックで守る。
+    """
+    def __init__(self, budget_bytes: int = DEFAULT_RULE_SET_CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[str, CompiledRuleSet]" = OrderedDict()
+        self._total_nbytes = 0
+        self._lock = threading.Lock()
+        # 同じ規則集合を複数のセッションが同時に作り始めないよう、キーごとのロックも持つ
+        self._building: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[CompiledRuleSet]:
+        with self._lock:
+            rule_set = self._entries.get(key)
+            if rule_set is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            return rule_set
+
+    def put(self, rule_set: CompiledRuleSet) -> None:
+        with self._lock:
+            old = self._entries.pop(rule_set.key, None)
+            if old is not None:
+                self._total_nbytes -= old.estimated_nbytes
+            self._entries[rule_set.key] = rule_set
+            self._total_nbytes += rule_set.estimated_nbytes
+            while self._total_nbytes > self.budget_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_nbytes -= evicted.estimated_nbytes
+                self.stats["evictions"] += 1
+
+    def get_or_build(self, key: str, build: Callable[[], CompiledRuleSet]) -> CompiledRuleSet:
+        """
+        key の規則集合があればそれを返し、無ければ build() で作って登録する。
+        """
+        rule_set = self.get(key)
+        if rule_set is not None:
+            return rule_set
+        with self._lock:
+            key_lock = self._building.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # 待っている間に他のセッションが作り終えていればそれを使う
+                rule_set = self.get(key)
+                if rule_set is None:
+                    with self._lock:
+                        self.stats["misses"] += 1
+                    rule_set = build()
+                    self.put(rule_set)
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+        return rule_set
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_nbytes(self) -> int:
+        return self._total_nbytes
+
+#=================================================================
+# 6) コマンドライン (JSON → .esprules の変換)
+#=================================================================
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="置換用JSON(合并3个JSON文件)をコンパイル済みファイル(.esprules)に変換する"
+    )
+    parser.add_argument("json_path", help="変換元の置換用JSON")
+    parser.add_argument("-o", "--output", default=None,
+                        help="出力先 (省略時は JSON と同じ場所に拡張子 .esprules で保存)")
+    args = parser.parse_args(argv)
+    output_path = compile_replacements_json(args.json_path, args.output)
+    print(f"[完了] コンパイル済みファイルを '{output_path}' に保存しました。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+## esp_replacement_constants.py(10個目)
+
+"""
+置換用JSONの生成・文章の置換のコマンドライン・ベンチマークで共通に使う定数をまとめたモジュール。
+(同梱ファイルのディレクトリ・既定の置換用JSON・出力形式の一覧)
+
+ライブラリ側のモジュール (esp_replacement_json_build_pipeline.py 等) が
+コマンドラインのモジュールに依存しないよう、ここに置いて各モジュールから import する。
+"""
+
+import os
+
+#=================================================================
+# 1) 同梱ファイルの場所 (このファイルがあるディレクトリ基準)
+#=================================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "Appの运行に使用する各类文件")
+DEFAULT_JSON_FILE = os.path.join(DATA_DIR, "最终的な替换用リスト(列表)(合并3个JSON文件).json")
+
+#=================================================================
+# 2) 出力形式 (main.py・JSON生成ページの選択肢の値と同じ)
+#=================================================================
+FORMAT_TYPES = [
+    'HTML格式_Ruby文字_大小调整',
+    'HTML格式_Ruby文字_大小调整_汉字替换',
+    'HTML格式',
+    'HTML格式_汉字替换',
+    '括弧(号)格式',
+    '括弧(号)格式_汉字替换',
+    '替换后文字列のみ(仅)保留(简单替换)',
+]
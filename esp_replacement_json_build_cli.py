@@ -0,0 +1,226 @@
+## esp_replacement_json_build_cli.py(9つ目)
+
+"""
+置換用JSON(合并3个JSON文件)を、Streamlit を使わずに生成するコマンドライン。
+CSV(語根→訳)・語根分解法のJSON・置換後文字列のJSON・出力形式を受け取り、
+"esp_replacement_json_build_pipeline.py" の生成処理 (JSON生成ページと同じ処理) で置換用JSONを書き出す。
+
+複数の出力形式 (既定では7種類すべて) を1回の実行でまとめて生成する。
+- 入力の CSV・JSON と同梱ファイルの読み込み、および最も重い語幹の分解は、
+  出力形式に依らない中間表現 (FormatNeutralReplacementBuild) として親プロセスで1回だけ行う
+  (語幹の分解は --processes で並列処理する)
+- 形式ごとには中間表現に置換後文字列を埋め込んで置換用JSONを作る。これはプロセスプールで並列に行い、
+  各ワーカーは最初に1回だけ中間表現を受け取って、受け持った形式の置換用JSONを自分で書き出す
+  (大きな JSON 文字列をプロセス間で受け渡さない)
+
+【使い方】
+  python esp_replacement_json_build_cli.py <出力先ディレクトリ> [--csv 語根表.csv] [--stemming-json 語根分解法.json]
+        [--replacement-json 置換後文字列.json] [--formats all] [--processes 4] [--incremental] [--stage-times]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from typing import List, Dict, Optional
+
+from esp_replacement_json_build_pipeline import (
+    DEFAULT_CSV_FILE,
+    DEFAULT_STEMMING_JSON_FILE,
+    DEFAULT_REPLACEMENT_JSON_FILE,
+    DEFAULT_BUILD_CACHE_DIR,
+    BuildStageProfiler,
+    FormatNeutralReplacementBuild,
+    read_root_translation_csv,
+    load_build_resources,
+    serialize_replacement_lists
+)
+from esp_replacement_constants import DATA_DIR, FORMAT_TYPES
+
+#=================================================================
+# 1) 既定の設定
+#=================================================================
+# JSON生成ページのダウンロード時と同じ名前の後ろに、出力形式を付ける
+OUTPUT_FILE_STEM = "最终的な替换用リスト(列表)(合并3个JSON文件)"
+
+def replacement_json_file_name(format_type: str) -> str:
+    """出力形式 format_type の置換用JSONのファイル名"""
+    return f"{OUTPUT_FILE_STEM}_{format_type}.json"
+
+#=================================================================
+# 2) 1つの出力形式の生成
+#=================================================================
+def build_format_variant(
+    format_type: str,
+    output_path: str,
+    neutral_build: FormatNeutralReplacementBuild,
+    build_cache_dir: Optional[str] = None
+) -> Dict[str, object]:
+    """
+    中間表現 neutral_build から format_type の置換用JSONを生成し、output_path に書き出す。
+    戻り値は形式・出力先・バイト数・ルール数・段ごとの時間。
+    """
+    profiler = BuildStageProfiler()
+    try:
+        combined_data = neutral_build.render(format_type, build_cache_dir=build_cache_dir, profiler=profiler)
+        download_data = serialize_replacement_lists(combined_data, profiler)
+        with profiler.stage("write"):
+            # 途中で失敗しても中途半端な出力ファイルが残らないよう、出力先のディレクトリに別名の一時ファイルを
+            # 作って書いてから置き換える (同じ出力先に同時に書き出す別の実行とも衝突しない)
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(output_path)),
+                    prefix=os.path.basename(output_path) + ".", suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    f.write(download_data)
+                os.replace(tmp_path, output_path)
+                tmp_path = None
+            finally:
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    finally:
+        profiler.close()
+    return {
+        "format_type": format_type,
+        "output_path": output_path,
+        "output_bytes": len(download_data.encode("utf-8")),
+        "rule_counts": {key: len(value) for key, value in combined_data.items()},
+        "total_seconds": profiler.total_seconds(),
+        "summary": profiler.summary_lines(),
+    }
+
+#=================================================================
+# 3) 出力形式ごとの並列生成
+#=================================================================
+# 各ワーカーが初期化時に1回だけ受け取る中間表現
+_BUILD_WORKER_STATE: Dict[str, object] = {}
+
+def _init_build_worker(neutral_build: FormatNeutralReplacementBuild, build_cache_dir: Optional[str]) -> None:
+    """ワーカープロセスの初期化関数。中間表現をプロセス内に保持する。"""
+    _BUILD_WORKER_STATE.update(
+        neutral_build=neutral_build,
+        build_cache_dir=build_cache_dir,
+    )
+
+def _build_format_variant_in_worker(task) -> Dict[str, object]:
+    """ワーカー側の下請け関数。task = (出力形式, 出力先)"""
+    format_type, output_path = task
+    return build_format_variant(
+        format_type,
+        output_path,
+        _BUILD_WORKER_STATE["neutral_build"],
+        build_cache_dir=_BUILD_WORKER_STATE["build_cache_dir"]
+    )
+
+def build_format_variants(
+    format_types: List[str],
+    output_dir: str,
+    inputs: Dict[str, object],
+    num_processes: int = 1,
+    data_dir: str = DATA_DIR,
+    build_cache_dir: Optional[str] = None
+):
+    """
+    format_types の各形式の置換用JSONを output_dir に生成し、1形式終わるごとにその結果
+    (build_format_variant の戻り値) を返すジェネレータ。
+    - まず中間表現を1回だけ作る (語幹の分解は num_processes で並列処理する)
+    - num_processes が 1 か形式が1つだけなら、中間表現から順番に生成する
+    - 形式が複数なら、min(num_processes, 形式の数) 個のワーカーで形式ごとに並列に生成する
+    """
+    tasks = [(format_type, os.path.join(output_dir, replacement_json_file_name(format_type)))
+             for format_type in format_types]
+    neutral_build = FormatNeutralReplacementBuild(
+        inputs["CSV_data_imported"],
+        inputs["custom_stemming_setting_list"],
+        inputs["user_replacement_item_setting_list"],
+        load_build_resources(data_dir),
+        num_processes=num_processes
+    )
+    if num_processes <= 1 or len(tasks) == 1:
+        for format_type, output_path in tasks:
+            yield build_format_variant(format_type, output_path, neutral_build, build_cache_dir=build_cache_dir)
+        return
+
+    with multiprocessing.Pool(
+        processes=min(num_processes, len(tasks)),
+        initializer=_init_build_worker,
+        initargs=(neutral_build, build_cache_dir)
+    ) as pool:
+        # 終わった形式から順に返す
+        for result in pool.imap_unordered(_build_format_variant_in_worker, tasks):
+            yield result
+
+#=================================================================
+# 4) コマンドライン
+#=================================================================
+def load_build_inputs(csv_path: str, stemming_json_path: str, replacement_json_path: str) -> Dict[str, object]:
+    """CSV(語根→訳) と2つのユーザー設定 JSON を読み込む (全ての出力形式で共通)。"""
+    with open(csv_path, "r", encoding="utf-8") as f:
+        CSV_data_imported = read_root_translation_csv(f.read())
+    with open(stemming_json_path, "r", encoding="utf-8") as g:
+        custom_stemming_setting_list = json.load(g)
+    with open(replacement_json_path, "r", encoding="utf-8") as g:
+        user_replacement_item_setting_list = json.load(g)
+    return {
+        "CSV_data_imported": CSV_data_imported,
+        "custom_stemming_setting_list": custom_stemming_setting_list,
+        "user_replacement_item_setting_list": user_replacement_item_setting_list,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="置換用JSON(合并3个JSON文件)を出力形式ごとに生成する (Streamlit は使わない)"
+    )
+    parser.add_argument("output_dir", help="置換用JSONの出力先ディレクトリ (形式ごとに別ファイル)")
+    parser.add_argument("--csv", dest="csv_path", default=DEFAULT_CSV_FILE, help="語根→訳の CSV")
+    parser.add_argument("--stemming-json", default=DEFAULT_STEMMING_JSON_FILE,
+                        help="語根分解法のユーザー設定 JSON")
+    parser.add_argument("--replacement-json", default=DEFAULT_REPLACEMENT_JSON_FILE,
+                        help="置換後文字列のユーザー設定 JSON")
+    parser.add_argument("--formats", default="all",
+                        help="出力形式 (カンマ区切り、all なら7種類すべて)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="並列処理のプロセス数 (1 なら並列化しない)")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="同梱ファイル (PEJVO の語幹リスト・語根リスト・placeholder・文字幅表) のディレクトリ")
+    parser.add_argument("--incremental", action="store_true",
+                        help="キャッシュを使う (入力が前回と同じ形式の優先順位の調整を再利用する)")
+    parser.add_argument("--build-cache-dir", default=DEFAULT_BUILD_CACHE_DIR,
+                        help="--incremental のときのキャッシュの保存先")
+    parser.add_argument("--stage-times", action="store_true", help="形式ごとに段ごとの時間を表示する")
+    args = parser.parse_args(argv)
+
+    format_types = FORMAT_TYPES if args.formats == "all" else [f for f in args.formats.split(",") if f]
+    unknown = [f for f in format_types if f not in FORMAT_TYPES]
+    if unknown:
+        parser.error(f"未知の出力形式です: {', '.join(unknown)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    inputs = load_build_inputs(args.csv_path, args.stemming_json, args.replacement_json)
+    for result in build_format_variants(
+        format_types,
+        args.output_dir,
+        inputs,
+        num_processes=args.processes,
+        data_dir=args.data_dir,
+        build_cache_dir=args.build_cache_dir if args.incremental else None
+    ):
+        print(f"[生成] {result['format_type']}: {result['total_seconds']:.2f} s, "
+              f"{result['output_bytes']} bytes → '{result['output_path']}'", flush=True)
+        if args.stage_times:
+            for line in result["summary"]:
+                print("  " + line, flush=True)
+    print(f"[完了] {len(format_types)} 形式の置換用JSONを {time.perf_counter() - start:.2f} s で生成しました。")
+    return 0
+
+
+if __name__ == '__main__':
+    # Windows などでマルチプロセスを正常に動かすため
+    multiprocessing.set_start_method('spawn', force=True)
+    sys.exit(main())
@@ -0,0 +1,1398 @@
+## esp_replacement_json_build_pipeline.py(8つ目)
+
+"""
+置換用JSON(合并3个JSON文件)の生成処理を、Streamlit を使わずに呼び出せる形にまとめたモジュール。
+JSON生成ページ (pages/에스페란토 문장의 (한자) 치환에 사용할 JSON 파일을 생성합니다.py) はこの関数を呼ぶ。
+
+【構成】
+1) 既定の設定 (同梱ファイルのパス)
+2) 語根分解の規則 (動詞語尾・AN/ON・2文字語根など)
+3) 段ごとの計測 (BuildStageProfiler: 経過時間と tracemalloc によるメモリ使用量)
+4) 入力の読み込み (CSV, PEJVO の語幹リスト, 語根リスト, placeholder)
+5) 生成の各段 ((1)〜(16) はページにあったときの番号のまま)
+6) パイプライン全体 (build_replacement_lists, serialize_replacement_lists)
+   (全ての出力形式に共通する語幹の分解を1回だけ求め、形式ごとに置換後文字列を埋め込む
+    → FormatNeutralReplacementBuild)
+7) コマンドライン (同梱の CSV で生成処理を計測するベンチマーク)
+   (置換用JSONを出力形式ごとにファイルへ書き出すコマンドラインは esp_replacement_json_build_cli.py)
+
+【使い方】
+  python esp_replacement_json_build_pipeline.py [--csv 語根表.csv | --all-csvs] [--formats all]
+                                                [--processes 1] [--memory] [--repeat 1] [--json-out 結果.json]
+"""
+
+import os
+import re
+import sys
+import copy
+import glob
+import json
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+from io import StringIO
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Tuple, Optional
+
+import pandas as pd
+
+from esp_replacement_json_make_module import (
+    convert_to_circumflex,
+    output_format,
+    output_format_batch,
+    load_char_width_table,
+    import_placeholders,
+    safe_replace,
+    capitalize_ruby_and_rt,
+    parallel_build_pre_replacements_dict,
+    remove_redundant_ruby_if_identical,
+    build_pre_replacements_dict_1_incremental,
+    load_or_build_cached_stage,
+    compute_json_digest,
+    build_memoized_safe_replacer,
+    build_safe_replace_decomposer,
+    rendered_news_for_decomposition,
+    render_safe_replace_decomposition,
+    parallel_decompose_many,
+    get_safe_replace_memo_stats,
+    clear_safe_replace_memo
+)
+from esp_replacement_constants import DATA_DIR, FORMAT_TYPES
+
+#=================================================================
+# 1) 既定の設定 (ファイルのパスは、このファイルがあるディレクトリ基準)
+#=================================================================
+DEFAULT_CSV_FILE = os.path.join(DATA_DIR, "에스페란토 어근-한국어 번역 루비 대응 목록.csv")
+DEFAULT_STEMMING_JSON_FILE = os.path.join(DATA_DIR, "世界语单词词根分解方法の使用者自定义设置.json")
+DEFAULT_REPLACEMENT_JSON_FILE = os.path.join(DATA_DIR, "替换后文字列(汉字)の使用者自定义设置(基本上完全不推荐).json")
+E_STEM_LIST_FILE = os.path.join(
+    DATA_DIR,
+    "PEJVO(世界语全部单词列表)'全部'について、词尾(a,i,u,e,o,n等)をcutし、comma(,)で隔てて词性と併せて记录した列表(E_stem_with_Part_Of_Speech_list).json"
+)
+E_ROOT_LIST_FILE = os.path.join(DATA_DIR, "世界语全部词根_约11137个_202501.txt")
+PLACEHOLDER_GLOBAL_FILE = os.path.join(DATA_DIR, "占位符(placeholders)_$20987$-$499999$_全域替换用.txt")
+PLACEHOLDER_2CHAR_FILE = os.path.join(DATA_DIR, "占位符(placeholders)_$13246$-$19834$_二文字词根替换用.txt")
+PLACEHOLDER_LOCAL_FILE = os.path.join(DATA_DIR, "占位符(placeholders)_@20374@-@97648@_局部文字列替换用.txt")
+CHAR_WIDTH_JSON_FILE = os.path.join(DATA_DIR, "Unicode_BMP全范围文字幅(宽)_Arial16.json")
+DEFAULT_BUILD_CACHE_DIR = os.path.join(DATA_DIR, "增量构建用缓存(build_cache)")
+
+# 置換用JSONの3つのリストのキー
+GLOBAL_LIST_KEY = "全域替换用のリスト(列表)型配列(replacements_final_list)"
+TWO_CHAR_LIST_KEY = "二文字词根替换用のリスト(列表)型配列(replacements_list_for_2char)"
+LOCALIZED_LIST_KEY = "局部文字替换用のリスト(列表)型配列(replacements_list_for_localized_string)"
+
+#=================================================================
+# 2) 語根分解の規則
+#=================================================================
+#---------------------------------------------------------------------
+# 以下は動詞接尾辞や特殊接尾辞などを扱うための変数群です。
+# 動詞の活用語尾(as,is,os,usなど)や、接尾辞「an」「on」などのデータを
+# コード下部での処理でまとめて扱うために定義しています。
+#---------------------------------------------------------------------
+
+# 動詞の活用語尾 (例: as,is,os,us など) を表す辞書
+# キーは活用語尾そのもの、バリューも基本的には同じ文字列を入れていますが、
+# 後段で safe_replace() によって(ルビ等)を挿入できるようにしてあります。
+verb_suffix_2l = {
+    'as':'as', 'is':'is', 'os':'os', 'us':'us','at':'at','it':'it','ot':'ot',
+    'ad':'ad','iĝ':'iĝ','ig':'ig','ant':'ant','int':'int','ont':'ont'
+}
+
+#---------------------------------------------------------------------
+# 例: an, on は後の処理で文字列(漢字)と紐づけるためのサンプルデータ
+# ここではAN, ON としてリストを定義し、末尾が"an"/"on"の単語について、
+# 語根分割(形容詞語尾/名詞語尾として扱うか、接尾辞"an"として扱うかetc)を
+# 判定する際に活用する。後段のコードで優先順位を再設定する処理で参照されます。
+#---------------------------------------------------------------------
+AN=[['dietan', '/diet/an/', '/diet/an'], ['afrikan', '/afrik/an/', '/afrik/an'], ['movadan', '/mov/ad/an/', '/mov/ad/an'], ['akcian', '/akci/an/', '/akci/an'], ['montaran', '/mont/ar/an/', '/mont/ar/an'], ['amerikan', '/amerik/an/', '/amerik/an'], ['regnan', '/regn/an/', '/regn/an'], ['dezertan', '/dezert/an/', '/dezert/an'], ['asocian', '/asoci/an/', '/asoci/an'], ['insulan', '/insul/an/', '/insul/an'], ['azian', '/azi/an/', '/azi/an'], ['ŝtatan', '/ŝtat/an/', '/ŝtat/an'], ['doman', '/dom/an/', '/dom/an'], ['montan', '/mont/an/', '/mont/an'], ['familian', '/famili/an/', '/famili/an'], ['urban', '/urb/an/', '/urb/an'], ['popolan', '/popol/an/', '/popol/an'], ['dekan', '/dekan/', '/dek/an'], ['partian', '/parti/an/', '/parti/an'], ['lokan', '/lok/an/', '/lok/an'], ['ŝipan', '/ŝip/an/', '/ŝip/an'], ['eklezian', '/eklezi/an/', '/eklezi/an'], ['landan', '/land/an/', '/land/an'], ['orientan', '/orient/an/', '/orient/an'], ['lernejan', '/lern/ej/an/', '/lern/ej/an'], ['enlandan', '/en/land/an/', '/en/land/an'], ['kalkan', '/kalkan/', '/kalk/an'], ['estraran', '/estr/ar/an/', '/estr/ar/an'], ['etnan', '/etn/an/', '/etn/an'], ['eŭropan', '/eŭrop/an/', '/eŭrop/an'], ['fazan', '/fazan/', '/faz/an'], ['polican', '/polic/an/', '/polic/an'], ['socian', '/soci/an/', '/soci/an'], ['societan', '/societ/an/', '/societ/an'], ['grupan', '/grup/an/', '/grup/an'], ['ligan', '/lig/an/', '/lig/an'], ['nacian', '/naci/an/', '/naci/an'], ['koran', '/koran/', '/kor/an'], ['religian', '/religi/an/', '/religi/an'], ['kuban', '/kub/an/', '/kub/an'], ['majoran', '/major/an/', '/major/an'], ['nordan', '/nord/an/', '/nord/an'], ['paran', 'paran', '/par/an'], ['parizan', '/pariz/an/', '/pariz/an'], ['parokan', '/parok/an/', '/parok/an'], ['podian', '/podi/an/', '/podi/an'], ['rusian', '/rus/i/an/', '/rus/ian'], ['satan', '/satan/', '/sat/an'], ['sektan', '/sekt/an/', '/sekt/an'], ['senatan', '/senat/an/', '/senat/an'], ['skisman', '/skism/an/', '/skism/an'], ['sudan', 'sudan', '/sud/an'], ['utopian', '/utopi/an/', '/utopi/an'], ['vilaĝan', '/vilaĝ/an/', '/vilaĝ/an'], ['arĝentan', '/arĝent/an/', '/arĝent/an']]
+ON=[['duon', '/du/on/', '/du/on'], ['okon', '/ok/on/', '/ok/on'], ['nombron', '/nombr/on/', '/nombr/on'], ['patron', '/patron/', '/patr/on'], ['karbon', '/karbon/', '/karb/on'], ['ciklon', '/ciklon/', '/cikl/on'], ['aldon', '/al/don/', '/ald/on'], ['balon', '/balon/', '/bal/on'], ['baron', '/baron/', '/bar/on'], ['baston', '/baston/', '/bast/on'], ['magneton', '/magnet/on/', '/magnet/on'], ['beton', 'beton', '/bet/on'], ['bombon', '/bombon/', '/bomb/on'], ['breton', 'breton', '/bret/on'], ['burĝon', '/burĝon/', '/burĝ/on'], ['centon', '/cent/on/', '/cent/on'], ['milon', '/mil/on/', '/mil/on'], ['kanton', '/kanton/', '/kant/on'], ['citron', '/citron/', '/citr/on'], ['platon', 'platon', '/plat/on'], ['dekon', '/dek/on/', '/dek/on'], ['kvaron', '/kvar/on/', '/kvar/on'], ['kvinon', '/kvin/on/', '/kvin/on'], ['seson', '/ses/on/', '/ses/on'], ['trion', '/tri/on/', '/tri/on'], ['karton', '/karton/', '/kart/on'], ['foton', '/fot/on/', '/fot/on'], ['peron', '/peron/', '/per/on'], ['elektron', '/elektr/on/', '/elektr/on'], ['drakon', 'drakon', '/drak/on'], ['mondon', '/mon/don/', '/mond/on'], ['pension', '/pension/', '/pensi/on'], ['ordon', '/ordon/', '/ord/on'], ['eskadron', 'eskadron', '/eskadr/on'], ['senton', '/sen/ton/', '/sent/on'], ['eston', 'eston', '/est/on'], ['fanfaron', '/fanfaron/', '/fanfar/on'], ['feston', '/feston/', '/fest/on'], ['flegmon', 'flegmon', '/flegm/on'], ['fronton', '/fronton/', '/front/on'], ['galon', '/galon/', '/gal/on'], ['mason', '/mason/', '/mas/on'], ['helikon', 'helikon', '/helik/on'], ['kanon', '/kanon/', '/kan/on'], ['kapon', '/kapon/', '/kap/on'], ['kokon', '/kokon/', '/kok/on'], ['kolon', '/kolon/', '/kol/on'], ['komision', '/komision/', '/komisi/on'], ['salon', '/salon/', '/sal/on'], ['ponton', '/ponton/', '/pont/on'], ['koton', '/koton/', '/kot/on'], ['kripton', 'kripton', '/kript/on'], ['kupon', '/kupon/', '/kup/on'], ['lakon', 'lakon', '/lak/on'], ['ludon', '/lu/don/', '/lud/on'], ['melon', '/melon/', '/mel/on'], ['menton', '/menton/', '/ment/on'], ['milion', '/milion/', '/mili/on'], ['milionon', '/milion/on/', '/milion/on'], ['naŭon', '/naŭ/on/', '/naŭ/on'], ['violon', '/violon/', '/viol/on'], ['trombon', '/trombon/', '/tromb/on'], ['senson', '/sen/son/', '/sens/on'], ['sepon', '/sep/on/', '/sep/on'], ['skadron', 'skadron', '/skadr/on'], ['stadion', '/stadion/', '/stadi/on'], ['tetraon', 'tetraon', '/tetra/on'], ['timon', '/timon/', '/tim/on'], ['valon', 'valon', '/val/on']]
+
+# allowed_values は -1 表記などを含む例 (ユーザーが単語を排除したい場合に用いる)
+# たとえば、ユーザーのJSON設定で "['xxx', -1, [...]]" となっていたら、
+# その単語を置換対象から完全に外す、といった処理を行うときに使用される。
+allowed_values = {-1, "-1", "ー１", "ー1", "-１", "－１", "－1"}
+
+#---------------------------------------------------------------------
+# 二文字の語根を扱うためのリスト
+# suffix_2char_roots : 接尾辞 (ad, ag, am, ar など)
+# prefix_2char_roots : 接頭辞 (al, am, av, bo など)
+# standalone_2char_roots : 単体でも語根になる (al, ci, da, de など)
+#---------------------------------------------------------------------
+suffix_2char_roots=['ad', 'ag', 'am', 'ar', 'as', 'at', 'av', 'di', 'ec', 'eg', 'ej', 'em', 'er', 'et', 'id', 'ig', 'il', 'in', 'ir', 'is', 'it', 'lu', 'nj', 'op', 'or', 'os', 'ot', 'ov', 'pi', 'te', 'uj', 'ul', 'um', 'us', 'uz','ĝu','aĵ','iĝ','aĉ','aĝ','ŝu','eĥ']
+prefix_2char_roots=['al', 'am', 'av', 'bo', 'di', 'du', 'ek', 'el', 'en', 'fi', 'ge', 'ir', 'lu', 'ne', 'ok', 'or', 'ov', 'pi', 're', 'te', 'uz','ĝu','aĉ','aĝ','ŝu','eĥ']
+standalone_2char_roots=['al', 'ci', 'da', 'de', 'di', 'do', 'du', 'el', 'en', 'fi', 'ha', 'he', 'ho', 'ia', 'ie', 'io', 'iu', 'ja', 'je', 'ju','ke', 'la', 'li', 'mi', 'ne', 'ni', 'nu', 'ok', 'ol', 'po', 'se', 'si', 've', 'vi','ŭa','aŭ','ĉe','ĝi','ŝi','ĉu']
+
+# an, on は別扱いのため、ここでの二文字リストからは除外されています。
+
+# 語幹の分解 (pre_replacements_dict_1) から除外する語幹
+EXCLUDED_STEMS = ['domen', 'teren', 'posten']
+
+# ユーザー設定(語根分解法・置換後文字列)の1行の形が崩れている (文字列でない・要素が足りない・
+# 優先順位が読めない等) ときに、その行だけを読み飛ばすための例外
+# (それ以外の例外や KeyboardInterrupt は握りつぶさない)
+MALFORMED_SETTING_ROW_ERRORS = (TypeError, ValueError, KeyError, IndexError, AttributeError, UnboundLocalError)
+
+#=================================================================
+# 3) 段ごとの計測
+#=================================================================
+class BuildStageProfiler:
+    """
+    生成処理の段ごとに、経過時間(time.perf_counter)と、trace_memory=True のときは
+    tracemalloc で測ったメモリ使用量を記録する。段は入れ子にできる。
+    records には段の開始順に {"name", "depth", "seconds", "peak_bytes", "retained_bytes"} が入る
+    (peak_bytes: 段の実行中に増えたメモリの最大値 / retained_bytes: 段の終了時に残った増加分)。
+    tracemalloc を使うと処理自体が数倍遅くなるので、時間だけを見たいときは trace_memory=False にする。
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.records: List[Dict[str, object]] = []
+        self._open: List[List[object]] = []  # [record, 開始時のメモリ, 実行中の最大値]
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {"name": name, "depth": len(self._open), "seconds": 0.0,
+                  "peak_bytes": None, "retained_bytes": None}
+        self.records.append(record)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        entry = [record, 0, 0]
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak で外側の段の最大値が消えないよう、先に外側へ反映しておく
+            for outer in self._open:
+                outer[2] = max(outer[2], peak)
+            tracemalloc.reset_peak()
+            entry[1] = entry[2] = current
+        self._open.append(entry)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._open.pop()
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, entry[2])
+                record["peak_bytes"] = peak - entry[1]
+                record["retained_bytes"] = current - entry[1]
+                for outer in self._open:
+                    outer[2] = max(outer[2], peak)
+
+    def close(self) -> None:
+        """このプロファイラが始めた tracemalloc を止める。"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def total_seconds(self) -> float:
+        return sum(record["seconds"] for record in self.records if record["depth"] == 0)
+
+    def summary_lines(self) -> List[str]:
+        """段ごとの結果を表の行にする (入れ子の段は字下げする)。"""
+        lines = []
+        for record in self.records:
+            line = f"{'  ' * record['depth'] + record['name']:<36} {record['seconds']:>9.3f} s"
+            if record["peak_bytes"] is not None:
+                line += (f"  peak {record['peak_bytes'] / (1 << 20):>8.1f} MiB"
+                         f"  retained {record['retained_bytes'] / (1 << 20):>8.1f} MiB")
+            lines.append(line)
+        lines.append(f"{'total':<36} {self.total_seconds():>9.3f} s")
+        return lines
+
+def _stage(profiler: Optional[BuildStageProfiler], name: str):
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+#=================================================================
+# 4) 入力の読み込み
+#=================================================================
+def read_root_translation_csv(text: str) -> pd.DataFrame:
+    """語根→訳の CSV の文字列を、字上符形式に直してから先頭2列だけ読み込む。"""
+    converted_text = convert_to_circumflex(text)
+    return pd.read_csv(StringIO(converted_text), encoding="utf-8", usecols=[0, 1])
+
+def load_build_resources(data_dir: str = DATA_DIR) -> Dict[str, object]:
+    """
+    入力の CSV・ユーザー設定以外に生成処理が使う同梱ファイル
+    (PEJVO の語幹リスト・語根リスト・3種類の placeholder・文字幅表) をまとめて読み込む。
+    """
+    def data_path(default_path: str) -> str:
+        return os.path.join(data_dir, os.path.basename(default_path))
+
+    with open(data_path(E_STEM_LIST_FILE), "r", encoding="utf-8") as g:
+        E_stem_with_Part_Of_Speech_list = json.load(g)
+    with open(data_path(E_ROOT_LIST_FILE), 'r', encoding='utf-8') as file:
+        E_roots = file.readlines()
+    return {
+        "E_stem_with_Part_Of_Speech_list": E_stem_with_Part_Of_Speech_list,
+        "E_roots": E_roots,
+        "placeholders_for_global_replacement": import_placeholders(data_path(PLACEHOLDER_GLOBAL_FILE)),
+        "placeholders_for_2char_replacement": import_placeholders(data_path(PLACEHOLDER_2CHAR_FILE)),
+        "placeholders_for_local_replacement": import_placeholders(data_path(PLACEHOLDER_LOCAL_FILE)),
+        "char_width_table": load_char_width_table(data_path(CHAR_WIDTH_JSON_FILE)),
+    }
+
+#=================================================================
+# 5) 生成の各段
+#=================================================================
+def extract_csv_rows(CSV_data_imported: pd.DataFrame) -> Tuple[List[str], List[str]]:
+    """(1) CSV の有効な行 (語根, 訳) を、語根の列と訳の列として取り出す。"""
+    # CSV の有効な行 (語根, 訳) を列として取り出す (空欄の行・'#' を含む語根の行は除く)
+    csv_E_roots = []
+    csv_hanzi_or_meanings = []
+    for E_root, hanzi_or_meaning in zip(CSV_data_imported.iloc[:, 0], CSV_data_imported.iloc[:, 1]):
+        if pd.notna(E_root) and pd.notna(hanzi_or_meaning) \
+           and '#' not in E_root and (E_root != '') and (hanzi_or_meaning != ''):
+            csv_E_roots.append(E_root)
+            csv_hanzi_or_meanings.append(hanzi_or_meaning)
+    return csv_E_roots, csv_hanzi_or_meanings
+
+def build_root_replacements_list(
+    E_roots: List[str],
+    csv_E_roots: List[str],
+    csv_formatted: List[str],
+    imported_placeholders_for_global_replacement: List[str]
+) -> List[List[str]]:
+    """
+    (2) 語根リストの全語根 (置換しない) に CSV の語根→整形済みの訳を上書きし、
+    長い語根から順に placeholder を付けた置換ルール (temporary_replacements_list_final) を作る。
+    """
+    temporary_replacements_dict = {}
+    for E_root in E_roots:
+        E_root = E_root.strip()
+        if not E_root.isdigit():
+            temporary_replacements_dict[E_root] = [E_root, len(E_root)]
+
+    for E_root, formatted in zip(csv_E_roots, csv_formatted):
+        temporary_replacements_dict[E_root] = [formatted, len(E_root)]
+
+    temporary_replacements_list_1 = []
+    for old, new in temporary_replacements_dict.items():
+        temporary_replacements_list_1.append((old, new[0], new[1]))
+    temporary_replacements_list_2 = sorted(temporary_replacements_list_1, key=lambda x: x[2], reverse=True)
+
+    temporary_replacements_list_final = []
+    for kk in range(len(temporary_replacements_list_2)):
+        temporary_replacements_list_final.append([
+            temporary_replacements_list_2[kk][0],
+            temporary_replacements_list_2[kk][1],
+            imported_placeholders_for_global_replacement[kk]
+        ])
+    return temporary_replacements_list_final
+
+def build_pre_replacements_dict_1(
+    E_stem_with_Part_Of_Speech_list: List[List[str]],
+    temporary_replacements_list_final: List[List[str]],
+    replace_with_roots,
+    num_processes: int = 1,
+    cache_path: Optional[str] = None,
+    progress_callback=None
+) -> Tuple[Dict[str, list], Optional[Dict[str, int]]]:
+    """
+    (6) PEJVO の全語幹を語根に分解した pre_replacements_dict_1 を作る (生成処理で最も重い段)。
+    cache_path を渡すと前回の結果を再利用する増分ビルド、num_processes が 2 以上なら並列処理になる。
+    戻り値は (pre_replacements_dict_1, 増分ビルドの統計 (増分ビルドでなければ None))。
+    """
+    build_stats = None
+    if cache_path is not None:
+        # 前回のビルド結果(語幹ごとの safe_replace 結果)を再利用し、
+        # 変更された語根を含む語幹だけを計算し直す
+        pre_replacements_dict_1, build_stats = build_pre_replacements_dict_1_incremental(
+            E_stem_with_Part_Of_Speech_list,
+            temporary_replacements_list_final,
+            cache_path,
+            num_processes,
+            progress_callback
+        )
+    elif num_processes > 1:
+        pre_replacements_dict_1 = parallel_build_pre_replacements_dict(
+            E_stem_with_Part_Of_Speech_list,
+            temporary_replacements_list_final,
+            num_processes
+        )
+        if progress_callback is not None:
+            progress_callback(len(E_stem_with_Part_Of_Speech_list), len(E_stem_with_Part_Of_Speech_list))
+    else:
+        total_items = len(E_stem_with_Part_Of_Speech_list)
+        pre_replacements_dict_1 = {}
+
+        for i, j in enumerate(E_stem_with_Part_Of_Speech_list):
+            if len(j) == 2:
+                if len(j[0]) >= 2:
+                    if j[0] in pre_replacements_dict_1:
+                        if j[1] not in pre_replacements_dict_1[j[0]][1]:
+                            pre_replacements_dict_1[j[0]] = [
+                                pre_replacements_dict_1[j[0]][0],
+                                pre_replacements_dict_1[j[0]][1] + ',' + j[1]
+                            ]
+                    else:
+                        pre_replacements_dict_1[j[0]] = [
+                            replace_with_roots(j[0]),
+                            j[1]
+                        ]
+            if progress_callback is not None and i % 1000 == 0:
+                progress_callback(i + 1, total_items)
+        if progress_callback is not None:
+            progress_callback(total_items, total_items)
+
+    # 例: 処理上、除外したいキーをここでpopする (domen, teren, posten等)
+    for key in EXCLUDED_STEMS:
+        pre_replacements_dict_1.pop(key, None)
+    return pre_replacements_dict_1, build_stats
+
+def build_pre_replacements_dict_3(
+    pre_replacements_dict_1: Dict[str, list],
+    replace_with_roots,
+    custom_stemming_setting_list: list,
+    user_replacement_item_setting_list: list,
+    format_type: str,
+    char_width_table,
+    profiler: Optional[BuildStageProfiler] = None
+) -> Dict[str, list]:
+    """
+    (7)〜(10): pre_replacements_dict_1 → pre_replacements_dict_2 → pre_replacements_dict_3
+    custom_stemming_setting_list / user_replacement_item_setting_list は処理中に書き換えられる。
+    """
+    with _stage(profiler, "pre_replacements_dict_2"):
+        #-------------------------------------------------------------
+        # (7) pre_replacements_dict_1 をさらに加工(優先順位調整等)していく
+        #     → pre_replacements_dict_2 にまとめる
+        #     「置換しない単語の場合は優先順位を下げる」「ルビの一部を除去/再設定」など
+        #-------------------------------------------------------------
+        pre_replacements_dict_2 = {}
+        for i,j in pre_replacements_dict_1.items():
+            # j[0] = safe_replace後の文字列, j[1] = 品詞
+            # i==j[0] の場合は「実質置換されなかった単語(変化なし)」とみなし、優先順位を低めに設定
+            if i==j[0]:
+                # 文字列末尾等に含まれる'/','</rt></ruby>'などを一部加工している
+                pre_replacements_dict_2[i.replace('/', '')] = [
+                    j[0].replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"),
+                    j[1],
+                    len(i.replace('/', ''))*10000 - 3000
+                ]
+            else:
+                # 置換後文字列は j[0] だが、一部'/'を取り除いて処理し、優先順位を(文字数*10000)に設定
+                pre_replacements_dict_2[i.replace('/', '')] = [
+                    j[0].replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"),
+                    j[1],
+                    len(i.replace('/', ''))*10000
+                ]
+
+    with _stage(profiler, "suffix_expansion"):
+        #-------------------------------------------------------------
+        # (8) ここから先は、AN, ON, 動詞語尾などの接頭辞/接尾辞を用いた
+        #     優先順位調整を大量に行う。
+        #
+        #     具体的には、辞書 pre_replacements_dict_2 をさらに書き換えたり、
+        #     新しいキー(=語尾を付けた形など)を追加して、より精度の高い置換を行えるようにしている。
+        #
+        #     コード量は多いですが、やっていることは
+        #       「(語根 + an)を名詞/形容詞とみなすか、それとも接尾辞an(員)とみなすか」
+        #       「(語根 + as)で動詞現在形にする場合の優先順位をどうするか」
+        #     などの細かいルール付けです。
+        #-------------------------------------------------------------
+
+        #------------------------------------------
+        # verb_suffix_2l_2 という辞書を作る:
+        #   verb_suffix_2l の各キー(例:'as')とその置換結果をsafe_replace()で更新
+        #   こうすることで "(語根)+(動詞接尾辞)" に対してルビなどを入れ込めるようにします。
+        #------------------------------------------
+        verb_suffix_2l_2={}
+        for original_verb_suffix,replaced_verb_suffix in verb_suffix_2l.items():
+            # 例: 'as'→'as' のままのことが多いが、safe_replaceで更に別ルビを当てはめる可能性あり
+            verb_suffix_2l_2[original_verb_suffix] = replace_with_roots(replaced_verb_suffix)
+
+        # 一番の工夫ポイント(以下、コメントはコード内にある通り):
+        #  置換の優先順位をどう定めるかで、置換の精度が大きく変わる。
+        #  文字数の多い単語を先に置換する、動詞の場合は活用語尾を付けた形を優先度高くするetc.
+        #
+        # pre_replacements_dict_1→pre_replacements_dict_2→pre_replacements_dict_3
+        # という流れで段階的に書き換え、最終的に "replacements_final_list" へまとめる方針。
+
+        unchangeable_after_creation_list=[]
+        AN_replacement = replace_with_roots('an')
+        AN_treatment=[]
+
+        pre_replacements_dict_3={}
+        # 辞書をコピー (2回以上繰り返す時に改変が及ばないように)
+        pre_replacements_dict_2_copy = pre_replacements_dict_2.copy()
+
+        # (8-1) 例えば "xxxan" という語があり、それが名詞品詞("名词")なのに
+        #        中で "an"がルビとして置換されている...等、誤置換を防ぐための調整。
+        for i,j in pre_replacements_dict_2_copy.items(): # j[0]:置換後文字列, j[1]:品詞, j[2]:優先順位
+            if i.endswith('an') and (AN_replacement in j[0]) and ("名词" in j[1]) and (i[:-2] in pre_replacements_dict_2_copy):
+                # 形容詞語尾anと接尾辞anが衝突する場合などに対応
+                AN_treatment.append([i,j[0]])
+                pre_replacements_dict_2.pop(i, None)
+                # そこへさらに "i+"o,"i+"a,"i+"e などの派生形を追加する処理
+                for k in ["o","a","e"]:
+                    if not i+k in pre_replacements_dict_2_copy:
+                        pre_replacements_dict_3[i+k]=[j[0]+k, j[2]+len(k)*10000-2000]
+            elif (j[1] == "名词") and (len(i)<=6) and not(j[2] in [60000,50000,40000,30000,20000]):
+                # 名詞で6文字以下、かつ特定優先順位でないものを調整
+                for k in ["o"]:
+                    if not i+k in pre_replacements_dict_2_copy:
+                        pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-2000]
+                pre_replacements_dict_2.pop(i, None)
+
+        # (8-2) 2文字語根の特別処理(例えば "am" "ar" など)
+        #       動詞の接尾辞(ag, ig等)を足した形の置換を優先させたいが、名詞や形容詞の場合はどうするか等
+        for i,j in pre_replacements_dict_2.items():
+            # j[2]が20000の場合は2文字語根の優先度っぽい
+            if j[2]==20000:
+                # 名詞の場合
+                if "名词" in j[1]:
+                    for k in ["o","on",'oj']:
+                        if not i+k in pre_replacements_dict_2:
+                            pre_replacements_dict_3[' '+i+k] = [' '+j[0]+k, j[2] + (len(k)+1)*10000 - 5000]
+                # 形容詞の場合
+                if "形容词" in j[1]:
+                    for k in ["a","aj",'an']:
+                        if not i+k in pre_replacements_dict_2:
+                            pre_replacements_dict_3[' '+i+k] = [' '+j[0]+k, j[2] + (len(k)+1)*10000 - 5000]
+                        else:
+                            pre_replacements_dict_3[i+k] = [j[0]+k, j[2] + len(k)*10000 - 5000]
+                            unchangeable_after_creation_list.append(i+k)
+                # 副詞の場合
+                if "副词" in j[1]:
+                    for k in ["e"]:
+                        if not i+k in pre_replacements_dict_2:
+                            pre_replacements_dict_3[' '+i+k] = [' '+j[0]+k, j[2] + (len(k)+1)*10000 - 5000]
+                        else:
+                            pre_replacements_dict_3[' '+i+k] = [' '+j[0]+k, j[2] + (len(k)+1)*10000 - 5000]
+                # 動詞の場合(ここが複雑; 動詞活用語尾(as,is,os,etc)と組み合わせる)
+                if "动词" in j[1]:
+                    for k1,k2 in verb_suffix_2l_2.items():
+                        if not i+k1 in pre_replacements_dict_2:
+                            pre_replacements_dict_3[i+k1] = [j[0]+k2, j[2] + len(k1)*10000 - 3000]
+                        elif j[0]+k2 != pre_replacements_dict_2[i+k1][0]:
+                            pre_replacements_dict_3[i+k1] = [j[0]+k2, j[2] + len(k1)*10000 - 3000]
+                            unchangeable_after_creation_list.append(i+k1)
+                    for k in ["u ","i ","u","i"]:
+                        if not i+k in pre_replacements_dict_2:
+                            pre_replacements_dict_3[i+k] = [j[0]+k, j[2] + len(k)*10000 - 3000]
+                continue
+
+            else:
+                if not i in unchangeable_after_creation_list:# unchangeable_after_creation_list に含まれる場合は除外。(上記で新しく定めた語根分解が更新されてしまわないようにするため。)
+                    pre_replacements_dict_3[i]=[j[0],j[2]]# 品詞情報はここで用いるためにあった。以後は不要なので省いていく。
+                if j[2]==60000 or j[2]==50000 or j[2]==40000 or j[2]==30000:# 文字数が比較的少なく(<=5)、実際に置換するエスペラント語根(文字数×10000)のみを対象とする 
+                    if "名词" in j[1]:# 名词については形容词、副词と違い、置換しないものにもoをつける。
+                        for k in ["o","on",'oj']:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]# 既存でないものは優先順位を大きく下げる→普通の品詞接尾辞が既存でないという言い方はおかしい気がしてきた。(20240612)
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]# 新しく作った方の語根分解を優先する
+                                unchangeable_after_creation_list.append(i+k)
+                            # on系[['nombron', '<ruby>nombr<rt class="ruby-X_X_X">数</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>nombr<rt class="ruby-X_X_X">数</rt></ruby>on'], ['patron', '<ruby>patron<rt class="ruby-X_X_X">後援者</rt></ruby>', '<ruby>patr<rt class="ruby-X_X_X">父</rt></ruby>on'], ['karbon', '<ruby>karbon<rt class="ruby-L_L_L">[化]炭素</rt></ruby>', '<ruby>karb<rt class="ruby-X_X_X">炭</rt></ruby>on'], ['ciklon', '<ruby>ciklon<rt class="ruby-X_X_X">低気圧</rt></ruby>', '<ruby>cikl<rt class="ruby-X_X_X">周期</rt></ruby>on'], ['aldon', '<ruby>al<rt class="ruby-S_S_S">~の方へ</rt></ruby><ruby>don<rt class="ruby-M_M_M">与える</rt></ruby>', '<ruby>ald<rt class="ruby-M_M_M">アルト</rt></ruby>on'], ['balon', '<ruby>balon<rt class="ruby-X_X_X">気球</rt></ruby>', '<ruby>bal<rt class="ruby-M_M_M">舞踏会</rt></ruby>on'], ['baron', '<ruby>baron<rt class="ruby-X_X_X">男爵</rt></ruby>', '<ruby>bar<rt class="ruby-L_L_L">障害</rt></ruby>on'], ['baston', '<ruby>baston<rt class="ruby-X_X_X">棒</rt></ruby>', '<ruby>bast<rt class="ruby-M_M_M">[植]じん皮</rt></ruby>on'], ['magneton', '<ruby>magnet<rt class="ruby-L_L_L">[理]磁石</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>magnet<rt class="ruby-L_L_L">[理]磁石</rt></ruby>on'], ['beton', 'beton', '<ruby>bet<rt class="ruby-M_M_M">ビート</rt></ruby>on'], ['bombon', '<ruby>bombon<rt class="ruby-L_L_L">キャンデー</rt></ruby>', '<ruby>bomb<rt class="ruby-X_X_X">爆弾</rt></ruby>on'], ['breton', 'breton', '<ruby>bret<rt class="ruby-X_X_X">棚</rt></ruby>on'], ['burgxon', '<ruby>burgxon<rt class="ruby-X_X_X">芽</rt></ruby>', '<ruby>burgx<rt class="ruby-M_M_M">ブルジョワ</rt></ruby>on'], ['centon', '<ruby>cent<rt class="ruby-X_X_X">百</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>cent<rt class="ruby-X_X_X">百</rt></ruby>on'], ['milon', '<ruby>mil<rt class="ruby-X_X_X">千</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>mil<rt class="ruby-X_X_X">千</rt></ruby>on'], ['kanton', '<ruby>kanton<rt class="ruby-M_M_M">(フランスの)郡</rt></ruby>', '<ruby>kant<rt class="ruby-M_M_M">(を)歌う</rt></ruby>on'], ['citron', '<ruby>citron<rt class="ruby-M_M_M">[果]シトロン</rt></ruby>', '<ruby>citr<rt class="ruby-M_M_M">[楽]チター</rt></ruby>on'], ['platon', 'platon', '<ruby>plat<rt class="ruby-L_L_L">平たい</rt></ruby>on'], ['dekon', '<ruby>dek<rt class="ruby-X_X_X">十</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>dek<rt class="ruby-X_X_X">十</rt></ruby>on'], ['kvaron', '<ruby>kvar<rt class="ruby-X_X_X">四</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>kvar<rt class="ruby-X_X_X">四</rt></ruby>on'], ['kvinon', '<ruby>kvin<rt class="ruby-X_X_X">五</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>kvin<rt class="ruby-X_X_X">五</rt></ruby>on'], ['seson', '<ruby>ses<rt class="ruby-X_X_X">六</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>ses<rt class="ruby-X_X_X">六</rt></ruby>on'], ['trion', '<ruby>tri<rt class="ruby-X_X_X">三</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>tri<rt class="ruby-X_X_X">三</rt></ruby>on'], ['karton', '<ruby>karton<rt class="ruby-X_X_X">厚紙</rt></ruby>', '<ruby>kart<rt class="ruby-L_L_L">カード</rt></ruby>on'], ['foton', '<ruby>fot<rt class="ruby-S_S_S">写真を撮る</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>fot<rt class="ruby-S_S_S">写真を撮る</rt></ruby>on'], ['peron', '<ruby>peron<rt class="ruby-X_X_X">階段</rt></ruby>', '<ruby>per<rt class="ruby-M_M_M">よって</rt></ruby>on'], ['elektron', '<ruby>elektr<rt class="ruby-X_X_X">電気</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>elektr<rt class="ruby-X_X_X">電気</rt></ruby>on'], ['drakon', 'drakon', '<ruby>drak<rt class="ruby-X_X_X">竜</rt></ruby>on'], ['mondon', '<ruby>mon<rt class="ruby-L_L_L">金銭</rt></ruby><ruby>don<rt class="ruby-M_M_M">与える</rt></ruby>', '<ruby>mond<rt class="ruby-X_X_X">世界</rt></ruby>on'], ['pension', '<ruby>pension<rt class="ruby-X_X_X">下宿屋</rt></ruby>', '<ruby>pensi<rt class="ruby-X_X_X">年金</rt></ruby>on'], ['ordon', '<ruby>ordon<rt class="ruby-M_M_M">(を)命令する</rt></ruby>', '<ruby>ord<rt class="ruby-L_L_L">順序</rt></ruby>on'], ['eskadron', 'eskadron', '<ruby>eskadr<rt class="ruby-L_L_L">[軍]艦隊</rt></ruby>on'], ['senton', '<ruby>sen<rt class="ruby-S_S_S">(~)なしで</rt></ruby><ruby>ton<rt class="ruby-M_M_M">[楽]楽音</rt></ruby>', '<ruby>sent<rt class="ruby-M_M_M">(を)感じる</rt></ruby>on'], ['eston', 'eston', '<ruby>est<rt class="ruby-S_S_S">(~)である</rt></ruby>on'], ['fanfaron', '<ruby>fanfaron<rt class="ruby-L_L_L">大言壮語する</rt></ruby>', '<ruby>fanfar<rt class="ruby-S_S_S">[楽]ファンファーレ</rt></ruby>on'], ['fero', 'fero', '<ruby>fer<rt class="ruby-X_X_X">鉄</rt></ruby>o'], ['feston', '<ruby>feston<rt class="ruby-X_X_X">花綱</rt></ruby>', '<ruby>fest<rt class="ruby-M_M_M">(を)祝う</rt></ruby>on'], ['flegmon', 'flegmon', '<ruby>flegm<rt class="ruby-X_X_X">冷静</rt></ruby>on'], ['fronton', '<ruby>fronton<rt class="ruby-M_M_M">[建]ペディメント</rt></ruby>', '<ruby>front<rt class="ruby-X_X_X">正面</rt></ruby>on'], ['galon', '<ruby>galon<rt class="ruby-M_M_M">[服]モール</rt></ruby>', '<ruby>gal<rt class="ruby-M_M_M">[生]胆汁</rt></ruby>on'], ['mason', '<ruby>mason<rt class="ruby-X_X_X">築く</rt></ruby>', '<ruby>mas<rt class="ruby-M_M_M">かたまり</rt></ruby>on'], ['helikon', 'helikon', '<ruby>helik<rt class="ruby-S_S_S">[動]カタツムリ</rt></ruby>on'], ['kanon', '<ruby>kanon<rt class="ruby-L_L_L">[軍]大砲</rt></ruby>', '<ruby>kan<rt class="ruby-M_M_M">[植]アシ</rt></ruby>on'], ['kapon', '<ruby>kapon<rt class="ruby-M_M_M">去勢オンドリ</rt></ruby>', '<ruby>kap<rt class="ruby-X_X_X">頭</rt></ruby>on'], ['kokon', '<ruby>kokon<rt class="ruby-M_M_M">[虫]繭(まゆ)</rt></ruby>', '<ruby>kok<rt class="ruby-M_M_M">ニワトリ</rt></ruby>on'], ['kolon', '<ruby>kolon<rt class="ruby-L_L_L">[建]円柱</rt></ruby>', '<ruby>kol<rt class="ruby-M_M_M">[解]首</rt></ruby>on'], ['komision', '<ruby>komision<rt class="ruby-L_L_L">(調査)委員会</rt></ruby>', '<ruby>komisi<rt class="ruby-M_M_M">(を)委託する</rt></ruby>on'], ['salon', '<ruby>salon<rt class="ruby-L_L_L">サロン</rt></ruby>', '<ruby>sal<rt class="ruby-X_X_X">塩</rt></ruby>on'], ['ponton', '<ruby>ponton<rt class="ruby-L_L_L">[軍]平底舟</rt></ruby>', '<ruby>pont<rt class="ruby-X_X_X">橋</rt></ruby>on'], ['koton', '<ruby>koton<rt class="ruby-X_X_X">綿</rt></ruby>', '<ruby>kot<rt class="ruby-X_X_X">泥</rt></ruby>on'], ['kripton', 'kripton', '<ruby>kript<rt class="ruby-M_M_M">[宗]地下聖堂</rt></ruby>on'], ['kupon', '<ruby>kupon<rt class="ruby-M_M_M">クーポン券</rt></ruby>', '<ruby>kup<rt class="ruby-M_M_M">吸い玉</rt></ruby>on'], ['lakon', 'lakon', '<ruby>lak<rt class="ruby-M_M_M">ラッカー</rt></ruby>on'], ['ludon', '<ruby>lu<rt class="ruby-S_S_S">賃借する</rt></ruby><ruby>don<rt class="ruby-M_M_M">与える</rt></ruby>', '<ruby>lud<rt class="ruby-M_M_M">(を)遊ぶ</rt></ruby>on'], ['melon', '<ruby>melon<rt class="ruby-M_M_M">[果]メロン</rt></ruby>', '<ruby>mel<rt class="ruby-M_M_M">アナグマ</rt></ruby>on'], ['menton', '<ruby>menton<rt class="ruby-L_L_L">[解]下あご</rt></ruby>', '<ruby>ment<rt class="ruby-M_M_M">[植]ハッカ</rt></ruby>on'], ['milion', '<ruby>milion<rt class="ruby-X_X_X">百万</rt></ruby>', '<ruby>mili<rt class="ruby-M_M_M">[植]キビ</rt></ruby>on'], ['milionon', '<ruby>milion<rt class="ruby-X_X_X">百万</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>milion<rt class="ruby-X_X_X">百万</rt></ruby>on'], ['nauxon', '<ruby>naux<rt class="ruby-X_X_X">九</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>naux<rt class="ruby-X_X_X">九</rt></ruby>on'], ['violon', '<ruby>violon<rt class="ruby-M_M_M">[楽]バイオリン</rt></ruby>', '<ruby>viol<rt class="ruby-M_M_M">[植]スミレ</rt></ruby>on'], ['refoj', '<ruby>re<rt class="ruby-M_M_M">再び</rt></ruby><ruby>foj<rt class="ruby-X_X_X">回</rt></ruby>', '<ruby>ref<rt class="ruby-M_M_M">リーフ</rt></ruby>oj'], ['trombon', '<ruby>trombon<rt class="ruby-M_M_M">[楽]トロンボーン</rt></ruby>', '<ruby>tromb<rt class="ruby-M_M_M">[気]たつまき</rt></ruby>on'], ['samo', 'samo', '<ruby>sam<rt class="ruby-M_M_M">同一の</rt></ruby>o'], ['savoj', 'savoj', '<ruby>sav<rt class="ruby-M_M_M">救助する</rt></ruby>oj'], ['senson', '<ruby>sen<rt class="ruby-S_S_S">(~)なしで</rt></ruby><ruby>son<rt class="ruby-M_M_M">音がする</rt></ruby>', '<ruby>sens<rt class="ruby-M_M_M">[生]感覚</rt></ruby>on'], ['sepon', '<ruby>sep<rt class="ruby-X_X_X">七</rt></ruby><ruby>on<rt class="ruby-M_M_M">分数</rt></ruby>', '<ruby>sep<rt class="ruby-X_X_X">七</rt></ruby>on'], ['skadron', 'skadron', '<ruby>skadr<rt class="ruby-M_M_M">[軍]騎兵中隊</rt></ruby>on'], ['stadion', '<ruby>stadion<rt class="ruby-L_L_L">スタジアム</rt></ruby>', '<ruby>stadi<rt class="ruby-X_X_X">段階</rt></ruby>on'], ['tetraon', 'tetraon', '<ruby>tetra<rt class="ruby-S_S_S">エゾライチョウ</rt></ruby>on'], ['timon', '<ruby>timon<rt class="ruby-L_L_L">かじ棒</rt></ruby>', '<ruby>tim<rt class="ruby-M_M_M">恐れる</rt></ruby>on'], ['valon', 'valon', '<ruby>val<rt class="ruby-M_M_M">[地]谷</rt></ruby>on'], ['veto', 'veto', '<ruby>vet<rt class="ruby-M_M_M">賭ける</rt></ruby>o']]
+                            # on系以外は、'fero','refoj','samo','savoj','veto'
+                    if "形容词" in j[1]:
+                        for k in ["a","aj",'an']:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]# 新しく作った方の語根分解を優先する つまり、"an"は形容詞語尾として語根分解する。
+                                unchangeable_after_creation_list.append(i+k)
+                            # an系 [['dietan', '<ruby>diet<rt class="ruby-M_M_M">[医]規定食</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>diet<rt class="ruby-M_M_M">[医]規定食</rt></ruby>an'], ['afrikan', '<ruby>afrik<rt class="ruby-S_S_S">[地名]アフリカ</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>afrik<rt class="ruby-S_S_S">[地名]アフリカ</rt></ruby>an'], ['movadan', '<ruby>mov<rt class="ruby-M_M_M">動かす</rt></ruby><ruby>ad<rt class="ruby-S_S_S">継続行為</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>mov<rt class="ruby-M_M_M">動かす</rt></ruby><ruby>ad<rt class="ruby-S_S_S">継続行為</rt></ruby>an'], ['akcian', '<ruby>akci<rt class="ruby-M_M_M">[商]株式</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>akci<rt class="ruby-M_M_M">[商]株式</rt></ruby>an'], ['montaran', '<ruby>mont<rt class="ruby-X_X_X">山</rt></ruby><ruby>ar<rt class="ruby-M_M_M">集団</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>mont<rt class="ruby-X_X_X">山</rt></ruby><ruby>ar<rt class="ruby-M_M_M">集団</rt></ruby>an'], ['amerikan', '<ruby>amerik<rt class="ruby-M_M_M">[地名]アメリカ</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>amerik<rt class="ruby-M_M_M">[地名]アメリカ</rt></ruby>an'], ['regnan', '<ruby>regn<rt class="ruby-M_M_M">[法]国家</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>regn<rt class="ruby-M_M_M">[法]国家</rt></ruby>an'], ['dezertan', '<ruby>dezert<rt class="ruby-X_X_X">砂漠</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>dezert<rt class="ruby-X_X_X">砂漠</rt></ruby>an'], ['asocian', '<ruby>asoci<rt class="ruby-X_X_X">協会</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>asoci<rt class="ruby-X_X_X">協会</rt></ruby>an'], ['insulan', '<ruby>insul<rt class="ruby-X_X_X">島</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>insul<rt class="ruby-X_X_X">島</rt></ruby>an'], ['azian', '<ruby>azi<rt class="ruby-M_M_M">アジア</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>azi<rt class="ruby-M_M_M">アジア</rt></ruby>an'], ['sxtatan', '<ruby>sxtat<rt class="ruby-X_X_X">国家</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>sxtat<rt class="ruby-X_X_X">国家</rt></ruby>an'], ['doman', '<ruby>dom<rt class="ruby-X_X_X">家</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>dom<rt class="ruby-X_X_X">家</rt></ruby>an'], ['montan', '<ruby>mont<rt class="ruby-X_X_X">山</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>mont<rt class="ruby-X_X_X">山</rt></ruby>an'], ['familian', '<ruby>famili<rt class="ruby-X_X_X">家族</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>famili<rt class="ruby-X_X_X">家族</rt></ruby>an'], ['urban', '<ruby>urb<rt class="ruby-X_X_X">市</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>urb<rt class="ruby-X_X_X">市</rt></ruby>an'], ['inka', 'inka', '<ruby>ink<rt class="ruby-M_M_M">インク</rt></ruby>a'], ['popolan', '<ruby>popol<rt class="ruby-X_X_X">人民</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>popol<rt class="ruby-X_X_X">人民</rt></ruby>an'], ['dekan', '<ruby>dekan<rt class="ruby-L_L_L">学部長</rt></ruby>', '<ruby>dek<rt class="ruby-X_X_X">十</rt></ruby>an'], ['partian', '<ruby>parti<rt class="ruby-L_L_L">[政]党派</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>parti<rt class="ruby-L_L_L">[政]党派</rt></ruby>an'], ['lokan', '<ruby>lok<rt class="ruby-L_L_L">場所</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>lok<rt class="ruby-L_L_L">場所</rt></ruby>an'], ['sxipan', '<ruby>sxip<rt class="ruby-X_X_X">船</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>sxip<rt class="ruby-X_X_X">船</rt></ruby>an'], ['eklezian', '<ruby>eklezi<rt class="ruby-L_L_L">[宗]教会</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>eklezi<rt class="ruby-L_L_L">[宗]教会</rt></ruby>an'], ['landan', '<ruby>land<rt class="ruby-X_X_X">国</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>land<rt class="ruby-X_X_X">国</rt></ruby>an'], ['orientan', '<ruby>orient<rt class="ruby-M_M_M">方位定める;東</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>orient<rt class="ruby-M_M_M">方位定める;東</rt></ruby>an'], ['lernejan', '<ruby>lern<rt class="ruby-S_S_S">(を)学習する</rt></ruby><ruby>ej<rt class="ruby-M_M_M">場所</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>lern<rt class="ruby-S_S_S">(を)学習する</rt></ruby><ruby>ej<rt class="ruby-M_M_M">場所</rt></ruby>an'], ['enlandan', '<ruby>en<rt class="ruby-M_M_M">中で</rt></ruby><ruby>land<rt class="ruby-X_X_X">国</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>en<rt class="ruby-M_M_M">中で</rt></ruby><ruby>land<rt class="ruby-X_X_X">国</rt></ruby>an'], ['kalkan', '<ruby>kalkan<rt class="ruby-X_X_X">[解]踵</rt></ruby>', '<ruby>kalk<rt class="ruby-M_M_M">[化]石灰</rt></ruby>an'], ['estraran', '<ruby>estr<rt class="ruby-M_M_M">[接尾辞]長</rt></ruby><ruby>ar<rt class="ruby-M_M_M">集団</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>estr<rt class="ruby-M_M_M">[接尾辞]長</rt></ruby><ruby>ar<rt class="ruby-M_M_M">集団</rt></ruby>an'], ['etnan', '<ruby>etn<rt class="ruby-L_L_L">民族</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>etn<rt class="ruby-L_L_L">民族</rt></ruby>an'], ['euxropan', '<ruby>euxrop<rt class="ruby-L_L_L">ヨーロッパ</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>euxrop<rt class="ruby-L_L_L">ヨーロッパ</rt></ruby>an'], ['fazan', '<ruby>fazan<rt class="ruby-L_L_L">[鳥]キジ</rt></ruby>', '<ruby>faz<rt class="ruby-M_M_M">[理]位相</rt></ruby>an'], ['polican', '<ruby>polic<rt class="ruby-X_X_X">警察</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>polic<rt class="ruby-X_X_X">警察</rt></ruby>an'], ['socian', '<ruby>soci<rt class="ruby-X_X_X">社会</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>soci<rt class="ruby-X_X_X">社会</rt></ruby>an'], ['societan', '<ruby>societ<rt class="ruby-X_X_X">会</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>societ<rt class="ruby-X_X_X">会</rt></ruby>an'], ['grupan', '<ruby>grup<rt class="ruby-M_M_M">グループ</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>grup<rt class="ruby-M_M_M">グループ</rt></ruby>an'], ['havaj', 'havaj', '<ruby>hav<rt class="ruby-S_S_S">持っている</rt></ruby>aj'], ['ligan', '<ruby>lig<rt class="ruby-S_S_S">結ぶ;連盟</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>lig<rt class="ruby-S_S_S">結ぶ;連盟</rt></ruby>an'], ['nacian', '<ruby>naci<rt class="ruby-X_X_X">国民</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>naci<rt class="ruby-X_X_X">国民</rt></ruby>an'], ['koran', '<ruby>koran<rt class="ruby-M_M_M">[宗]コーラン</rt></ruby>', '<ruby>kor<rt class="ruby-X_X_X">心</rt></ruby>an'], ['religian', '<ruby>religi<rt class="ruby-X_X_X">宗教</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>religi<rt class="ruby-X_X_X">宗教</rt></ruby>an'], ['kuban', '<ruby>kub<rt class="ruby-M_M_M">立方体</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>kub<rt class="ruby-M_M_M">立方体</rt></ruby>an'], ['lama', '<ruby>lama<rt class="ruby-M_M_M">[宗]ラマ僧</rt></ruby>', '<ruby>lam<rt class="ruby-M_M_M">びっこの</rt></ruby>a'], ['majoran', '<ruby>major<rt class="ruby-M_M_M">[軍]陸軍少佐</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>major<rt class="ruby-M_M_M">[軍]陸軍少佐</rt></ruby>an'], ['malaj', 'malaj', '<ruby>mal<rt class="ruby-M_M_M">正反対</rt></ruby>aj'], ['marian', 'marian', '<ruby>mari<rt class="ruby-L_L_L">マリア</rt></ruby>an'], ['nordan', '<ruby>nord<rt class="ruby-X_X_X">北</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>nord<rt class="ruby-X_X_X">北</rt></ruby>an'], ['paran', 'paran', '<ruby>par<rt class="ruby-L_L_L">一対</rt></ruby>an'], ['parizan', '<ruby>pariz<rt class="ruby-M_M_M">[地名]パリ</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>pariz<rt class="ruby-M_M_M">[地名]パリ</rt></ruby>an'], ['parokan', '<ruby>parok<rt class="ruby-L_L_L">[宗]教区</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>parok<rt class="ruby-L_L_L">[宗]教区</rt></ruby>an'], ['podian', '<ruby>podi<rt class="ruby-L_L_L">ひな壇</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>podi<rt class="ruby-L_L_L">ひな壇</rt></ruby>an'], ['rusian', '<ruby>rus<rt class="ruby-M_M_M">ロシア人</rt></ruby>i<ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>rus<rt class="ruby-M_M_M">ロシア人</rt></ruby>ian'], ['satan', '<ruby>satan<rt class="ruby-M_M_M">[宗]サタン</rt></ruby>', '<ruby>sat<rt class="ruby-M_M_M">満腹した</rt></ruby>an'], ['sektan', '<ruby>sekt<rt class="ruby-M_M_M">[宗]宗派</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>sekt<rt class="ruby-M_M_M">[宗]宗派</rt></ruby>an'], ['senatan', '<ruby>senat<rt class="ruby-M_M_M">[政]参議院</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>senat<rt class="ruby-M_M_M">[政]参議院</rt></ruby>an'], ['skisman', '<ruby>skism<rt class="ruby-M_M_M">(団体の)分裂</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>skism<rt class="ruby-M_M_M">(団体の)分裂</rt></ruby>an'], ['sudan', 'sudan', '<ruby>sud<rt class="ruby-X_X_X">南</rt></ruby>an'], ['utopian', '<ruby>utopi<rt class="ruby-M_M_M">ユートピア</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>utopi<rt class="ruby-M_M_M">ユートピア</rt></ruby>an'], ['vilagxan', '<ruby>vilagx<rt class="ruby-X_X_X">村</rt></ruby><ruby>an<rt class="ruby-M_M_M">会員</rt></ruby>', '<ruby>vilagx<rt class="ruby-X_X_X">村</rt></ruby>an']]
+                            # an系以外は'inka','malaj','havaj','lama'　　'marian'については、'マリアan'で行く。
+                    if "副词" in j[1]:
+                        for k in ["e"]:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]# 新しく作った方の語根分解を優先する
+                                unchangeable_after_creation_list.append(i+k)
+                            # [['alte', '<ruby>alte<rt class="ruby-M_M_M">タチアオイ</rt></ruby>', '<ruby>alt<rt class="ruby-L_L_L">高い</rt></ruby>e'], ['apoge', '<ruby>apoge<rt class="ruby-M_M_M">[天]遠地点</rt></ruby>', '<ruby>apog<rt class="ruby-M_M_M">(を)支える</rt></ruby>e'], ['kaze', '<ruby>kaze<rt class="ruby-M_M_M">[化]凝乳</rt></ruby>', '<ruby>kaz<rt class="ruby-M_M_M">[文]格</rt></ruby>e'], ['pere', '<ruby>pere<rt class="ruby-M_M_M">破滅する</rt></ruby>', '<ruby>per<rt class="ruby-M_M_M">よって</rt></ruby>e'], ['kore', 'kore', '<ruby>kor<rt class="ruby-X_X_X">心</rt></ruby>e'], ['male', 'male', '<ruby>mal<rt class="ruby-M_M_M">正反対</rt></ruby>e'], ['sole', '<ruby>sole<rt class="ruby-M_M_M">シタビラメ</rt></ruby>', '<ruby>sol<rt class="ruby-M_M_M">唯一の</rt></ruby>e']]
+                    if "动词" in j[1]:
+                        for k1,k2 in verb_suffix_2l_2.items():
+                            if not i+k1 in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k1]=[j[0]+k2,j[2]+len(k1)*10000-3000]
+                            elif j[0]+k2 != pre_replacements_dict_2[i+k1][0]:
+                                pre_replacements_dict_3[i+k1]=[j[0]+k2,j[2]+len(k1)*10000-3000]# 新しく作った方の語根分解を優先する
+                                unchangeable_after_creation_list.append(i+k1)
+                            # [['regulus', 'regulus', '<ruby>regul<rt class="ruby-X_X_X">規則</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['akirant', 'akirant', '<ruby>akir<rt class="ruby-S_S_S">(を)獲得する</rt></ruby><ruby>ant<rt class="ruby-S_S_S">能動;継続</rt></ruby>'], ['radius', 'radius', '<ruby>radi<rt class="ruby-L_L_L">[理]線</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['premis', '<ruby>premis<rt class="ruby-X_X_X">前提</rt></ruby>', '<ruby>prem<rt class="ruby-M_M_M">(を)押える</rt></ruby><ruby>is<rt class="ruby-S_S_S">過去形</rt></ruby>'], ['sonat', '<ruby>sonat<rt class="ruby-M_M_M">[楽]ソナタ</rt></ruby>', '<ruby>son<rt class="ruby-M_M_M">音がする</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['format', '<ruby>format<rt class="ruby-X_X_X">[印]判</rt></ruby>', '<ruby>form<rt class="ruby-X_X_X">形</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['markot', '<ruby>markot<rt class="ruby-L_L_L">[園]取木</rt></ruby>', '<ruby>mark<rt class="ruby-L_L_L">しるし</rt></ruby><ruby>ot<rt class="ruby-S_S_S">受動将然</rt></ruby>'], ['nomad', '<ruby>nomad<rt class="ruby-L_L_L">遊牧民</rt></ruby>', '<ruby>nom<rt class="ruby-L_L_L">名前</rt></ruby><ruby>ad<rt class="ruby-S_S_S">継続行為</rt></ruby>'], ['kantat', '<ruby>kantat<rt class="ruby-M_M_M">[楽]カンタータ</rt></ruby>', '<ruby>kant<rt class="ruby-M_M_M">(を)歌う</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['kolorad', 'kolorad', '<ruby>kolor<rt class="ruby-X_X_X">色</rt></ruby><ruby>ad<rt class="ruby-S_S_S">継続行為</rt></ruby>'], ['diplomat', '<ruby>diplomat<rt class="ruby-X_X_X">外交官</rt></ruby>', '<ruby>diplom<rt class="ruby-X_X_X">免状</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['diskont', '<ruby>diskont<rt class="ruby-M_M_M">[商]手形割引する</rt></ruby>', '<ruby>disk<rt class="ruby-X_X_X">円盤</rt></ruby><ruby>ont<rt class="ruby-S_S_S">能動;将然</rt></ruby>'], ['endos', 'endos', '<ruby>end<rt class="ruby-L_L_L">必要</rt></ruby><ruby>os<rt class="ruby-S_S_S">未来形</rt></ruby>'], ['esperant', '<ruby>esperant<rt class="ruby-L_L_L">エスペラント</rt></ruby>', '<ruby>esper<rt class="ruby-M_M_M">(を)希望する</rt></ruby><ruby>ant<rt class="ruby-S_S_S">能動;継続</rt></ruby>'], ['forkant', '<ruby>for<rt class="ruby-M_M_M">離れて</rt></ruby><ruby>kant<rt class="ruby-M_M_M">(を)歌う</rt></ruby>', '<ruby>fork<rt class="ruby-S_S_S">[料]フォーク</rt></ruby><ruby>ant<rt class="ruby-S_S_S">能動;継続</rt></ruby>'], ['gravit', 'gravit', '<ruby>grav<rt class="ruby-L_L_L">重要な</rt></ruby><ruby>it<rt class="ruby-S_S_S">受動完了</rt></ruby>'], ['konus', '<ruby>konus<rt class="ruby-L_L_L">[数]円錐</rt></ruby>', '<ruby>kon<rt class="ruby-S_S_S">知っている</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['salat', '<ruby>salat<rt class="ruby-M_M_M">[料]サラダ</rt></ruby>', '<ruby>sal<rt class="ruby-X_X_X">塩</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['legat', '<ruby>legat<rt class="ruby-M_M_M">[宗]教皇特使</rt></ruby>', '<ruby>leg<rt class="ruby-M_M_M">(を)読む</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['lekant', '<ruby>lekant<rt class="ruby-M_M_M">[植]マーガレット</rt></ruby>', '<ruby>lek<rt class="ruby-M_M_M">なめる</rt></ruby><ruby>ant<rt class="ruby-S_S_S">能動;継続</rt></ruby>'], ['lotus', '<ruby>lotus<rt class="ruby-L_L_L">[植]ハス</rt></ruby>', '<ruby>lot<rt class="ruby-L_L_L">くじ</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['malvolont', '<ruby>mal<rt class="ruby-M_M_M">正反対</rt></ruby><ruby>volont<rt class="ruby-L_L_L">自ら進んで</rt></ruby>', '<ruby>mal<rt class="ruby-M_M_M">正反対</rt></ruby><ruby>vol<rt class="ruby-S_S_S">意志がある</rt></ruby><ruby>ont<rt class="ruby-S_S_S">能動;将然</rt></ruby>'], ['mankis', '<ruby>man<rt class="ruby-X_X_X">手</rt></ruby><ruby>kis<rt class="ruby-M_M_M">キスする</rt></ruby>', '<ruby>mank<rt class="ruby-M_M_M">欠けている</rt></ruby><ruby>is<rt class="ruby-S_S_S">過去形</rt></ruby>'], ['minus', '<ruby>minus<rt class="ruby-L_L_L">マイナス</rt></ruby>', '<ruby>min<rt class="ruby-L_L_L">鉱山</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['patos', '<ruby>patos<rt class="ruby-M_M_M">[芸]パトス</rt></ruby>', '<ruby>pat<rt class="ruby-S_S_S">フライパン</rt></ruby><ruby>os<rt class="ruby-S_S_S">未来形</rt></ruby>'], ['predikat', '<ruby>predikat<rt class="ruby-X_X_X">[文]述部</rt></ruby>', '<ruby>predik<rt class="ruby-M_M_M">(を)説教する</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['rabat', '<ruby>rabat<rt class="ruby-L_L_L">[商]割引</rt></ruby>', '<ruby>rab<rt class="ruby-M_M_M">強奪する</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['rabot', '<ruby>rabot<rt class="ruby-S_S_S">かんなをかける</rt></ruby>', '<ruby>rab<rt class="ruby-M_M_M">強奪する</rt></ruby><ruby>ot<rt class="ruby-S_S_S">受動将然</rt></ruby>'], ['remont', 'remont', '<ruby>rem<rt class="ruby-L_L_L">漕ぐ</rt></ruby><ruby>ont<rt class="ruby-S_S_S">能動;将然</rt></ruby>'], ['satirus', 'satirus', '<ruby>satir<rt class="ruby-M_M_M">諷刺(詩;文)</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['sendat', '<ruby>sen<rt class="ruby-S_S_S">(~)なしで</rt></ruby><ruby>dat<rt class="ruby-L_L_L">日付</rt></ruby>', '<ruby>send<rt class="ruby-M_M_M">(を)送る</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['sendot', '<ruby>sen<rt class="ruby-S_S_S">(~)なしで</rt></ruby><ruby>dot<rt class="ruby-M_M_M">持参金</rt></ruby>', '<ruby>send<rt class="ruby-M_M_M">(を)送る</rt></ruby><ruby>ot<rt class="ruby-S_S_S">受動将然</rt></ruby>'], ['spirit', '<ruby>spirit<rt class="ruby-X_X_X">精神</rt></ruby>', '<ruby>spir<rt class="ruby-M_M_M">呼吸する</rt></ruby><ruby>it<rt class="ruby-S_S_S">受動完了</rt></ruby>'], ['spirant', 'spirant', '<ruby>spir<rt class="ruby-M_M_M">呼吸する</rt></ruby><ruby>ant<rt class="ruby-S_S_S">能動;継続</rt></ruby>'], ['taksus', '<ruby>taksus<rt class="ruby-L_L_L">[植]イチイ</rt></ruby>', '<ruby>taks<rt class="ruby-S_S_S">(を)評価する</rt></ruby><ruby>us<rt class="ruby-S_S_S">条件法</rt></ruby>'], ['tenis', 'tenis', '<ruby>ten<rt class="ruby-M_M_M">支え持つ</rt></ruby><ruby>is<rt class="ruby-S_S_S">過去形</rt></ruby>'], ['traktat', '<ruby>traktat<rt class="ruby-X_X_X">[政]条約</rt></ruby>', '<ruby>trakt<rt class="ruby-M_M_M">(を)取り扱う</rt></ruby><ruby>at<rt class="ruby-S_S_S">受動継続</rt></ruby>'], ['trikot', '<ruby>trikot<rt class="ruby-M_M_M">[織]トリコット</rt></ruby>', '<ruby>trik<rt class="ruby-S_S_S">編み物をする</rt></ruby><ruby>ot<rt class="ruby-S_S_S">受動将然</rt></ruby>'], ['trilit', '<ruby>tri<rt class="ruby-X_X_X">三</rt></ruby><ruby>lit<rt class="ruby-M_M_M">ベッド</rt></ruby>', '<ruby>tril<rt class="ruby-M_M_M">[楽]トリル</rt></ruby><ruby>it<rt class="ruby-S_S_S">受動完了</rt></ruby>'], ['vizit', '<ruby>vizit<rt class="ruby-M_M_M">(を)訪問する</rt></ruby>', '<ruby>viz<rt class="ruby-L_L_L">ビザ</rt></ruby><ruby>it<rt class="ruby-S_S_S">受動完了</rt></ruby>'], ['volont', '<ruby>volont<rt class="ruby-L_L_L">自ら進んで</rt></ruby>', '<ruby>vol<rt class="ruby-S_S_S">意志がある</rt></ruby><ruby>ont<rt class="ruby-S_S_S">能動;将然</rt></ruby>']]
+                        for k in ["u ","i ","u","i"]:# 动词の"u","i"単体の接尾辞は後ろが空白と決まっているので、2文字分増やすことができる。
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-3000]# 新しく作った方の語根分解を優先する
+                                unchangeable_after_creation_list.append(i+k)
+                            # [['agxi', '<ruby>agxi<rt class="ruby-L_L_L">打ち歩</rt></ruby>', '<ruby>agx<rt class="ruby-L_L_L">年齢</rt></ruby>i'], ['premi', '<ruby>premi<rt class="ruby-X_X_X">賞品</rt></ruby>', '<ruby>prem<rt class="ruby-M_M_M">(を)押える</rt></ruby>i'], ['bari', 'bari', '<ruby>bar<rt class="ruby-L_L_L">障害</rt></ruby>i'], ['tempi', '<ruby>tempi<rt class="ruby-L_L_L">こめかみ</rt></ruby>', '<ruby>temp<rt class="ruby-X_X_X">時間</rt></ruby>i'], ['noktu', '<ruby>noktu<rt class="ruby-S_S_S">[鳥]コフクロウ</rt></ruby>', '<ruby>nokt<rt class="ruby-X_X_X">夜</rt></ruby>u'], ['vakcini', 'vakcini', '<ruby>vakcin<rt class="ruby-M_M_M">[薬]ワクチン</rt></ruby>i'], ['procesi', '<ruby>procesi<rt class="ruby-X_X_X">[宗]行列</rt></ruby>', '<ruby>proces<rt class="ruby-L_L_L">[法]訴訟</rt></ruby>i'], ['statu', '<ruby>statu<rt class="ruby-X_X_X">立像</rt></ruby>', '<ruby>stat<rt class="ruby-X_X_X">状態</rt></ruby>u'], ['devi', 'devi', '<ruby>dev<rt class="ruby-L_L_L">must</rt></ruby>i'], ['feri', '<ruby>feri<rt class="ruby-X_X_X">休日</rt></ruby>', '<ruby>fer<rt class="ruby-X_X_X">鉄</rt></ruby>i'], ['fleksi', '<ruby>fleksi<rt class="ruby-M_M_M">[文]語尾変化</rt></ruby>', '<ruby>fleks<rt class="ruby-M_M_M">(を)曲げる</rt></ruby>i'], ['pensi', '<ruby>pensi<rt class="ruby-X_X_X">年金</rt></ruby>', '<ruby>pens<rt class="ruby-X_X_X">思う</rt></ruby>i'], ['jesu', '<ruby>jesu<rt class="ruby-M_M_M">[宗]イエス</rt></ruby>', '<ruby>jes<rt class="ruby-L_L_L">はい</rt></ruby>u'], ['jxaluzi', 'jxaluzi', '<ruby>jxaluz<rt class="ruby-L_L_L">嫉妬深い</rt></ruby>i'], ['konfesi', 'konfesi', '<ruby>konfes<rt class="ruby-M_M_M">(を)告白する</rt></ruby>i'], ['konsili', 'konsili', '<ruby>konsil<rt class="ruby-M_M_M">(を)助言する</rt></ruby>i'], ['legi', '<ruby>legi<rt class="ruby-M_M_M">[史]軍団</rt></ruby>', '<ruby>leg<rt class="ruby-M_M_M">(を)読む</rt></ruby>i'], ['licenci', 'licenci', '<ruby>licenc<rt class="ruby-L_L_L">[商]認可</rt></ruby>i'], ['logxi', '<ruby>logxi<rt class="ruby-L_L_L">[劇]桟敷</rt></ruby>', '<ruby>logx<rt class="ruby-M_M_M">(に)住む</rt></ruby>i'], ['meti', '<ruby>meti<rt class="ruby-L_L_L">手仕事</rt></ruby>', '<ruby>met<rt class="ruby-M_M_M">(を)置く</rt></ruby>i'], ['pasi', '<ruby>pasi<rt class="ruby-X_X_X">情熱</rt></ruby>', '<ruby>pas<rt class="ruby-M_M_M">通過する</rt></ruby>i'], ['revu', '<ruby>revu<rt class="ruby-M_M_M">専門雑誌</rt></ruby>', '<ruby>rev<rt class="ruby-M_M_M">空想する</rt></ruby>u'], ['rabi', '<ruby>rabi<rt class="ruby-M_M_M">[病]狂犬病</rt></ruby>', '<ruby>rab<rt class="ruby-M_M_M">強奪する</rt></ruby>i'], ['religi', '<ruby>religi<rt class="ruby-X_X_X">宗教</rt></ruby>', '<ruby>re<rt class="ruby-M_M_M">再び</rt></ruby><ruby>lig<rt class="ruby-S_S_S">結ぶ;連盟</rt></ruby>i'], ['sagu', '<ruby>sagu<rt class="ruby-M_M_M">[料]サゴ粉</rt></ruby>', '<ruby>sag<rt class="ruby-X_X_X">矢</rt></ruby>u'], ['sekci', '<ruby>sekci<rt class="ruby-X_X_X">部</rt></ruby>', '<ruby>sekc<rt class="ruby-S_S_S">[医]切断する</rt></ruby>i'], ['sendi', '<ruby>sen<rt class="ruby-S_S_S">(~)なしで</rt></ruby><ruby>di<rt class="ruby-X_X_X">神</rt></ruby>', '<ruby>send<rt class="ruby-M_M_M">(を)送る</rt></ruby>i'], ['teni', '<ruby>teni<rt class="ruby-M_M_M">サナダムシ</rt></ruby>', '<ruby>ten<rt class="ruby-M_M_M">支え持つ</rt></ruby>i'], ['vaku', 'vaku', '<ruby>vak<rt class="ruby-S_S_S">あいている</rt></ruby>u'], ['vizi', '<ruby>vizi<rt class="ruby-X_X_X">幻影</rt></ruby>', '<ruby>viz<rt class="ruby-L_L_L">ビザ</rt></ruby>i']]
+                elif len(i)>=3 and len(i)<=6:# 3文字から6文字の語根で置換しないもの　　結局2文字の語根で置換しないものについては、完全に除外している。
+                    if "名词" in j[1]:# 名词については形容词、副词と違い、置換しないものにもoをつける。
+                        for k in ["o"]:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-5000]# 実質3000# 存でないものは優先順位を大きく下げる→普通の品詞接尾辞が既存でないという言い方はおかしい気がしてきた。(20240612)
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pass
+                    if "形容词" in j[1]:
+                        for k in ["a"]:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-5000]
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pass
+                    if "副词" in j[1]:
+                        for k in ["e"]:
+                            if not i+k in pre_replacements_dict_2:
+                                pre_replacements_dict_3[i+k]=[j[0]+k,j[2]+len(k)*10000-5000]
+                            elif j[0]+k != pre_replacements_dict_2[i+k][0]:
+                                pass
+
+    with _stage(profiler, "an_on_expansion"):
+        # (8-3) AN, ONリストを用いて更に新しい形を派生(XXXan/o, XXXon/aなど)
+        for an in AN:
+            if an[1].endswith("/an/"):
+                i2 = an[1]
+                i3 = re.sub(r"/an/$", "", i2)
+                i4 = i3+"/an/o"
+                i5 = i3+"/an/a"
+                i6 = i3+"/an/e"
+                i7 = i3+"/a/n/"
+                pre_replacements_dict_3[i4.replace('/', '')] = [replace_with_roots(i4).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i4.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i5.replace('/', '')] = [replace_with_roots(i5).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i5.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i6.replace('/', '')] = [replace_with_roots(i6).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i6.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i7.replace('/', '')] = [replace_with_roots(i7).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i7.replace('/', ''))-1)*10000+3000]
+            else:
+                # 末尾に"an"がつくパターンに準じた置換処理
+                i2 = an[1]
+                i2_2 = re.sub(r"an$", "", i2)
+                i3 = re.sub(r"an/$", "", i2_2)
+                i4 = i3+"an/o"
+                i5 = i3+"an/a"
+                i6 = i3+"an/e"
+                i7 = i3+"/a/n/"
+                pre_replacements_dict_3[i4.replace('/', '')] = [replace_with_roots(i4).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i4.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i5.replace('/', '')] = [replace_with_roots(i5).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i5.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i6.replace('/', '')] = [replace_with_roots(i6).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i6.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i7.replace('/', '')] = [replace_with_roots(i7).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i7.replace('/', ''))-1)*10000+3000]
+
+        for on in ON:
+            if on[1].endswith("/on/"):
+                i2 = on[1]
+                i3 = re.sub(r"/on/$", "", i2)
+                i4 = i3+"/on/o"
+                i5 = i3+"/on/a"
+                i6 = i3+"/on/e"
+                i7 = i3+"/o/n/"
+                pre_replacements_dict_3[i4.replace('/', '')] = [replace_with_roots(i4).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i4.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i5.replace('/', '')] = [replace_with_roots(i5).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i5.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i6.replace('/', '')] = [replace_with_roots(i6).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i6.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i7.replace('/', '')] = [replace_with_roots(i7).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i7.replace('/', ''))-1)*10000+3000]
+            else:
+                i2 = on[1]
+                i2_2 = re.sub(r"on$", "", i2)
+                i3 = re.sub(r"on/$", "", i2_2)
+                i4 = i3+"on/o"
+                i5 = i3+"on/a"
+                i6 = i3+"on/e"
+                i7 = i3+"/o/n/"
+                pre_replacements_dict_3[i4.replace('/', '')] = [replace_with_roots(i4).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i4.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i5.replace('/', '')] = [replace_with_roots(i5).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i5.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i6.replace('/', '')] = [replace_with_roots(i6).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i6.replace('/', ''))-1)*10000+3000]
+                pre_replacements_dict_3[i7.replace('/', '')] = [replace_with_roots(i7).replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>"), (len(i7.replace('/', ''))-1)*10000+3000]
+
+    with _stage(profiler, "user_settings"):
+        #-------------------------------------------------------------
+        # (9) custom_stemming_setting_list (ユーザーが定義した語根分解法) を適用
+        #     - 例: ["am", "dflt", ["verbo_s1"]] → "am"に動詞活用語尾を付けた形を挿入
+        #     - もし優先順位を-1等にしていたら、置換対象から除外(pop)する
+        #-------------------------------------------------------------
+        if len(custom_stemming_setting_list) > 0:
+            # 最初の要素が3つでなければ「説明用の行」とみなし削除
+            if len(custom_stemming_setting_list[0]) != 3:
+                custom_stemming_setting_list.pop(0)
+
+        for i in custom_stemming_setting_list:
+            if len(i)==3:
+                try:
+                    esperanto_Word_before_replacement = i[0].replace('/', '')
+                    if i[1] == "dflt":
+                        replacement_priority_by_length = len(esperanto_Word_before_replacement)*10000
+                    elif i[1] in allowed_values:
+                        # 置換優先順位(i[1])が-1等の場合、該当単語を除去
+                        pre_replacements_dict_3.pop(esperanto_Word_before_replacement, None)
+                        if "ne" in i[2]:
+                            pre_replacements_dict_3.pop(esperanto_Word_before_replacement, None)
+                            i[2].remove("ne")
+                        if "verbo_s1" in i[2]:
+                            for k1 in verb_suffix_2l_2.keys():
+                                removed_E_word = esperanto_Word_before_replacement + k1
+                                pre_replacements_dict_3.pop(removed_E_word, None)
+                            i[2].remove("verbo_s1")
+                        if "verbo_s2" in i[2]:
+                            for k in ["u ", "i ", "u", "i"]:
+                                removed_E_word = esperanto_Word_before_replacement + k
+                                pre_replacements_dict_3.pop(removed_E_word, None)
+                            i[2].remove("verbo_s2")
+                        if len(i[2]) >= 1:
+                            for j2_item in i[2]:
+                                j2_item2 = j2_item.replace('/', '')
+                                removed_E_word = esperanto_Word_before_replacement + j2_item2
+                                pre_replacements_dict_3.pop(removed_E_word, None)
+                        continue
+                    elif isinstance(i[1], int) or (isinstance(i[1], str) and i[1].isdigit()):
+                        # 整数(もしくは整数文字列)であれば優先順位として使用
+                        replacement_priority_by_length = int(i[1])
+
+                    # ここで "i[0]"をsafe_replaceしてルビ等を入れる
+                    Replaced_String = replace_with_roots(i[0])\
+                                      .replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>")
+
+                    if "ne" in i[2]:
+                        pre_replacements_dict_3[esperanto_Word_before_replacement] = [Replaced_String, replacement_priority_by_length]
+                        i[2].remove("ne")
+                    if "verbo_s1" in i[2]:
+                        for k1,k2 in verb_suffix_2l_2.items():
+                            pre_replacements_dict_3[esperanto_Word_before_replacement + k1] = [Replaced_String + k2, replacement_priority_by_length+len(k1)*10000]
+                        i[2].remove("verbo_s1")
+                    if "verbo_s2" in i[2]:
+                        for k in ["u ","i ","u","i"]:
+                            pre_replacements_dict_3[esperanto_Word_before_replacement + k] = [Replaced_String + k, replacement_priority_by_length+len(k)*10000]
+                        i[2].remove("verbo_s2")
+                    if len(i[2])>=1:
+                        for j_item in i[2]:
+                            j2 = j_item.replace('/', '')
+                            j3 = replace_with_roots(j_item)\
+                                  .replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>")
+                            pre_replacements_dict_3[esperanto_Word_before_replacement + j2] = [Replaced_String + j3, replacement_priority_by_length+len(j2)*10000]
+                    else:
+                        pre_replacements_dict_3[esperanto_Word_before_replacement] = [Replaced_String, replacement_priority_by_length]
+                except MALFORMED_SETTING_ROW_ERRORS:
+                    continue
+
+        #-------------------------------------------------------------
+        # (10) user_replacement_item_setting_list を適用
+        #      こちらはさらに細かい「特定の単語→独自の漢字表記」の設定など
+        #-------------------------------------------------------------
+        if len(user_replacement_item_setting_list) > 0:
+            # 同様に最初が4つでなければ説明行とみなし削除
+            if len(user_replacement_item_setting_list[0]) != 4:
+                user_replacement_item_setting_list.pop(0)
+
+        for i in user_replacement_item_setting_list:
+            if len(i)==4:
+                try:
+                    # i[0]のように "xxx/yyy" といった複数rootが書かれている場合、"/"でsplit
+                    esperanto_Roots_before_replacement = i[0].strip('/').split('/')
+                    replaced_roots = i[3].strip('/').split('/')
+                    if len(esperanto_Roots_before_replacement) == len(replaced_roots):
+                        # 同じ数だけsplitされているならOK
+                        Replaced_String = ""
+                        for kk in range(len(esperanto_Roots_before_replacement)):
+                            Replaced_String += output_format(
+                                esperanto_Roots_before_replacement[kk],
+                                replaced_roots[kk],
+                                format_type,
+                                char_width_table
+                            )
+                        esperanto_Word_before_replacement = i[0].replace('/', '')
+                        if i[1]=="dflt":
+                            replacement_priority_by_length = len(esperanto_Word_before_replacement)*10000
+                        elif isinstance(i[1], int) or (isinstance(i[1], str) and i[1].isdigit()):
+                            replacement_priority_by_length = int(i[1])
+
+                        if "ne" in i[2]:
+                            pre_replacements_dict_3[esperanto_Word_before_replacement] = [Replaced_String, replacement_priority_by_length]
+                            i[2].remove("ne")
+                        if "verbo_s1" in i[2]:
+                            for k1,k2 in verb_suffix_2l_2.items():
+                                pre_replacements_dict_3[esperanto_Word_before_replacement + k1] = [Replaced_String + k2, replacement_priority_by_length+len(k1)*10000]
+                            i[2].remove("verbo_s1")
+                        if "verbo_s2" in i[2]:
+                            for k in ["u ","i ","u","i"]:
+                                pre_replacements_dict_3[esperanto_Word_before_replacement + k] = [Replaced_String + k, replacement_priority_by_length+len(k)*10000]
+                            i[2].remove("verbo_s2")
+                        if len(i[2])>=1:
+                            for j_item in i[2]:
+                                j2 = j_item.replace('/', '')
+                                j3 = replace_with_roots(j_item)\
+                                      .replace("</rt></ruby>","%%%").replace('/', '').replace("%%%","</rt></ruby>")
+                                pre_replacements_dict_3[esperanto_Word_before_replacement + j2] = [Replaced_String + j3, replacement_priority_by_length+len(j2)*10000]
+                        else:
+                            pre_replacements_dict_3[esperanto_Word_before_replacement] = [Replaced_String, replacement_priority_by_length]
+                except MALFORMED_SETTING_ROW_ERRORS:
+                    continue
+    return pre_replacements_dict_3
+
+def build_replacements_final_list(
+    pre_replacements_dict_3: Dict[str, list],
+    format_type: str,
+    imported_placeholders_for_global_replacement: List[str]
+) -> List[Tuple[str, str, str]]:
+    #-------------------------------------------------------------
+    # (11) pre_replacements_dict_3 をリスト化して、優先順位の大きい順にソート
+    #      →「最終的に大域置換に使う置換リスト(replacements_final_list)」の元を作る
+    #-------------------------------------------------------------
+    pre_replacements_list_1 = []
+    for old,new in pre_replacements_dict_3.items():
+        # new[0] = 実際の置換後文字列, new[1] = 優先順位(int)
+        if isinstance(new[1], int):
+            pre_replacements_list_1.append((old,new[0],new[1]))
+
+    pre_replacements_list_2 = sorted(pre_replacements_list_1, key=lambda x: x[2], reverse=True)
+
+    # remove_redundant_ruby_if_identical() で親文字とルビ文字が同じときの二重ルビを除去
+    pre_replacements_list_3 = []
+    for kk in range(len(pre_replacements_list_2)):
+        if len(pre_replacements_list_2[kk][0])>=3:  # 3文字以上のみを対象
+            # remove_redundant_ruby_if_identical: "<ruby>xxx<rt>xxx</rt></ruby>" をただの "xxx" にする
+            processed_new = remove_redundant_ruby_if_identical(pre_replacements_list_2[kk][1])
+            pre_replacements_list_3.append([
+                pre_replacements_list_2[kk][0],
+                processed_new,
+                imported_placeholders_for_global_replacement[kk]
+            ])
+
+    # (12) 大文字・小文字・文頭だけ大文字(capitalize) の3パターンをそれぞれ生成
+    #      → エスペラント文中は先頭大文字などのケースもあるため
+    pre_replacements_list_4 = []
+    if format_type in ('HTML格式_Ruby文字_大小调整','HTML格式_Ruby文字_大小调整_汉字替换','HTML格式','HTML格式_汉字替换'):
+        # ルビ(HTML)系の場合、大文字化すると <ruby>や<rt>部分があるため、
+        # capitalize_ruby_and_rt() を呼んで親文字だけ大文字化するなどの処理を行う。
+        for old,new,place_holder in pre_replacements_list_3:
+            pre_replacements_list_4.append((old,new,place_holder))
+            pre_replacements_list_4.append((old.upper(), new.upper(), place_holder[:-1]+'up$'))
+            if old.startswith(' '):
+                pre_replacements_list_4.append((old[0] + old[1:].capitalize(), new[0] + capitalize_ruby_and_rt(new[1:]), place_holder[:-1]+'cap$'))
+            else:
+                pre_replacements_list_4.append((old.capitalize(), capitalize_ruby_and_rt(new), place_holder[:-1]+'cap$'))
+
+    elif format_type in ('括弧(号)格式', '括弧(号)格式_汉字替换'):
+        # 括弧形式の場合はrubyタグではなく単なる文字列なので
+        # capitalize() で単純に先頭大文字化
+        for old,new,place_holder in pre_replacements_list_3:
+            pre_replacements_list_4.append((old,new,place_holder))
+            pre_replacements_list_4.append((old.upper(), new.upper(), place_holder[:-1]+'up$'))
+            if old[0]==' ':
+                pre_replacements_list_4.append((old[0] + old[1:].capitalize(), new[0] + new[1:].capitalize(), place_holder[:-1]+'cap$'))
+            else:
+                pre_replacements_list_4.append((old.capitalize(), new.capitalize(), place_holder[:-1]+'cap$'))
+
+    elif format_type in ('替换后文字列のみ(仅)保留(简单替换)'):
+        # 単純置換の場合
+        for old,new,place_holder in pre_replacements_list_3:
+            pre_replacements_list_4.append((old,new,place_holder))
+            pre_replacements_list_4.append((old.upper(), new.upper(), place_holder[:-1]+'up$'))
+            if old[0]==' ':
+                pre_replacements_list_4.append((old[0] + old[1:].capitalize(), new[0] + new[1:].capitalize(), place_holder[:-1]+'cap$'))
+            else:
+                pre_replacements_list_4.append((old.capitalize(), new.capitalize(), place_holder[:-1]+'cap$'))
+
+    # (13) ここでいよいよ "replacements_final_list" を構築
+    #      (old, new, placeholder) のタプルをまとめる。
+    replacements_final_list = []
+    for old, new, place_holder in pre_replacements_list_4:
+        modified_placeholder = place_holder
+        # 置換対象が空白で始/終している場合、その空白をplaceholderに反映
+        if old.startswith(' '):
+            modified_placeholder = ' ' + modified_placeholder
+            if not new.startswith(' '):
+                new = ' ' + new
+        if old.endswith(' '):
+            modified_placeholder = modified_placeholder + ' '
+            if not new.endswith(' '):
+                new = new + ' '
+        replacements_final_list.append((old, new, modified_placeholder))
+    return replacements_final_list
+
+def build_replacements_list_for_2char(
+    replace_with_roots,
+    imported_placeholders_for_2char_replacement: List[str]
+) -> List[List[str]]:
+    #-------------------------------------------------------------
+    # (14) 二文字词根替换用のリスト(全域とは別)を生成
+    #      suffix_2char_roots / prefix_2char_roots / standalone_2char_roots など
+    #-------------------------------------------------------------
+    replacements_list_for_suffix_2char_roots = []
+    for i in range(len(suffix_2char_roots)):
+        replaced_suffix = remove_redundant_ruby_if_identical(replace_with_roots(suffix_2char_roots[i]))
+        replacements_list_for_suffix_2char_roots.append([
+            "$"+suffix_2char_roots[i],
+            "$"+replaced_suffix,
+            "$"+imported_placeholders_for_2char_replacement[i]
+        ])
+        replacements_list_for_suffix_2char_roots.append([
+            "$"+suffix_2char_roots[i].upper(),
+            "$"+replaced_suffix.upper(),
+            "$"+imported_placeholders_for_2char_replacement[i][:-1]+'up$'
+        ])
+        replacements_list_for_suffix_2char_roots.append([
+            "$"+suffix_2char_roots[i].capitalize(),
+            "$"+capitalize_ruby_and_rt(replaced_suffix),
+            "$"+imported_placeholders_for_2char_replacement[i][:-1]+'cap$'
+        ])
+
+    replacements_list_for_prefix_2char_roots = []
+    for i in range(len(prefix_2char_roots)):
+        replaced_prefix = remove_redundant_ruby_if_identical(replace_with_roots(prefix_2char_roots[i]))
+        replacements_list_for_prefix_2char_roots.append([
+            prefix_2char_roots[i]+"$",
+            replaced_prefix+"$",
+            imported_placeholders_for_2char_replacement[i+1000]+"$"
+        ])
+        replacements_list_for_prefix_2char_roots.append([
+            prefix_2char_roots[i].upper()+"$",
+            replaced_prefix.upper()+"$",
+            imported_placeholders_for_2char_replacement[i+1000][:-1]+'up$'+"$"
+        ])
+        replacements_list_for_prefix_2char_roots.append([
+            prefix_2char_roots[i].capitalize()+"$",
+            capitalize_ruby_and_rt(replaced_prefix)+"$",
+            imported_placeholders_for_2char_replacement[i+1000][:-1]+'cap$'+"$"
+        ])
+
+    replacements_list_for_standalone_2char_roots = []
+    for i in range(len(standalone_2char_roots)):
+        replaced_standalone = remove_redundant_ruby_if_identical(replace_with_roots(standalone_2char_roots[i]))
+        replacements_list_for_standalone_2char_roots.append([
+            " "+standalone_2char_roots[i]+" ",
+            " "+replaced_standalone+" ",
+            " "+imported_placeholders_for_2char_replacement[i+2000]+" "
+        ])
+        replacements_list_for_standalone_2char_roots.append([
+            " "+standalone_2char_roots[i].upper()+" ",
+            " "+replaced_standalone.upper()+" ",
+            " "+imported_placeholders_for_2char_replacement[i+2000][:-1]+'up$'+" "
+        ])
+        replacements_list_for_standalone_2char_roots.append([
+            " "+standalone_2char_roots[i].capitalize()+" ",
+            " "+capitalize_ruby_and_rt(replaced_standalone)+" ",
+            " "+imported_placeholders_for_2char_replacement[i+2000][:-1]+'cap$'+" "
+        ])
+
+    replacements_list_for_2char = (
+        replacements_list_for_standalone_2char_roots
+        + replacements_list_for_suffix_2char_roots
+        + replacements_list_for_prefix_2char_roots
+    )
+    return replacements_list_for_2char
+
+def build_replacements_list_for_localized_string(
+    csv_E_roots: List[str],
+    csv_hanzi_or_meanings: List[str],
+    csv_formatted: List[str],
+    format_type: str,
+    char_width_table,
+    imported_placeholders_for_local_replacement: List[str]
+) -> List[List[str]]:
+    #-------------------------------------------------------------
+    # (15) 局所的な文字列(漢字)置換用のリストを作成
+    #      これは "%"や"@"で囲まれた部分だけ置換したいときに使う想定。
+    #      CSV_data_imported にある(語根,訳)だけを対象とする。
+    #-------------------------------------------------------------
+    # そのままの形の整形結果は temporary_replacements_dict 作成時の csv_formatted を使い、大文字・先頭大文字の分をまとめて整形する
+    csv_formatted_upper = output_format_batch(
+        [E_root.upper() for E_root in csv_E_roots],
+        [hanzi_or_meaning.upper() for hanzi_or_meaning in csv_hanzi_or_meanings],
+        format_type, char_width_table
+    )
+    csv_formatted_capitalized = output_format_batch(
+        [E_root.capitalize() for E_root in csv_E_roots],
+        [hanzi_or_meaning.capitalize() for hanzi_or_meaning in csv_hanzi_or_meanings],
+        format_type, char_width_table
+    )
+    pre_replacements_list_for_localized_string_1 = []
+    for i, (E_root, hanzi_or_meaning) in enumerate(zip(csv_E_roots, csv_hanzi_or_meanings)):
+        if E_root == hanzi_or_meaning:
+            # E_rootと翻訳が同じ場合(稀だが)でも、一応3パターン(大文字/先頭大文字含む)追加
+            pre_replacements_list_for_localized_string_1.append([E_root, hanzi_or_meaning, len(E_root)])
+            pre_replacements_list_for_localized_string_1.append([E_root.upper(), hanzi_or_meaning.upper(), len(E_root)])
+            pre_replacements_list_for_localized_string_1.append([E_root.capitalize(), hanzi_or_meaning.capitalize(), len(E_root)])
+        else:
+            # それ以外は output_format() で整形したものを使う
+            pre_replacements_list_for_localized_string_1.append([E_root, csv_formatted[i], len(E_root)])
+            pre_replacements_list_for_localized_string_1.append([E_root.upper(), csv_formatted_upper[i], len(E_root)])
+            pre_replacements_list_for_localized_string_1.append([E_root.capitalize(), csv_formatted_capitalized[i], len(E_root)])
+    # 長い語根を先に置換できるようソート(文字数多い順)
+    pre_replacements_list_for_localized_string_2 = sorted(pre_replacements_list_for_localized_string_1, key=lambda x: x[2], reverse=True)
+
+    replacements_list_for_localized_string = []
+    for kk in range(len(pre_replacements_list_for_localized_string_2)):
+        replacements_list_for_localized_string.append([
+            pre_replacements_list_for_localized_string_2[kk][0],
+            pre_replacements_list_for_localized_string_2[kk][1],
+            imported_placeholders_for_local_replacement[kk]
+        ])
+    return replacements_list_for_localized_string
+
+#=================================================================
+# 6) パイプライン全体
+#=================================================================
+def build_replacement_lists(
+    CSV_data_imported: pd.DataFrame,
+    custom_stemming_setting_list: list,
+    user_replacement_item_setting_list: list,
+    format_type: str,
+    resources: Dict[str, object],
+    num_processes: int = 1,
+    build_cache_dir: Optional[str] = None,
+    progress_callback=None,
+    profiler: Optional[BuildStageProfiler] = None
+) -> Tuple[Dict[str, list], Optional[Dict[str, int]]]:
+    """
+    CSV(語根→訳)・語根分解法のJSON・置換後文字列のJSONから、置換用JSONの3つのリストを作る。
+    resources は load_build_resources() の戻り値。
+    build_cache_dir を渡すと、出力形式ごとのキャッシュを使う増分ビルドになる。
+    num_processes が 2 以上なら、語幹の分解 (pre_replacements_dict_1) を並列処理する。
+    progress_callback(処理済み件数, 全件数) で語幹の分解の進捗を受け取れる。
+    profiler を渡すと、段ごとの時間(とメモリ)を記録する。
+    戻り値は ({リスト名: リスト}, 増分ビルドの統計 (増分ビルドでなければ None))。
+    呼び出し側のリストは書き換えない。
+    """
+    char_width_table = resources["char_width_table"]
+    imported_placeholders_for_global_replacement = resources["placeholders_for_global_replacement"]
+
+    with _stage(profiler, "csv_format"):
+        # CSV の有効な行 (語根, 訳) を列として取り出し、出力形式への整形は列ごとにまとめて行う
+        csv_E_roots, csv_hanzi_or_meanings = extract_csv_rows(CSV_data_imported)
+        csv_formatted = output_format_batch(csv_E_roots, csv_hanzi_or_meanings, format_type, char_width_table)
+
+    with _stage(profiler, "root_rules"):
+        temporary_replacements_list_final = build_root_replacements_list(
+            resources["E_roots"], csv_E_roots, csv_formatted, imported_placeholders_for_global_replacement
+        )
+        # safe_replace(text, temporary_replacements_list_final) と同じ結果を返す関数。
+        # 語根(約11,000)の照合器を1回だけ作り、語幹を1回の走査で分解する。
+        # 同じ文字列(動詞語尾・2文字語根など)の結果はメモしておき、再計算しない。
+        replace_with_roots = build_memoized_safe_replacer(temporary_replacements_list_final)
+
+    # 増分ビルド用のキャッシュは出力形式ごとに別ファイル
+    format_cache_suffix = compute_json_digest(format_type)[:12]
+    with _stage(profiler, "pre_replacements_dict_1"):
+        pre_replacements_dict_1, build_stats = build_pre_replacements_dict_1(
+            resources["E_stem_with_Part_Of_Speech_list"],
+            temporary_replacements_list_final,
+            replace_with_roots,
+            num_processes,
+            os.path.join(build_cache_dir, f"pre_replacements_dict_1_{format_cache_suffix}.json")
+            if build_cache_dir is not None else None,
+            progress_callback
+        )
+
+    combined_data = build_lists_from_pre_replacements_dict_1(
+        pre_replacements_dict_1,
+        replace_with_roots,
+        temporary_replacements_list_final,
+        csv_E_roots,
+        csv_hanzi_or_meanings,
+        csv_formatted,
+        custom_stemming_setting_list,
+        user_replacement_item_setting_list,
+        format_type,
+        resources,
+        build_cache_dir,
+        profiler
+    )
+    return combined_data, build_stats
+
+def build_lists_from_pre_replacements_dict_1(
+    pre_replacements_dict_1: Dict[str, list],
+    replace_with_roots,
+    temporary_replacements_list_final: List[List[str]],
+    csv_E_roots: List[str],
+    csv_hanzi_or_meanings: List[str],
+    csv_formatted: List[str],
+    custom_stemming_setting_list: list,
+    user_replacement_item_setting_list: list,
+    format_type: str,
+    resources: Dict[str, object],
+    build_cache_dir: Optional[str] = None,
+    profiler: Optional[BuildStageProfiler] = None
+) -> Dict[str, list]:
+    """
+    (7)〜(16): pre_replacements_dict_1 から置換用JSONの3つのリストを作る。
+    build_cache_dir を渡すと、(7)〜(10) の結果を入力のハッシュをキーに再利用する。
+    呼び出し側のユーザー設定のリストは書き換えない。
+    """
+    # ユーザー設定のリストは (9)(10) の処理中に書き換えられるので、複製してから使う
+    custom_stemming_setting_list = copy.deepcopy(custom_stemming_setting_list)
+    user_replacement_item_setting_list = copy.deepcopy(user_replacement_item_setting_list)
+    char_width_table = resources["char_width_table"]
+    imported_placeholders_for_global_replacement = resources["placeholders_for_global_replacement"]
+
+    def build_dict_3() -> Dict[str, list]:
+        return build_pre_replacements_dict_3(
+            pre_replacements_dict_1,
+            replace_with_roots,
+            custom_stemming_setting_list,
+            user_replacement_item_setting_list,
+            format_type,
+            char_width_table,
+            profiler
+        )
+
+    with _stage(profiler, "pre_replacements_dict_3"):
+        if build_cache_dir is not None:
+            # (7)〜(10) は入力全体(pre_replacements_dict_1・置換ルール・ユーザー設定JSON・出力形式)のハッシュをキーに再利用する
+            # (カスタム設定のリストは処理中に書き換えられるので、先にハッシュを取っておく)
+            dict_3_cache_key = compute_json_digest(
+                pre_replacements_dict_1,
+                temporary_replacements_list_final,
+                custom_stemming_setting_list,
+                user_replacement_item_setting_list,
+                format_type
+            )
+            format_cache_suffix = compute_json_digest(format_type)[:12]
+            pre_replacements_dict_3, _ = load_or_build_cached_stage(
+                os.path.join(build_cache_dir, f"pre_replacements_dict_3_{format_cache_suffix}.json"),
+                dict_3_cache_key,
+                build_dict_3
+            )
+        else:
+            pre_replacements_dict_3 = build_dict_3()
+
+    with _stage(profiler, "final_list"):
+        replacements_final_list = build_replacements_final_list(
+            pre_replacements_dict_3, format_type, imported_placeholders_for_global_replacement
+        )
+    with _stage(profiler, "2char_list"):
+        replacements_list_for_2char = build_replacements_list_for_2char(
+            replace_with_roots, resources["placeholders_for_2char_replacement"]
+        )
+    with _stage(profiler, "localized_list"):
+        replacements_list_for_localized_string = build_replacements_list_for_localized_string(
+            csv_E_roots, csv_hanzi_or_meanings, csv_formatted, format_type, char_width_table,
+            resources["placeholders_for_local_replacement"]
+        )
+
+    #=============================================================
+    # (16) 3種類のリストをまとめる
+    #   - 全域替换用のリスト(列表)型配列 → replacements_final_list
+    #   - 二文字词根替换用のリスト(列表)型配列 → replacements_list_for_2char
+    #   - 局部文字替换用のリスト(列表)型配列 → replacements_list_for_localized_string
+    #=============================================================
+    combined_data = {}
+    combined_data[GLOBAL_LIST_KEY] = replacements_final_list
+    combined_data[TWO_CHAR_LIST_KEY] = replacements_list_for_2char
+    combined_data[LOCALIZED_LIST_KEY] = replacements_list_for_localized_string
+    return combined_data
+
+def _is_string_rule_list(rules) -> bool:
+    """rules が「文字列だけから成る空でないリスト」のリストかどうか。"""
+    return isinstance(rules, (list, tuple)) and all(
+        isinstance(rule, (list, tuple)) and rule and all(isinstance(item, str) for item in rule)
+        for rule in rules
+    )
+
+def serialize_replacement_lists(combined_data: Dict[str, list], profiler: Optional[BuildStageProfiler] = None) -> str:
+    """
+    build_replacement_lists の結果を、ダウンロード用の JSON 文字列にする。
+    json.dumps(combined_data, ensure_ascii=False, indent=2) と同じ文字列になる。
+    (indent を付けた json.dumps は Python 実装の encoder で1要素ずつ書き出すので遅い。
+     置換ルールは文字列のリストなので、文字列の書き方だけを json に任せて全体を直接組み立てる)
+    """
+    with _stage(profiler, "serialize"):
+        if not combined_data or not all(
+            isinstance(key, str) and _is_string_rule_list(rules) for key, rules in combined_data.items()
+        ):
+            return json.dumps(combined_data, ensure_ascii=False, indent=2)
+        encode = json.encoder.encode_basestring  # ensure_ascii=False のときの文字列の書き方
+        parts = []
+        for key, rules in combined_data.items():
+            if rules:
+                body = ",\n".join("    [\n      " + ",\n      ".join(map(encode, rule)) + "\n    ]" for rule in rules)
+                parts.append(f"  {encode(key)}: [\n{body}\n  ]")
+            else:
+                parts.append(f"  {encode(key)}: []")
+        return "{\n" + ",\n".join(parts) + "\n}"
+
+#=================================================================
+# 6-2) 全ての出力形式に共通する中間表現
+#=================================================================
+# 出力形式によって変わるのは、語根を置き換える文字列 (output_format の結果) だけで、
+# 語根ルールの並び (長い語根が先)・placeholder、PEJVO の語幹のどこがどの語根に一致するか、
+# 品詞のまとめ方は、どの形式でも同じになる。そこで語幹ごとの分解を
+# 「置換されない部分 + 一致した語根ルールの添字」の列 (中間表現) として1回だけ求めておき、
+# 形式ごとには、その形式の置換後文字列を埋め込むだけで pre_replacements_dict_1 を作る。
+# (7)〜(10) の優先順位の調整は置換後の文字列どうしの比較で分岐する箇所がある
+# (例: 訳が同じ2つの語根は、訳だけを残す形式では同じ文字列になる) ので形式ごとに行うが、
+# そこで使う語根の置換 (動詞語尾・AN/ON・ユーザー設定など) でも、分解は全形式で使い回す。
+class FormatNeutralReplacementBuild:
+    """
+    CSV・ユーザー設定・同梱ファイルから、出力形式に依らない語幹の分解を1回だけ求めておき、
+    render(format_type) で形式ごとの置換用JSONの3つのリストを作る。
+    結果は並列処理・増分ビルドなしの build_replacement_lists と同じになる。
+    num_processes が 2 以上なら、語幹の分解を並列処理する。
+    ワーカープロセスに pickle で渡せる (分解のメモは渡さない)。
+    """
+
+    def __init__(
+        self,
+        CSV_data_imported: pd.DataFrame,
+        custom_stemming_setting_list: list,
+        user_replacement_item_setting_list: list,
+        resources: Dict[str, object],
+        num_processes: int = 1,
+        progress_callback=None,
+        profiler: Optional[BuildStageProfiler] = None
+    ):
+        self.CSV_data_imported = CSV_data_imported
+        self.custom_stemming_setting_list = copy.deepcopy(custom_stemming_setting_list)
+        self.user_replacement_item_setting_list = copy.deepcopy(user_replacement_item_setting_list)
+        self.resources = resources
+        self._decompose = None
+        self._decompose_memo: Dict[str, object] = {}
+
+        with _stage(profiler, "csv_rows"):
+            self.csv_E_roots, self.csv_hanzi_or_meanings = extract_csv_rows(CSV_data_imported)
+        with _stage(profiler, "root_rules"):
+            # 置換後文字列を語根そのものにした語根ルール (old と placeholder の並びは全ての形式で同じ)
+            self.root_rules = build_root_replacements_list(
+                resources["E_roots"], self.csv_E_roots, self.csv_E_roots,
+                resources["placeholders_for_global_replacement"]
+            )
+        # 語幹 → [分解 (照合器が使えない語幹は None), 品詞]。照合器が使えない語根ルールなら None
+        self.stem_decompositions = None
+        decompose = build_safe_replace_decomposer(self.root_rules)
+        if decompose is not None:
+            with _stage(profiler, "stem_decomposition"):
+                self.stem_decompositions = self._decompose_stems(decompose, num_processes, progress_callback)
+
+    def __getstate__(self):
+        # 分解用の関数 (照合器を閉じ込めたもの) は pickle できないので、メモと一緒に渡さない
+        state = self.__dict__.copy()
+        state["_decompose"] = None
+        state["_decompose_memo"] = {}
+        return state
+
+    def _decompose_stems(self, decompose, num_processes: int, progress_callback) -> Dict[str, list]:
+        """(6) PEJVO の全語幹を分解し、品詞をまとめる (まとめ方は並列処理なしの build_pre_replacements_dict_1 と同じ)。"""
+        E_stem_with_Part_Of_Speech_list = self.resources["E_stem_with_Part_Of_Speech_list"]
+        stems = []
+        seen = set()
+        for item in E_stem_with_Part_Of_Speech_list:
+            if len(item) == 2 and len(item[0]) >= 2 and item[0] not in seen:
+                seen.add(item[0])
+                stems.append(item[0])
+
+        total = len(stems)
+        if num_processes > 1 and total >= num_processes * 100:
+            decompositions = dict(zip(stems, parallel_decompose_many(stems, self.root_rules, num_processes)))
+        else:
+            decompositions = {}
+            for i, stem in enumerate(stems):
+                decompositions[stem] = decompose(stem)
+                if progress_callback is not None and i % 1000 == 0:
+                    progress_callback(i + 1, total)
+        if progress_callback is not None:
+            progress_callback(total, total)
+
+        stem_decompositions = {}
+        for j in E_stem_with_Part_Of_Speech_list:
+            if len(j) == 2 and len(j[0]) >= 2:
+                if j[0] in stem_decompositions:
+                    if j[1] not in stem_decompositions[j[0]][1]:
+                        stem_decompositions[j[0]] = [
+                            stem_decompositions[j[0]][0],
+                            stem_decompositions[j[0]][1] + ',' + j[1]
+                        ]
+                else:
+                    stem_decompositions[j[0]] = [decompositions[j[0]], j[1]]
+        for key in EXCLUDED_STEMS:
+            stem_decompositions.pop(key, None)
+        return stem_decompositions
+
+    def _decompose_text(self, text: str):
+        """text の分解 (全ての形式で使い回すのでメモしておく)。"""
+        if text in self._decompose_memo:
+            return self._decompose_memo[text]
+        if self._decompose is None:
+            self._decompose = build_safe_replace_decomposer(self.root_rules)
+        decomposition = self._decompose_memo[text] = self._decompose(text)
+        return decomposition
+
+    def render(
+        self,
+        format_type: str,
+        build_cache_dir: Optional[str] = None,
+        profiler: Optional[BuildStageProfiler] = None
+    ) -> Dict[str, list]:
+        """
+        format_type の置換用JSONの3つのリスト ({リスト名: リスト}) を作る。
+        build_cache_dir を渡すと、(7)〜(10) の結果を入力のハッシュをキーに再利用する。
+        """
+        with _stage(profiler, "csv_format"):
+            csv_formatted = output_format_batch(
+                self.csv_E_roots, self.csv_hanzi_or_meanings, format_type, self.resources["char_width_table"]
+            )
+        with _stage(profiler, "root_rules"):
+            # build_root_replacements_list と同じく、CSV にある語根だけを整形済みの訳に置き換える
+            formatted_roots = dict(zip(self.csv_E_roots, csv_formatted))
+            temporary_replacements_list_final = [
+                [old, formatted_roots.get(old, old), placeholder] for old, _, placeholder in self.root_rules
+            ]
+            rendered_news = None
+            if self.stem_decompositions is not None:
+                rendered_news = rendered_news_for_decomposition(self.root_rules, temporary_replacements_list_final)
+
+        if rendered_news is None:
+            # この形式の置換後文字列では分解を使い回せない (placeholder の区切り文字を含む等) ので、1形式ずつ生成する
+            combined_data, _ = build_replacement_lists(
+                self.CSV_data_imported,
+                self.custom_stemming_setting_list,
+                self.user_replacement_item_setting_list,
+                format_type,
+                self.resources,
+                build_cache_dir=build_cache_dir,
+                profiler=profiler
+            )
+            return combined_data
+
+        def replace_with_roots(text: str) -> str:
+            # safe_replace(text, temporary_replacements_list_final) と同じ結果
+            decomposition = self._decompose_text(text)
+            if decomposition is None:
+                return safe_replace(text, temporary_replacements_list_final)
+            return render_safe_replace_decomposition(decomposition, rendered_news)
+
+        with _stage(profiler, "pre_replacements_dict_1"):
+            pre_replacements_dict_1 = {}
+            for stem, (decomposition, pos) in self.stem_decompositions.items():
+                if decomposition is None:
+                    replaced_stem = safe_replace(stem, temporary_replacements_list_final)
+                else:
+                    replaced_stem = render_safe_replace_decomposition(decomposition, rendered_news)
+                pre_replacements_dict_1[stem] = [replaced_stem, pos]
+
+        return build_lists_from_pre_replacements_dict_1(
+            pre_replacements_dict_1,
+            replace_with_roots,
+            temporary_replacements_list_final,
+            self.csv_E_roots,
+            self.csv_hanzi_or_meanings,
+            csv_formatted,
+            self.custom_stemming_setting_list,
+            self.user_replacement_item_setting_list,
+            format_type,
+            self.resources,
+            build_cache_dir,
+            profiler
+        )
+
+#=================================================================
+# 7) コマンドライン (生成処理のベンチマーク)
+#=================================================================
+def bundled_csv_files(data_dir: str = DATA_DIR) -> List[str]:
+    """同梱の語根→訳の CSV ファイルの一覧"""
+    return sorted(glob.glob(os.path.join(data_dir, "*.csv")))
+
+def profile_build(
+    csv_path: str,
+    format_type: str,
+    resources: Dict[str, object],
+    custom_stemming_setting_list: list,
+    user_replacement_item_setting_list: list,
+    num_processes: int = 1,
+    build_cache_dir: Optional[str] = None,
+    trace_memory: bool = False
+) -> Dict[str, object]:
+    """
+    csv_path の CSV と format_type で置換用JSONを1回生成し、段ごとの計測結果を返す。
+    safe_replace のメモは毎回空にしてから始める (前の計測の結果を使わないように)。
+    """
+    clear_safe_replace_memo()
+    profiler = BuildStageProfiler(trace_memory)
+    try:
+        with _stage(profiler, "read_csv"):
+            with open(csv_path, "r", encoding="utf-8") as f:
+                CSV_data_imported = read_root_translation_csv(f.read())
+        combined_data, _ = build_replacement_lists(
+            CSV_data_imported,
+            custom_stemming_setting_list,
+            user_replacement_item_setting_list,
+            format_type,
+            resources,
+            num_processes=num_processes,
+            build_cache_dir=build_cache_dir,
+            profiler=profiler
+        )
+        download_data = serialize_replacement_lists(combined_data, profiler)
+    finally:
+        profiler.close()
+    memo_stats = get_safe_replace_memo_stats()
+    return {
+        "csv": os.path.basename(csv_path),
+        "format_type": format_type,
+        "num_processes": num_processes,
+        "incremental": build_cache_dir is not None,
+        "total_seconds": profiler.total_seconds(),
+        "output_bytes": len(download_data.encode("utf-8")),
+        "rule_counts": {key: len(value) for key, value in combined_data.items()},
+        "safe_replace_memo": memo_stats,
+        "stages": profiler.records,
+        "summary": profiler.summary_lines(),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="置換用JSONの生成処理を段ごとに計測する (Streamlit は使わない)"
+    )
+    parser.add_argument("--csv", action="append", default=[],
+                        help="語根→訳の CSV (繰り返し指定できる。省略時は既定の CSV)")
+    parser.add_argument("--all-csvs", action="store_true", help="同梱の CSV をすべて計測する")
+    parser.add_argument("--formats", default=FORMAT_TYPES[0],
+                        help="出力形式 (カンマ区切り、all なら7種類すべて)")
+    parser.add_argument("--stemming-json", default=DEFAULT_STEMMING_JSON_FILE,
+                        help="語根分解法のユーザー設定 JSON")
+    parser.add_argument("--replacement-json", default=DEFAULT_REPLACEMENT_JSON_FILE,
+                        help="置換後文字列のユーザー設定 JSON")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="語幹の分解に使うプロセス数 (1 なら並列化しない)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="増分ビルドのキャッシュを使う (既定では毎回すべて計算する)")
+    parser.add_argument("--build-cache-dir", default=DEFAULT_BUILD_CACHE_DIR,
+                        help="--incremental のときのキャッシュの保存先")
+    parser.add_argument("--memory", action="store_true",
+                        help="tracemalloc で段ごとのメモリ使用量も測る (処理は遅くなる)")
+    parser.add_argument("--repeat", type=int, default=1, help="1条件あたりの計測回数")
+    parser.add_argument("--json-out", default=None, help="計測結果を書き出す JSON ファイル")
+    args = parser.parse_args(argv)
+
+    format_types = FORMAT_TYPES if args.formats == "all" else [f for f in args.formats.split(",") if f]
+    unknown = [f for f in format_types if f not in FORMAT_TYPES]
+    if unknown:
+        parser.error(f"未知の出力形式です: {', '.join(unknown)}")
+    csv_paths = bundled_csv_files() if args.all_csvs else (args.csv or [DEFAULT_CSV_FILE])
+
+    with open(args.stemming_json, "r", encoding="utf-8") as g:
+        custom_stemming_setting_list = json.load(g)
+    with open(args.replacement_json, "r", encoding="utf-8") as g:
+        user_replacement_item_setting_list = json.load(g)
+
+    start = time.perf_counter()
+    resources = load_build_resources()
+    print(f"[読み込み] 同梱ファイル {time.perf_counter() - start:.3f} s", flush=True)
+
+    results = []
+    for csv_path in csv_paths:
+        for format_type in format_types:
+            for _ in range(args.repeat):
+                result = profile_build(
+                    csv_path,
+                    format_type,
+                    resources,
+                    custom_stemming_setting_list,
+                    user_replacement_item_setting_list,
+                    num_processes=args.processes,
+                    build_cache_dir=args.build_cache_dir if args.incremental else None,
+                    trace_memory=args.memory
+                )
+                results.append(result)
+                print(f"\n{result['csv']} / {format_type} / x{args.processes}", flush=True)
+                for line in result["summary"]:
+                    print("  " + line, flush=True)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"[完了] 結果を '{args.json_out}' に保存しました。")
+    return 0
+
+
+if __name__ == '__main__':
+    # Windows などでマルチプロセスを正常に動かすため
+    multiprocessing.set_start_method('spawn', force=True)
+    sys.exit(main())
@@ -6,18 +6,42 @@
 【構成】
 1) 文字変換用の辞書定義 (字上符形式への変換など)
 2) 基本の文字形式変換関数 (replace_esperanto_chars, convert_to_circumflex, など)
-3) 文字幅計測＆<br>挿入関数 (measure_text_width_Arial16, insert_br_at_half_width, insert_br_at_third_width)
-4) 出力フォーマット (output_format) 関連
+3) 文字幅計測＆<br>挿入関数 (load_char_width_table, measure_text_width_Arial16, insert_br_at_half_width, insert_br_at_third_width)
+4) 出力フォーマット (output_format, output_format_batch) 関連
 5) 文字列判定・placeholder インポートなどの補助関数
-6) multiprocessing 関連の並列置換用関数 (process_chunk_for_pre_replacements, parallel_build_pre_replacements_dict)
+6) 語幹の置換 (build_safe_replacer, build_memoized_safe_replacer) と multiprocessing 関連の並列置換用関数 (process_chunk_for_pre_replacements, parallel_build_pre_replacements_dict)
+   (置換後文字列に依らない語幹の分解 → build_safe_replace_decomposer / rendered_news_for_decomposition /
+    render_safe_replace_decomposition / parallel_decompose_many)
+7) 置換用JSONの増分ビルド用のキャッシュ (build_pre_replacements_dict_1_incremental, load_or_build_cached_stage)
 """
 
 import re
 import json
+import hashlib
 import multiprocessing
-import pandas as pd
 import os
-from typing import List, Dict, Tuple, Optional
+import sys
+import tempfile
+import warnings
+import threading
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left
+from itertools import accumulate
+from typing import List, Dict, Tuple, Optional, Union
+
+from esp_replacement_binary_module import (
+    SharedRuleSet,
+    attach_shared_rule_set,
+    compute_file_sha256,
+    is_compiled_rule_set_fresh
+)
+from esp_text_replacement_module import (
+    get_multi_pattern_matcher,
+    context_widths,
+    find_prioritized_matches,
+    split_by_prioritized_matches
+)
 
 #=================================================================
 # 1) エスペラント文字変換用の辞書 (同様のものが他のファイルにもある)
@@ -51,60 +75,136 @@ def convert_to_circumflex(text: str) -> str:
 
 #=================================================================
 # 3) 文字幅計測 & <br> 挿入関数
+#   文字幅は "Unicode_BMP全范围文字幅(宽)_Arial16.json" ({文字: 幅(px)}) を
+#   コードポイント → 幅 の配列 (array('H')、65,536 要素) にした「文字幅表」で引く。
+#   JSON (約800KB) を毎回 json.load するかわりに、表のバイト列を JSON の隣に保存して再利用する。
 #=================================================================
-def measure_text_width_Arial16(text, char_widths_dict: Dict[str, int]) -> int:
+DEFAULT_CHAR_WIDTH = 8  # 表に無い文字 (BMP 外の文字など) の幅
+CHAR_WIDTH_TABLE_SIZE = 0x10000
+CHAR_WIDTH_TABLE_MAGIC = b"ESPWIDTH"
+CHAR_WIDTH_TABLE_VERSION = 1
+CHAR_WIDTH_TABLE_SUFFIX = ".widths"
+
+# 文字幅表 (array('H')) か、従来どおりの {文字: 幅} の辞書
+CharWidthTable = Union[array, Dict[str, int]]
+
+def build_char_width_table(char_widths_dict: Dict[str, int]) -> array:
+    """{文字: 幅(px)} の辞書から、コードポイント → 幅 の文字幅表を作る。"""
+    table = array("H", [DEFAULT_CHAR_WIDTH]) * CHAR_WIDTH_TABLE_SIZE
+    for ch, width in char_widths_dict.items():
+        if len(ch) == 1 and ord(ch) < CHAR_WIDTH_TABLE_SIZE:
+            table[ord(ch)] = width
+    return table
+
+def char_width_table_path(json_path: str) -> str:
+    """文字幅JSONに対応する文字幅表ファイルの既定のパス(拡張子だけ .widths に変えたもの)"""
+    return os.path.splitext(json_path)[0] + CHAR_WIDTH_TABLE_SUFFIX
+
+def _read_char_width_table(path: str, json_path: str) -> Optional[array]:
+    """保存済みの文字幅表を読む。無い・壊れている・元JSONが変わっている場合は None。"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(CHAR_WIDTH_TABLE_MAGIC)) != CHAR_WIDTH_TABLE_MAGIC:
+                return None
+            header = json.loads(f.readline().decode("utf-8"))
+            if header.get("version") != CHAR_WIDTH_TABLE_VERSION or not is_compiled_rule_set_fresh(header, json_path):
+                return None
+            table = array("H")
+            table.frombytes(f.read())
+    except (OSError, ValueError, KeyError):
+        return None
+    if len(table) != CHAR_WIDTH_TABLE_SIZE:
+        return None
+    if sys.byteorder != "little":
+        table.byteswap()
+    return table
+
+def _write_char_width_table(path: str, json_path: str, table: array) -> None:
+    stat = os.stat(json_path)
+    header = {
+        "version": CHAR_WIDTH_TABLE_VERSION,
+        "source": {"sha256": compute_file_sha256(json_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+    }
+    data = array("H", table)
+    if sys.byteorder != "little":
+        data.byteswap()
+    # JSON生成ページは読み込みのたびにここを通り、複数のセッションが同時に書くことがあるので、
+    # 書き込みごとに別名の一時ファイルに書いてから置き換える
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            f.write(CHAR_WIDTH_TABLE_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # 保存できなくても (読み取り専用の環境など) 表はそのまま使える
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_char_width_table(json_path: str, table_path: Optional[str] = None) -> array:
+    """
+    文字幅JSONから文字幅表を読み込む。
+    table_path (省略時は JSON の隣の .widths) に元JSONと一致する表があればそれを使い、
+    無ければ JSON から作って保存しておく。
     """
-    JSONで読み込んだ {文字: 幅(px)} の辞書を使い、
+    if table_path is None:
+        table_path = char_width_table_path(json_path)
+    table = _read_char_width_table(table_path, json_path)
+    if table is None:
+        with open(json_path, "r", encoding="utf-8") as fp:
+            table = build_char_width_table(json.load(fp))
+        _write_char_width_table(table_path, json_path, table)
+    return table
+
+def char_widths_of(text: str, char_width_table: CharWidthTable) -> List[int]:
+    """text の各文字の幅(px)のリストを返す。"""
+    if isinstance(char_width_table, dict):
+        return [char_width_table.get(ch, DEFAULT_CHAR_WIDTH) for ch in text]
+    if not text or max(text) < '\U00010000':
+        # 全て BMP 内なら、コードポイントで表を直接引く (文字ごとの Python の処理を挟まない)
+        return list(map(char_width_table.__getitem__, map(ord, text)))
+    return [char_width_table[code] if code < CHAR_WIDTH_TABLE_SIZE else DEFAULT_CHAR_WIDTH
+            for code in map(ord, text)]
+
+def measure_text_width_Arial16(text, char_width_table: CharWidthTable) -> int:
+    """
+    文字幅表 (または JSONで読み込んだ {文字: 幅(px)} の辞書) を使い、
     text の合計幅を算出する
     """
-    total_width = 0
-    for ch in text:
-        char_width = char_widths_dict.get(ch, 8)
-        total_width += char_width
-    return total_width
+    return sum(char_widths_of(text, char_width_table))
 
-def insert_br_at_half_width(text, char_widths_dict: Dict[str, int]) -> str:
+def insert_br_at_half_width(text, char_width_table: CharWidthTable) -> str:
     """
     文字列幅が半分を超えたら <br> を入れる
     """
-    total_width = measure_text_width_Arial16(text, char_widths_dict)
-    half_width = total_width / 2
-
-    current_width = 0
-    insert_index = None
-    for i, ch in enumerate(text):
-        char_width = char_widths_dict.get(ch, 8)
-        current_width += char_width
-        if current_width >= half_width:
-            insert_index = i + 1
-            break
-
-    if insert_index is not None:
-        result = text[:insert_index] + "<br>" + text[insert_index:]
-    else:
-        result = text
-    return result
-
-def insert_br_at_third_width(text, char_widths_dict: Dict[str, int]) -> str:
+    cumulative_widths = list(accumulate(char_widths_of(text, char_width_table)))
+    if not cumulative_widths:
+        return text
+    half_width = cumulative_widths[-1] / 2
+    # 累積幅が初めて半分以上になる文字の直後
+    insert_index = bisect_left(cumulative_widths, half_width) + 1
+    return text[:insert_index] + "<br>" + text[insert_index:]
+
+def insert_br_at_third_width(text, char_width_table: CharWidthTable) -> str:
     """
     文字列幅を三等分し、1/3 と 2/3 の位置に <br> を挿入する
     """
-    total_width = measure_text_width_Arial16(text, char_widths_dict)
-    third_width = total_width / 3
-    thresholds = [third_width, third_width*2]
-
-    current_width = 0
-    insert_indices = []
-    found_first = False
-    for i, ch in enumerate(text):
-        char_width = char_widths_dict.get(ch, 8)
-        current_width += char_width
-        if not found_first and current_width >= thresholds[0]:
-            insert_indices.append(i+1)
-            found_first = True
-        elif found_first and current_width >= thresholds[1]:
-            insert_indices.append(i+1)
-            break
+    cumulative_widths = list(accumulate(char_widths_of(text, char_width_table)))
+    if not cumulative_widths:
+        return text
+    third_width = cumulative_widths[-1] / 3
+
+    # 1つ目: 累積幅が初めて 1/3 以上になる文字の直後
+    first = bisect_left(cumulative_widths, third_width)
+    insert_indices = [first + 1]
+    # 2つ目: 1つ目より後ろの文字のうち、累積幅が初めて 2/3 以上になる文字の直後
+    second = max(bisect_left(cumulative_widths, third_width * 2), first + 1)
+    if second < len(cumulative_widths):
+        insert_indices.append(second + 1)
 
     result = text
     for idx in reversed(insert_indices):
@@ -113,66 +213,63 @@ def insert_br_at_third_width(text, char_widths_dict: Dict[str, int]) -> str:
 
 #=================================================================
 # 4) 出力フォーマット (HTML/括弧形式等)
+#   output_format_batch は語根・訳の列(リスト)をまとめて受け取り、
+#   形式の分岐は1回だけ、文字幅は列ごとにまとめて計算する (JSON生成では CSV の全行 × 3通りを整形する)。
 #=================================================================
-def output_format(main_text, ruby_content, format_type, char_widths_dict):
+# ルビの大きさの階級: 「ルビ側の幅 / 親文字側の幅」がしきい値を超えるごとに1段小さくする
+RUBY_SIZE_RATIO_THRESHOLDS = (9/8, 9/7, 9/6, 9/5, 9/4, 9/3, 6)
+RUBY_SIZE_CLASSES = ("XXL_L", "XL_L", "L_L", "M_M", "S_S", "XS_S", "XXS_S", "XXXS_S")
+# 小さい階級ではルビを改行する (XXS_S: 幅の半分の位置、XXXS_S: 1/3 と 2/3 の位置)
+RUBY_LINE_BREAKERS = {"XXS_S": insert_br_at_half_width, "XXXS_S": insert_br_at_third_width}
+
+# 文字幅を使わない形式のひな形 ({main}: エスペラント語根, {ruby}: 訳/漢字)
+SIMPLE_OUTPUT_FORMAT_TEMPLATES = {
+    'HTML格式': '<ruby>{main}<rt>{ruby}</rt></ruby>',
+    'HTML格式_汉字替换': '<ruby>{ruby}<rt>{main}</rt></ruby>',
+    '括弧(号)格式': '{main}({ruby})',
+    '括弧(号)格式_汉字替换': '{ruby}({main})',
+    '替换后文字列のみ(仅)保留(简单替换)': '{ruby}',
+}
+
+def _format_size_adjusted_ruby(bases: List[str], rt_texts: List[str], char_width_table: CharWidthTable) -> List[str]:
     """
-    エスペラント語根(main_text) と それに対応する訳/漢字(ruby_content) を
-    指定の format_type で繋ぎ合わせる
+    <ruby>base<rt class="階級">rt_text</rt></ruby> をまとめて作る。
+    階級は (rt_text の幅 / base の幅) で決める。
+    """
+    rt_widths = [measure_text_width_Arial16(text, char_width_table) for text in rt_texts]
+    base_widths = [measure_text_width_Arial16(text, char_width_table) for text in bases]
+    results = []
+    for base, rt_text, rt_width, base_width in zip(bases, rt_texts, rt_widths, base_widths):
+        size_class = RUBY_SIZE_CLASSES[bisect_left(RUBY_SIZE_RATIO_THRESHOLDS, rt_width / base_width)]
+        line_breaker = RUBY_LINE_BREAKERS.get(size_class)
+        if line_breaker is not None:
+            rt_text = line_breaker(rt_text, char_width_table)
+        results.append(f'<ruby>{base}<rt class="{size_class}">{rt_text}</rt></ruby>')
+    return results
+
+def output_format_batch(main_texts: List[str], ruby_contents: List[str], format_type: str,
+                        char_width_table: CharWidthTable) -> List[Optional[str]]:
+    """
+    output_format(main_texts[i], ruby_contents[i], format_type, char_width_table) を全ての i について
+    まとめて行い、結果のリストを返す (未知の format_type では各要素が None)。
     """
     if format_type == 'HTML格式_Ruby文字_大小调整':
-        width_ruby = measure_text_width_Arial16(ruby_content, char_widths_dict)
-        width_main = measure_text_width_Arial16(main_text, char_widths_dict)
-        ratio_1 = width_ruby / width_main
-
-        if ratio_1 > 6:
-            return f'<ruby>{main_text}<rt class="XXXS_S">{insert_br_at_third_width(ruby_content, char_widths_dict)}</rt></ruby>'
-        elif ratio_1 > (9/3):
-            return f'<ruby>{main_text}<rt class="XXS_S">{insert_br_at_half_width(ruby_content, char_widths_dict)}</rt></ruby>'
-        elif ratio_1 > (9/4):
-            return f'<ruby>{main_text}<rt class="XS_S">{ruby_content}</rt></ruby>'
-        elif ratio_1 > (9/5):
-            return f'<ruby>{main_text}<rt class="S_S">{ruby_content}</rt></ruby>'
-        elif ratio_1 > (9/6):
-            return f'<ruby>{main_text}<rt class="M_M">{ruby_content}</rt></ruby>'
-        elif ratio_1 > (9/7):
-            return f'<ruby>{main_text}<rt class="L_L">{ruby_content}</rt></ruby>'
-        elif ratio_1 > (9/8):
-            return f'<ruby>{main_text}<rt class="XL_L">{ruby_content}</rt></ruby>'
-        else:
-            return f'<ruby>{main_text}<rt class="XXL_L">{ruby_content}</rt></ruby>'
-
-    elif format_type == 'HTML格式_Ruby文字_大小调整_汉字替换':
+        return _format_size_adjusted_ruby(main_texts, ruby_contents, char_width_table)
+    if format_type == 'HTML格式_Ruby文字_大小调整_汉字替换':
         # main と ruby の立場を逆転したような形式
-        width_ruby = measure_text_width_Arial16(ruby_content, char_widths_dict)
-        width_main = measure_text_width_Arial16(main_text, char_widths_dict)
-        ratio_2 = width_main / width_ruby
-        if ratio_2 > 6:
-            return f'<ruby>{ruby_content}<rt class="XXXS_S">{insert_br_at_third_width(main_text, char_widths_dict)}</rt></ruby>'
-        elif ratio_2 > (9/3):
-            return f'<ruby>{ruby_content}<rt class="XXS_S">{insert_br_at_half_width(main_text, char_widths_dict)}</rt></ruby>'
-        elif ratio_2 > (9/4):
-            return f'<ruby>{ruby_content}<rt class="XS_S">{main_text}</rt></ruby>'
-        elif ratio_2 > (9/5):
-            return f'<ruby>{ruby_content}<rt class="S_S">{main_text}</rt></ruby>'
-        elif ratio_2 > (9/6):
-            return f'<ruby>{ruby_content}<rt class="M_M">{main_text}</rt></ruby>'
-        elif ratio_2 > (9/7):
-            return f'<ruby>{ruby_content}<rt class="L_L">{main_text}</rt></ruby>'
-        elif ratio_2 > (9/8):
-            return f'<ruby>{ruby_content}<rt class="XL_L">{main_text}</rt></ruby>'
-        else:
-            return f'<ruby>{ruby_content}<rt class="XXL_L">{main_text}</rt></ruby>'
-
-    elif format_type == 'HTML格式':
-        return f'<ruby>{main_text}<rt>{ruby_content}</rt></ruby>'
-    elif format_type == 'HTML格式_汉字替换':
-        return f'<ruby>{ruby_content}<rt>{main_text}</rt></ruby>'
-    elif format_type == '括弧(号)格式':
-        return f'{main_text}({ruby_content})'
-    elif format_type == '括弧(号)格式_汉字替换':
-        return f'{ruby_content}({main_text})'
-    elif format_type == '替换后文字列のみ(仅)保留(简单替换)':
-        return f'{ruby_content}'
+        return _format_size_adjusted_ruby(ruby_contents, main_texts, char_width_table)
+    template = SIMPLE_OUTPUT_FORMAT_TEMPLATES.get(format_type)
+    if template is None:
+        return [None] * len(main_texts)
+    return [template.format(main=main_text, ruby=ruby_content)
+            for main_text, ruby_content in zip(main_texts, ruby_contents)]
+
+def output_format(main_text, ruby_content, format_type, char_width_table: CharWidthTable):
+    """
+    エスペラント語根(main_text) と それに対応する訳/漢字(ruby_content) を
+    指定の format_type で繋ぎ合わせる
+    """
+    return output_format_batch([main_text], [ruby_content], format_type, char_width_table)[0]
 
 #=================================================================
 # 5) 文字列判定・placeholder インポート等の補助関数
@@ -241,13 +338,188 @@ def safe_replace(text: str, replacements: List[Tuple[str, str, str]]) -> str:
         text = text.replace(placeholder, new)
     return text
 
-def process_chunk_for_pre_replacements(
-    chunk: List[List[str]],
+# 語幹(約44,000)ごとに safe_replace で全語根ルール(約11,000)の `old in text` を調べると
+# 「語幹数 × ルール数」回の部分文字列検索になり、JSON生成の大半の時間を占める。
+# そこで main ページの大域置換と同じ多パターン照合器 (語根の先頭2文字 → 長さの表) を1回だけ作り、
+# 語幹を左から1回走査して分解する。優先順位(リストの並び順 = 長い語根が先)の扱いは
+# find_prioritized_matches が safe_replace の逐次置換と同じになるように確定させる。
+def _placeholder_delimiters_if_matchable(replacements: List[Tuple[str, str, str]]) -> Optional[str]:
+    """
+    照合器で safe_replace と同じ結果になるかを調べ、なる場合は placeholder の区切り文字 (例: '$') を返す。
+    次の場合は None (照合器を使わない):
+    - old が空文字列 (safe_replace では全ての文字の間に placeholder が入る)
+    - old に placeholder を構成する文字が含まれる (置換済みの placeholder の内部に一致し得る)
+    - new に placeholder の区切り文字が含まれる (後の placeholder→new の置換に巻き込まれ得る)
+    """
+    placeholder_chars = set()
+    delimiters = set()
+    for _, _, placeholder in replacements:
+        placeholder_chars.update(placeholder)
+        if placeholder:
+            delimiters.add(placeholder[0])
+            delimiters.add(placeholder[-1])
+    for old, new, _ in replacements:
+        if not old or not placeholder_chars.isdisjoint(old) or not delimiters.isdisjoint(new):
+            return None
+    return ''.join(sorted(delimiters))
+
+def build_safe_replacer(replacements: List[Tuple[str, str, str]], fallback=None):
+    """
+    safe_replace(text, replacements) と同じ結果を返す関数を作る (照合器は最初に1回だけ構築する)。
+    照合器が使えないルール、または placeholder の区切り文字を含む text には fallback(text)
+    (省略時は safe_replace) を使う。
+    """
+    if fallback is None:
+        fallback = lambda text: safe_replace(text, replacements)
+    delimiters = _placeholder_delimiters_if_matchable(replacements)
+    if delimiters is None:
+        return fallback
+    matcher = get_multi_pattern_matcher(replacements)
+
+    def replace(text: str) -> str:
+        for ch in delimiters:
+            if ch in text:
+                return fallback(text)
+        plain_pieces, replaced_pieces = split_by_prioritized_matches(text, replacements, matcher)
+        if not replaced_pieces:
+            return text
+        parts = [plain_pieces[0]]
+        for replaced, plain in zip(replaced_pieces, plain_pieces[1:]):
+            parts.append(replaced)
+            parts.append(plain)
+        return ''.join(parts)
+
+    return replace
+
+def build_safe_replace_decomposer(replacements: List[Tuple[str, str, str]]):
+    """
+    safe_replace(text, replacements) の「どこがどのルールで置換されるか」だけを求める関数を作る。
+    作った関数は text を (置換されない部分のリスト, 一致したルールの添字のリスト) に分解する
+    (前者は後者より1つ多い。render_safe_replace_decomposition で置換後文字列を埋め込むと safe_replace の結果になる)。
+    placeholder の区切り文字を含む text には None を返す。
+    照合器が使えないルールなら (build_safe_replacer と同じ条件)、関数の代わりに None を返す。
+    """
+    delimiters = _placeholder_delimiters_if_matchable(replacements)
+    if delimiters is None:
+        return None
+    matcher = get_multi_pattern_matcher(replacements)
+
+    def decompose(text: str) -> Optional[Tuple[List[str], List[int]]]:
+        for ch in delimiters:
+            if ch in text:
+                return None
+        plain_pieces = []
+        rule_indices = []
+        prev_end = 0
+        for start, end, idx in find_prioritized_matches(text, replacements, matcher):
+            plain_pieces.append(text[prev_end:start])
+            rule_indices.append(idx)
+            prev_end = end
+        plain_pieces.append(text[prev_end:])
+        return plain_pieces, rule_indices
+
+    return decompose
+
+def render_safe_replace_decomposition(decomposition: Tuple[List[str], List[int]], rendered_news: List[str]) -> str:
+    """
+    build_safe_replace_decomposer の分解結果に、ルールの添字ごとの置換後文字列
+    (new から前後に残るスペース(context_widths)を除いたもの) を埋め込む。
+    """
+    plain_pieces, rule_indices = decomposition
+    if not rule_indices:
+        return plain_pieces[0]
+    parts = [plain_pieces[0]]
+    for idx, plain in zip(rule_indices, plain_pieces[1:]):
+        parts.append(rendered_news[idx])
+        parts.append(plain)
+    return ''.join(parts)
+
+def rendered_news_for_decomposition(
+    neutral_replacements: List[Tuple[str, str, str]],
     replacements: List[Tuple[str, str, str]]
-) -> Dict[str, List[str]]:
+) -> Optional[List[str]]:
     """
-    chunk: [[E_root, pos], ...] の部分リスト
-    safe_replace による置換結果を { E_root: [replaced_stem, pos], ... } の形で返す
+    replacements の old・placeholder の並びが neutral_replacements と同じで、
+    build_safe_replace_decomposer(neutral_replacements) の分解結果をそのまま使える
+    (照合器が使え、old の前後に残るスペースの扱いも同じ) 場合に、
+    render_safe_replace_decomposition に渡す置換後文字列のリストを返す。使えなければ None。
+    """
+    if len(replacements) != len(neutral_replacements) or _placeholder_delimiters_if_matchable(replacements) is None:
+        return None
+    rendered_news = []
+    for (neutral_old, neutral_new, neutral_placeholder), (old, new, placeholder) in zip(neutral_replacements, replacements):
+        if old != neutral_old or placeholder != neutral_placeholder:
+            return None
+        lead, trail = context_widths(old, new, placeholder)
+        if (lead, trail) != context_widths(neutral_old, neutral_new, neutral_placeholder):
+            return None
+        rendered_news.append(new[lead:len(new) - trail])
+    return rendered_news
+
+# JSON生成ページでは、動詞語尾・'an'・AN/ON の展開・独自の語幹分解・2文字語根など、
+# 同じ短い文字列に対して何度も safe_replace を行う。その結果を
+# (置換ルールの指紋, 入力文字列) をキーに、件数上限つきの LRU で覚えておく。
+# モジュールに置くので、Streamlit でページを再実行しても同じルールなら前回の結果を使える。
+# Streamlit ではセッションごとに別のスレッドから使われるので、メモと集計の読み書きはロックで守る
+# (safe_replace の計算そのものはロックの外で行う)。
+SAFE_REPLACE_MEMO_SIZE = 1 << 17
+_SAFE_REPLACE_MEMO: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_SAFE_REPLACE_MEMO_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_SAFE_REPLACE_MEMO_LOCK = threading.Lock()
+
+def build_memoized_safe_replacer(replacements: List[Tuple[str, str, str]], fingerprint: Optional[str] = None):
+    """
+    build_safe_replacer(replacements) の結果をメモ化した関数を返す。
+    fingerprint は置換ルールの内容ハッシュ (省略時は replacements から計算する)。
+    """
+    if fingerprint is None:
+        fingerprint = compute_json_digest(replacements)
+    replace = build_safe_replacer(replacements)
+
+    def memoized_replace(text: str) -> str:
+        key = (fingerprint, text)
+        with _SAFE_REPLACE_MEMO_LOCK:
+            replaced = _SAFE_REPLACE_MEMO.get(key)
+            if replaced is not None:
+                _SAFE_REPLACE_MEMO.move_to_end(key)
+                _SAFE_REPLACE_MEMO_STATS["hits"] += 1
+                return replaced
+            _SAFE_REPLACE_MEMO_STATS["misses"] += 1
+        replaced = replace(text)
+        with _SAFE_REPLACE_MEMO_LOCK:
+            _SAFE_REPLACE_MEMO[key] = replaced
+            _SAFE_REPLACE_MEMO.move_to_end(key)
+            while len(_SAFE_REPLACE_MEMO) > SAFE_REPLACE_MEMO_SIZE:
+                _SAFE_REPLACE_MEMO.popitem(last=False)
+                _SAFE_REPLACE_MEMO_STATS["evictions"] += 1
+        return replaced
+
+    return memoized_replace
+
+def get_safe_replace_memo_stats() -> Dict[str, float]:
+    """メモの利用状況 (hits, misses, evictions, hit_rate, size) を返す。"""
+    with _SAFE_REPLACE_MEMO_LOCK:
+        stats = dict(_SAFE_REPLACE_MEMO_STATS)
+        stats["size"] = len(_SAFE_REPLACE_MEMO)
+    calls = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / calls if calls else 0.0
+    return stats
+
+def reset_safe_replace_memo_stats() -> None:
+    """利用状況の集計だけを 0 に戻す (覚えた結果は残す)。"""
+    with _SAFE_REPLACE_MEMO_LOCK:
+        for key in _SAFE_REPLACE_MEMO_STATS:
+            _SAFE_REPLACE_MEMO_STATS[key] = 0
+
+def clear_safe_replace_memo() -> None:
+    """覚えた結果と利用状況の集計をすべて消す (生成処理の時間を計測し直すときなど)。"""
+    with _SAFE_REPLACE_MEMO_LOCK:
+        _SAFE_REPLACE_MEMO.clear()
+    reset_safe_replace_memo_stats()
+
+def _build_local_pre_replacements(chunk: List[List[str]], replace_func) -> Dict[str, List[str]]:
+    """
+    process_chunk_for_pre_replacements の本体。replace_func(E_root) で語根を置換する。
     """
     local_dict = {}
     for item in chunk:
@@ -264,18 +536,63 @@ def process_chunk_for_pre_replacements(
                 merged_pos_str = ",".join(existing_pos_list)
                 local_dict[E_root] = [replaced_stem, merged_pos_str]
         else:
-            replaced = safe_replace(E_root, replacements)
+            replaced = replace_func(E_root)
             local_dict[E_root] = [replaced, pos_info]
     return local_dict
 
+def process_chunk_for_pre_replacements(
+    chunk: List[List[str]],
+    replacements: List[Tuple[str, str, str]]
+) -> Dict[str, List[str]]:
+    """
+    chunk: [[E_root, pos], ...] の部分リスト
+    safe_replace による置換結果を { E_root: [replaced_stem, pos], ... } の形で返す
+    """
+    return _build_local_pre_replacements(chunk, build_safe_replacer(replacements))
+
+# ワーカープロセス側で保持する置換規則 (共有メモリ上の表を参照する)
+_SHARED_PRE_REPLACEMENTS: Dict[str, object] = {}
+
+def _init_pre_replacements_worker(shared_rule_set_name: str) -> None:
+    """
+    parallel_build_pre_replacements_dict 用のワーカー初期化関数。
+    共有メモリ上の置換規則に接続する。照合に使う old 列だけはここで1回 decode しておき、
+    new/placeholder は一致したときだけ共有メモリから取り出す。
+    """
+    replacements, _, _ = attach_shared_rule_set(shared_rule_set_name)
+    _SHARED_PRE_REPLACEMENTS["replacements"] = replacements
+    _SHARED_PRE_REPLACEMENTS["olds"] = replacements.column(0)
+    # 照合器は親プロセスが共有メモリのヘッダに入れたものを復元して使う
+    _SHARED_PRE_REPLACEMENTS["replace"] = build_safe_replacer(replacements, _safe_replace_with_shared_rules)
+    _SHARED_PRE_REPLACEMENTS["decompose"] = build_safe_replace_decomposer(replacements)
+
+def _safe_replace_with_shared_rules(text: str) -> str:
+    """
+    共有メモリ上の置換規則を使う safe_replace (結果は safe_replace と同じ)。
+    """
+    replacements = _SHARED_PRE_REPLACEMENTS["replacements"]
+    valid_replacements = {}
+    for i, old in enumerate(_SHARED_PRE_REPLACEMENTS["olds"]):
+        if old in text:
+            _, new, placeholder = replacements[i]
+            text = text.replace(old, placeholder)
+            valid_replacements[placeholder] = new
+    for placeholder, new in valid_replacements.items():
+        text = text.replace(placeholder, new)
+    return text
+
+def _process_chunk_with_shared_rules(chunk: List[List[str]]) -> Dict[str, List[str]]:
+    return _build_local_pre_replacements(chunk, _SHARED_PRE_REPLACEMENTS["replace"])
+
 def parallel_build_pre_replacements_dict(
     E_stem_with_Part_Of_Speech_list: List[List[str]],
     replacements: List[Tuple[str, str, str]],
     num_processes: int = 4
 ) -> Dict[str, List[str]]:
     """
-    データを num_processes 個に分割し、process_chunk_for_pre_replacements を並列実行
+    データを num_processes 個に分割し、process_chunk_for_pre_replacements 相当の処理を並列実行
     最終的に辞書をマージして返す。
+    replacements は共有メモリに1回だけ書き込み、各ワーカーはコピーせずに参照する。
     """
     total_len = len(E_stem_with_Part_Of_Speech_list)
     if total_len == 0:
@@ -292,11 +609,16 @@ def parallel_build_pre_replacements_dict(
         if start_index >= total_len:
             break
 
-    with multiprocessing.Pool(num_processes) as pool:
-        partial_dicts = pool.starmap(
-            process_chunk_for_pre_replacements,
-            [(chunk, replacements) for chunk in chunks]
-        )
+    shared = SharedRuleSet((replacements, [], []), matcher=get_multi_pattern_matcher(replacements))
+    try:
+        with multiprocessing.Pool(
+            num_processes,
+            initializer=_init_pre_replacements_worker,
+            initargs=(shared.name,)
+        ) as pool:
+            partial_dicts = pool.map(_process_chunk_with_shared_rules, chunks)
+    finally:
+        shared.close()
 
     merged_dict = {}
     for partial_d in partial_dicts:
@@ -335,3 +657,253 @@ def remove_redundant_ruby_if_identical(text: str) -> str:
 
     replaced_text = IDENTICAL_RUBY_PATTERN.sub(replacer, text)
     return replaced_text
+
+#=================================================================
+# 7) 置換用JSONの増分ビルド (キャッシュ)
+#   CSV を1行直しただけで、PEJVO 全語幹(約44,000)の safe_replace をやり直すのは重いので、
+#   - 語幹ごとの safe_replace 結果を、使った置換ルール(old, new の並び)と一緒に保存しておき、
+#     次回は「変わったルールの old を部分文字列として含む語幹」だけを計算し直す。
+#     (safe_replace の結果は、語幹に部分文字列として含まれる old のルールとその順番だけで決まる)
+#   - pre_replacements_dict_2/3 のように安価だが入力の多い段は、入力全体のハッシュをキーにして丸ごと保存する。
+#=================================================================
+BUILD_CACHE_VERSION = 1
+
+def compute_json_digest(*objects) -> str:
+    """JSON にできるオブジェクト群の内容ハッシュ (sha256 の16進文字列) を返す。"""
+    payload = json.dumps(objects, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _read_build_cache(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != BUILD_CACHE_VERSION:
+        return None
+    return data
+
+def _write_build_cache(path: str, data: Dict) -> None:
+    """
+    キャッシュを書き出す。
+    JSON生成ページでは複数のセッションが同じキャッシュファイルを同時に書くことがあるので、
+    書き込みごとに別名の一時ファイルに書いてから置き換える (後から置き換えた方の内容が残る)。
+    書き込めない環境では警告を出してそのまま続ける (キャッシュが無くても生成はできる)。
+    """
+    directory = os.path.dirname(path) or '.'
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False
+        ) as f:
+            tmp_path = f.name
+            json.dump(dict(data, version=BUILD_CACHE_VERSION), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        warnings.warn(f"増分ビルドのキャッシュを保存できませんでした: '{path}' ({e})", RuntimeWarning)
+
+def _longest_increasing_subsequence(values: List[int]) -> set:
+    """values の最長増加部分列に含まれる添字の集合を返す (O(n log n))。"""
+    tails = []        # 長さ k+1 の増加列の末尾の添字
+    parents = [-1] * len(values)
+    for i, v in enumerate(values):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[tails[mid]] < v:
+                lo = mid + 1
+            else:
+                hi = mid
+        parents[i] = tails[lo - 1] if lo > 0 else -1
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    members = set()
+    i = tails[-1] if tails else -1
+    while i != -1:
+        members.add(i)
+        i = parents[i]
+    return members
+
+def find_changed_rule_olds(previous_rules: List[List[str]], current_rules: List[List[str]]) -> set:
+    """
+    2つの置換ルール列 [[old, new], ...] (適用順) を比べ、結果に影響し得る old の集合を返す。
+    追加・削除・new の変更に加え、他のルールとの前後関係が入れ替わった old も含める。
+    """
+    previous = {old: (i, new) for i, (old, new) in enumerate(previous_rules)}
+    current = {old: new for old, new in current_rules}
+    changed = set()
+    for old, new in current_rules:
+        if old not in previous or previous[old][1] != new:
+            changed.add(old)
+    for old in previous:
+        if old not in current:
+            changed.add(old)
+    # 共通のルールについて、前回の順番を今回の順に並べた列の最長増加部分列から外れたものは「順番が動いた」
+    common = [old for old, _ in current_rules if old not in changed]
+    in_order = _longest_increasing_subsequence([previous[old][0] for old in common])
+    changed.update(old for k, old in enumerate(common) if k not in in_order)
+    return changed
+
+def _contains_any_substring(text: str, substrings: set, min_len: int, max_len: int) -> bool:
+    """text が substrings のいずれかを部分文字列として含むか (長さ min_len〜max_len の部分文字列を引く)。"""
+    n = len(text)
+    for length in range(min_len, min(max_len, n) + 1):
+        for start in range(n - length + 1):
+            if text[start:start + length] in substrings:
+                return True
+    return False
+
+def _safe_replace_chunk_with_shared_rules(stems: List[str]) -> List[str]:
+    replace = _SHARED_PRE_REPLACEMENTS["replace"]
+    return [replace(stem) for stem in stems]
+
+def parallel_safe_replace_many(
+    stems: List[str],
+    replacements: List[Tuple[str, str, str]],
+    num_processes: int = 4
+) -> List[str]:
+    """
+    stems の各文字列に safe_replace(stem, replacements) を並列に適用した結果を、同じ順番で返す。
+    replacements は parallel_build_pre_replacements_dict と同様に共有メモリで各ワーカーに渡す。
+    """
+    if not stems:
+        return []
+    chunk_size = -(-len(stems) // (num_processes * 4))
+    chunks = [stems[i:i + chunk_size] for i in range(0, len(stems), chunk_size)]
+    shared = SharedRuleSet((replacements, [], []), matcher=get_multi_pattern_matcher(replacements))
+    try:
+        with multiprocessing.Pool(
+            num_processes,
+            initializer=_init_pre_replacements_worker,
+            initargs=(shared.name,)
+        ) as pool:
+            results = pool.map(_safe_replace_chunk_with_shared_rules, chunks)
+    finally:
+        shared.close()
+    return [replaced for chunk_result in results for replaced in chunk_result]
+
+def _decompose_chunk_with_shared_rules(stems: List[str]) -> List[Optional[Tuple[List[str], List[int]]]]:
+    decompose = _SHARED_PRE_REPLACEMENTS["decompose"]
+    return [decompose(stem) for stem in stems]
+
+def parallel_decompose_many(
+    stems: List[str],
+    replacements: List[Tuple[str, str, str]],
+    num_processes: int = 4
+) -> List[Optional[Tuple[List[str], List[int]]]]:
+    """
+    stems の各文字列を build_safe_replace_decomposer(replacements) で並列に分解した結果を、同じ順番で返す。
+    (照合器が使えるルールであること。replacements は共有メモリで各ワーカーに渡す)
+    """
+    if not stems:
+        return []
+    chunk_size = -(-len(stems) // (num_processes * 4))
+    chunks = [stems[i:i + chunk_size] for i in range(0, len(stems), chunk_size)]
+    shared = SharedRuleSet((replacements, [], []), matcher=get_multi_pattern_matcher(replacements))
+    try:
+        with multiprocessing.Pool(
+            num_processes,
+            initializer=_init_pre_replacements_worker,
+            initargs=(shared.name,)
+        ) as pool:
+            results = pool.map(_decompose_chunk_with_shared_rules, chunks)
+    finally:
+        shared.close()
+    return [decomposition for chunk_result in results for decomposition in chunk_result]
+
+def build_pre_replacements_dict_1_incremental(
+    E_stem_with_Part_Of_Speech_list: List[List[str]],
+    replacements: List[Tuple[str, str, str]],
+    cache_path: str,
+    num_processes: int = 1,
+    progress_callback=None
+) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """
+    pre_replacements_dict_1 ({ 語幹: [safe_replace(語幹), 品詞(カンマ区切り)] }) を、
+    cache_path に保存した前回の語幹ごとの結果を再利用して作る。
+    前回から変わった置換ルールの old を含む語幹と、新しい語幹だけを safe_replace し直す。
+    品詞のまとめ方は、JSON生成ページの(並列処理を使わない場合の)処理と同じ。
+    戻り値は (pre_replacements_dict_1, 統計 {"reused", "recomputed", "changed_roots"})。
+    progress_callback(計算済み件数, 計算が必要な件数) で進捗を受け取れる。
+    """
+    rules = [[old, new] for old, new, _ in replacements]
+    cache = _read_build_cache(cache_path)
+    replaced_stems: Dict[str, str] = {}
+    changed_roots = len(rules)
+    if cache is not None:
+        changed = find_changed_rule_olds(cache["rules"], rules)
+        changed_roots = len(changed)
+        if changed:
+            min_len = min(len(old) for old in changed)
+            max_len = max(len(old) for old in changed)
+            replaced_stems = {
+                stem: replaced for stem, replaced in cache["stems"].items()
+                if not _contains_any_substring(stem, changed, min_len, max_len)
+            }
+        else:
+            replaced_stems = cache["stems"]
+
+    stems_to_compute = []
+    seen = set()
+    for item in E_stem_with_Part_Of_Speech_list:
+        if len(item) == 2 and len(item[0]) >= 2:
+            stem = item[0]
+            if stem not in replaced_stems and stem not in seen:
+                seen.add(stem)
+                stems_to_compute.append(stem)
+
+    total = len(stems_to_compute)
+    if num_processes > 1 and total >= num_processes * 100:
+        for stem, replaced in zip(stems_to_compute,
+                                  parallel_safe_replace_many(stems_to_compute, replacements, num_processes)):
+            replaced_stems[stem] = replaced
+    else:
+        replace_stem = build_safe_replacer(replacements)
+        for i, stem in enumerate(stems_to_compute):
+            replaced_stems[stem] = replace_stem(stem)
+            if progress_callback is not None and i % 1000 == 0:
+                progress_callback(i + 1, total)
+    if progress_callback is not None:
+        progress_callback(total, total)
+
+    pre_replacements_dict_1 = {}
+    for j in E_stem_with_Part_Of_Speech_list:
+        if len(j) == 2 and len(j[0]) >= 2:
+            if j[0] in pre_replacements_dict_1:
+                if j[1] not in pre_replacements_dict_1[j[0]][1]:
+                    pre_replacements_dict_1[j[0]] = [
+                        pre_replacements_dict_1[j[0]][0],
+                        pre_replacements_dict_1[j[0]][1] + ',' + j[1]
+                    ]
+            else:
+                pre_replacements_dict_1[j[0]] = [replaced_stems[j[0]], j[1]]
+
+    # 今回の語幹だけを保存する (PEJVO から消えた語幹でキャッシュが膨らまないように)
+    _write_build_cache(cache_path, {
+        "rules": rules,
+        "stems": {stem: replaced_stems[stem] for stem in pre_replacements_dict_1},
+    })
+    stats = {
+        "reused": len(pre_replacements_dict_1) - total,
+        "recomputed": total,
+        "changed_roots": changed_roots,
+    }
+    return pre_replacements_dict_1, stats
+
+def load_or_build_cached_stage(cache_path: str, key: str, build_func):
+    """
+    cache_path に key と一致する結果が保存されていればそれを返し、無ければ build_func() を実行して保存する。
+    (pre_replacements_dict_3 など、入力全体のハッシュを key にして段ごと再利用する用途)
+    戻り値は (結果, キャッシュを使ったかどうか)。結果は JSON にできるものに限る。
+    """
+    cache = _read_build_cache(cache_path)
+    if cache is not None and cache.get("key") == key:
+        return cache["value"], True
+    value = build_func()
+    _write_build_cache(cache_path, {"key": key, "value": value})
+    return value, False
@@ -0,0 +1,183 @@
+## esp_text_replacement_cli.py(6つ目)
+
+"""
+エスペラント文のテキストファイルを、置換結果のファイル(HTML等)へ変換するコマンドライン。
+"esp_text_replacement_module.py" の関数を使い、main.py (Streamlit) と同じ置換を行う。
+
+入力全体を一度に読み込まず、段落(行)単位でまとめたブロックごとに並列変換し、
+変換できたブロックから入力と同じ順番で出力ファイルに書き足していく。
+そのため、書籍1冊分のような大きな入力でもメモリ使用量は入力サイズに比例して増えない
+(置換ルール + 処理待ちのブロック数 × ブロックの大きさ 程度で頭打ちになる)。
+
+【使い方】
+  python esp_text_replacement_cli.py <入力.txt> <出力.html> [--format HTML格式_Ruby文字_大小调整] [--processes 4]
+  (--stage-stats を付けると、置換の段ごとの時間・一致数・バイト数を表示する)
+  (--write-compiled を付けると、置換用JSONと同じ場所にコンパイル済みファイル(.esprules)を作り、
+   次回からそちらを読み込む。付けなければ、既にある .esprules を読むだけで何も書き込まない)
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+from typing import List, Dict, Iterator, Optional, TextIO
+
+from esp_text_replacement_module import (
+    convert_to_circumflex,
+    convert_to_hat,
+    parallel_process_stream,
+    new_replacement_stage_stats,
+    format_replacement_stage_stats,
+    get_ruby_html_header_and_footer
+)
+from esp_replacement_binary_module import (
+    load_replacements_lists_preferring_compiled,
+    compute_file_sha256
+)
+from esp_replacement_constants import DEFAULT_JSON_FILE, FORMAT_TYPES
+
+#=================================================================
+# 1) 既定の設定 (同梱ファイルの場所・出力形式の一覧は esp_replacement_constants.py)
+#=================================================================
+# 1ブロックの目安の文字数 (行の途中では切らないので、長い行があればそれより大きくなる)
+DEFAULT_BLOCK_CHARS = 1 << 16
+
+#=================================================================
+# 2) 入力の読み込み・出力文字形式
+#=================================================================
+def iter_text_blocks(f: TextIO, block_chars: int = DEFAULT_BLOCK_CHARS) -> Iterator[str]:
+    """
+    ファイルを行単位で読み、block_chars 文字程度ずつまとめて返す。
+    区切りは必ず改行の直後になる (%...% / @...@ も置換ルールも改行をまたがないので、
+    ブロックごとに置換しても全体を一度に置換した場合と結果は変わらない)。
+    """
+    lines: List[str] = []
+    size = 0
+    for line in f:
+        lines.append(line)
+        size += len(line)
+        if size >= block_chars:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
+
+def convert_letter_type(text: str, letter_type: str) -> str:
+    """
+    main.py の「출력 문자 형식」と同じ後処理。
+    'circumflex': 字上符形式 (ĉ) / 'hat': ^形式 (c^)
+    """
+    if letter_type == 'circumflex':
+        return convert_to_circumflex(text)
+    if letter_type == 'hat':
+        return convert_to_hat(text)
+    return text
+
+#=================================================================
+# 3) ファイル → ファイルの変換
+#=================================================================
+def convert_file(
+    input_path: str,
+    output_path: str,
+    format_type: str = FORMAT_TYPES[0],
+    num_processes: int = 1,
+    json_path: str = DEFAULT_JSON_FILE,
+    letter_type: str = 'circumflex',
+    block_chars: int = DEFAULT_BLOCK_CHARS,
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None,
+    write_compiled: bool = False
+) -> int:
+    """
+    input_path のエスペラント文を置換し、HTMLヘッダー・フッター付きで output_path に書き出す。
+    変換結果はブロックごとに順番どおり書き足していく。戻り値は入力の文字数。
+    stage_stats (new_replacement_stage_stats() の dict) を渡すと、置換の段ごとの計測結果を足し込む。
+    write_compiled=True なら、json_path の隣の .esprules が無い・古い場合に作り直す
+    (書き込めない場所なら作らずにそのまま続ける)。
+    """
+    (replacements_final_list,
+     replacements_list_for_localized_string,
+     replacements_list_for_2char) = load_replacements_lists_preferring_compiled(json_path, refresh_compiled=write_compiled)
+    rule_set_key = compute_file_sha256(json_path)
+
+    ruby_style_head, ruby_style_tail = get_ruby_html_header_and_footer(format_type)
+    total_chars = 0
+
+    def counted_blocks(f: TextIO) -> Iterator[str]:
+        nonlocal total_chars
+        for block in iter_text_blocks(f, block_chars):
+            total_chars += len(block)
+            yield block
+
+    # 途中で失敗しても中途半端な出力ファイルが残らないよう、一時ファイルに書いてから置き換える
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(input_path, "r", encoding="utf-8") as fin, open(tmp_path, "w", encoding="utf-8") as fout:
+            fout.write(ruby_style_head)
+            for converted in parallel_process_stream(
+                counted_blocks(fin),
+                num_processes,
+                replacements_list_for_localized_string,
+                replacements_final_list,
+                replacements_list_for_2char,
+                format_type,
+                rule_set_key=rule_set_key,
+                stage_stats=stage_stats
+            ):
+                fout.write(convert_letter_type(converted, letter_type))
+            fout.write(ruby_style_tail)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return total_chars
+
+#=================================================================
+# 4) コマンドライン
+#=================================================================
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="エスペラント文のテキストファイルを文字列(漢字)置換し、結果をファイルに書き出す"
+    )
+    parser.add_argument("input_path", help="入力テキストファイル (UTF-8)")
+    parser.add_argument("output_path", help="出力ファイル (HTML形式なら .html)")
+    parser.add_argument("--format", dest="format_type", default=FORMAT_TYPES[0], choices=FORMAT_TYPES,
+                        help="出力形式 (置換用JSONを作成したときと同じ形式を選ぶ)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="並列処理のプロセス数 (1 なら並列化しない)")
+    parser.add_argument("--json", dest="json_path", default=DEFAULT_JSON_FILE,
+                        help="置換用JSON (合并3个JSON文件)")
+    parser.add_argument("--write-compiled", action="store_true",
+                        help="置換用JSONと同じ場所にコンパイル済みファイル(.esprules)を作り、次回の読み込みを速くする")
+    parser.add_argument("--letter-type", default="circumflex", choices=["circumflex", "hat"],
+                        help="出力文字形式 (circumflex: ĉ / hat: c^)")
+    parser.add_argument("--block-chars", type=int, default=DEFAULT_BLOCK_CHARS,
+                        help="1回に並列処理へ渡すブロックの目安の文字数")
+    parser.add_argument("--stage-stats", action="store_true",
+                        help="置換の段ごとの時間・一致数・入出力バイト数を表示する (時間は全プロセスの合計)")
+    args = parser.parse_args(argv)
+
+    stage_stats = new_replacement_stage_stats() if args.stage_stats else None
+
+    total_chars = convert_file(
+        args.input_path,
+        args.output_path,
+        format_type=args.format_type,
+        num_processes=args.processes,
+        json_path=args.json_path,
+        letter_type=args.letter_type,
+        block_chars=args.block_chars,
+        stage_stats=stage_stats,
+        write_compiled=args.write_compiled
+    )
+    print(f"[完了] {total_chars} 文字の変換結果を '{args.output_path}' に保存しました。")
+    if stage_stats is not None:
+        print("\n".join(format_replacement_stage_stats(stage_stats)))
+    return 0
+
+
+if __name__ == '__main__':
+    # Windows などでマルチプロセスを正常に動かすため
+    multiprocessing.set_start_method('spawn', force=True)
+    sys.exit(main())
@@ -4,17 +4,37 @@
 このモジュールは「エスペラント文章の文字列(漢字)置換」を包括的に扱うツール集です。
 主な機能：
 1. エスペラント独自の文字形式（ĉ, ĝなど）への変換 → convert_to_circumflex
+   (各方向とも1回の走査で変換 → convert_to_circumflex / convert_to_hat / convert_to_x)
 2. 特殊な半角スペースの統一（ASCIIスペースに） → unify_halfwidth_spaces
+   (字上符形式への変換と同じ走査で行う版 → unify_halfwidth_spaces_and_convert_to_circumflex)
 3. (現在不要になった) HTMLルビ付与関数 → wrap_text_with_ruby (コメントのみ)
-4. %や@で囲まれたテキストのスキップ・局所変換 → (create_replacements_list_for_...)
+4. %や@で囲まれたテキストのスキップ・局所変換
+   (本文を1回走査して「通常」「%...%」「@...@」の部分に分ける → split_marked_segments / find_marker_spans)
 5. 大域的なプレースホルダー置換 → safe_replace
+   (大域置換は多パターン照合器で一括走査し、置換箇所を記録して1回で出力
+    → build_multi_pattern_matcher / find_prioritized_matches / split_by_prioritized_matches)
 6. それらをまとめて実行する複合置換関数 → orchestrate_comprehensive_esperanto_text_replacement
-7. multiprocessing を用いた行単位の並列実行 → parallel_process / process_segment
+   (2文字語根は、語根どうしが影響し合う領域だけを1回の走査で拾って置換 → replace_2char_roots)
+   (同じ本文・規則集合・出力形式の結果を使い回す → ReplacementResultCache)
+   (一部だけ直した本文は、変わった段落だけを置換し直す → convert_paragraphs_incrementally)
+7. multiprocessing を用いた並列実行 → parallel_process / process_segment
+   (文字数で均等に、安全な位置だけで分割 → plan_balanced_chunks)
+   (ファイル→ファイルの逐次変換用に、断片ごとに順番どおり結果を返す → parallel_process_stream)
+8. HTMLヘッダー・フッターの付与 → apply_ruby_html_header_and_footer / get_ruby_html_header_and_footer
+   (置換規則を共有メモリで参照する常駐ワーカープール → borrow_replacement_worker_pool)
+9. 置換の段ごとの時間・一致数・バイト数の計測 (並列処理ではワーカー分を合算)
+   → new_replacement_stage_stats / format_replacement_stage_stats (各関数の stage_stats 引数)
 """
 
 import re
-import json
-from typing import List, Tuple, Dict
+import time
+import atexit
+import hashlib
+import threading
+import functools
+import contextlib
+import collections
+from typing import List, Tuple, Dict, Optional, Iterable, Iterator
 import multiprocessing
 
 # ================================
@@ -56,15 +76,60 @@ def replace_esperanto_chars(text, char_dict: Dict[str, str]) -> str:
         text = text.replace(original_char, converted_char)
     return text
 
+HALFWIDTH_SPACE_CHARS = "\u00A0\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200A"
+
+def build_char_form_converter(char_dicts: List[Dict[str, str]], unify_spaces: bool = False):
+    """
+    char_dicts の各辞書を順に replace_esperanto_chars で適用するのと同じ変換を、
+    1つの正規表現(選択肢を長い順に並べたもの)と辞書引きで1回の走査で行う関数を返す。
+    unify_spaces=True なら unify_halfwidth_spaces の処理も同じ走査で行う。
+
+    ここで使う辞書(x_to_circumflex 等)はキーが「文字+x/^」か字上符付き文字の1文字で、
+    キー同士が重なり合わず、置換後の文字列が別のキーを作ることもないので、
+    順に str.replace した結果と一致する。
+    """
+    mapping: Dict[str, str] = {}
+    for char_dict in char_dicts:
+        for original_char, converted_char in char_dict.items():
+            mapping.setdefault(original_char, converted_char)
+    alternatives = [re.escape(k) for k in sorted(mapping, key=len, reverse=True)]
+    if unify_spaces:
+        for c in HALFWIDTH_SPACE_CHARS:
+            mapping[c] = " "
+        alternatives.append("[" + HALFWIDTH_SPACE_CHARS + "]")
+    pattern = re.compile("|".join(alternatives))
+    lookup = mapping.__getitem__
+
+    def convert(text: str) -> str:
+        return pattern.sub(lambda m: lookup(m.group()), text)
+    return convert
+
+# 方向ごとの1回走査の変換関数 (x形式・^形式・字上符形式)
+_to_circumflex = build_char_form_converter([hat_to_circumflex, x_to_circumflex])
+_to_hat = build_char_form_converter([x_to_hat, circumflex_to_hat])
+_to_x = build_char_form_converter([hat_to_x, circumflex_to_x])
+_unify_spaces_and_to_circumflex = build_char_form_converter([hat_to_circumflex, x_to_circumflex], unify_spaces=True)
+
 def convert_to_circumflex(text: str) -> str:
     """
     テキストを字上符形式（ĉ, ĝ, ĥ, ĵ, ŝ, ŭなど）に統一します。
-    1. hat_to_circumflex: c^ → ĉ
-    2. x_to_circumflex: cx → ĉ
+    (hat_to_circumflex: c^ → ĉ と x_to_circumflex: cx → ĉ を1回の走査で行う)
     """
-    text = replace_esperanto_chars(text, hat_to_circumflex)
-    text = replace_esperanto_chars(text, x_to_circumflex)
-    return text
+    return _to_circumflex(text)
+
+def convert_to_hat(text: str) -> str:
+    """
+    テキストを^形式（c^, g^ など）に統一します。
+    (x_to_hat: cx → c^ と circumflex_to_hat: ĉ → c^ を1回の走査で行う)
+    """
+    return _to_hat(text)
+
+def convert_to_x(text: str) -> str:
+    """
+    テキストをx形式（cx, gx など）に統一します。
+    (hat_to_x: c^ → cx と circumflex_to_x: ĉ → cx を1回の走査で行う)
+    """
+    return _to_x(text)
 
 def unify_halfwidth_spaces(text: str) -> str:
     """
@@ -74,6 +139,12 @@ def unify_halfwidth_spaces(text: str) -> str:
     pattern = r"[\u00A0\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200A]"
     return re.sub(pattern, " ", text)
 
+def unify_halfwidth_spaces_and_convert_to_circumflex(text: str) -> str:
+    """
+    unify_halfwidth_spaces → convert_to_circumflex と同じ結果を1回の走査で得る。
+    """
+    return _unify_spaces_and_to_circumflex(text)
+
 # ================================
 # 3) (HTMLルビタグの補助関数) 
 #  (現状不要とされている)
@@ -101,169 +172,821 @@ def safe_replace(text: str, replacements: List[Tuple[str, str, str]]) -> str:
 
     return text
 
-def import_placeholders(filename: str) -> List[str]:
+# '%' で囲まれた箇所(置換しない)・'@' で囲まれた箇所(局所置換)の記号と、囲める文字数の上限
+SKIP_MARKER = '%'
+SKIP_SPAN_MAX_CHARS = 50
+LOCAL_MARKER = '@'
+LOCAL_SPAN_MAX_CHARS = 18
+# '@...@' の中の '%...%' は、以前 placeholder ('%1854%' 等) に置き換えてから '@...@' を探していたときと
+# 同じく6文字として数える
+SKIP_SPAN_COUNTED_CHARS = 6
+
+def find_marker_spans(text: str, marker: str, max_chars: int,
+                      blocked_spans: Optional[List[Tuple[int, int]]] = None,
+                      blocked_width: Optional[int] = None) -> List[Tuple[int, int]]:
     """
-    プレースホルダを行単位で読み込むだけの関数
+    marker で囲まれた箇所を左から順に探し、(開始位置, 終了位置) のリストを返す (両端の marker を含む)。
+    re.finditer(marker + '(.{1,max_chars}?)' + marker) と同じ箇所になる
+    (中身は1〜max_chars文字で改行を含まず、閉じる marker は開始位置から2文字目以降で最初のもの)。
+    blocked_spans (開始位置順・重なりなし・改行を含まない) の内部にある marker は無視し、
+    中身の文字数を数えるときは blocked 区間1つを blocked_width 文字 (None なら元の文字数) とみなす。
+    テキストを左から1回たどるだけで、各候補で調べるのは max_chars + 2 文字程度。
     """
-    with open(filename, 'r') as file:
-        placeholders = [line.strip() for line in file if line.strip()]
-    return placeholders
+    blocked_spans = blocked_spans or []
+    n = len(text)
+    spans = []
+    b = 0
+    start = text.find(marker)
+    while start != -1:
+        # start より前に終わる blocked 区間を読み飛ばし、start が blocked 区間の中ならその後ろから探し直す
+        while b < len(blocked_spans) and blocked_spans[b][1] <= start:
+            b += 1
+        if b < len(blocked_spans) and blocked_spans[b][0] <= start:
+            start = text.find(marker, blocked_spans[b][1])
+            continue
+        # 閉じる marker を、残りの文字数(budget)の範囲で blocked 区間を飛ばしながら探す
+        close = -1
+        budget = max_chars
+        pos = start + 1
+        bb = b
+        while budget >= 0:
+            next_blocked_start = blocked_spans[bb][0] if bb < len(blocked_spans) else n
+            search_from = max(pos, start + 2)
+            search_to = min(next_blocked_start, pos + budget + 1)
+            if search_from < search_to:
+                close = text.find(marker, search_from, search_to)
+                if close != -1:
+                    break
+            if bb >= len(blocked_spans) or next_blocked_start >= pos + budget + 1:
+                break
+            blocked_start, blocked_end = blocked_spans[bb]
+            budget -= (blocked_start - pos) + (blocked_end - blocked_start if blocked_width is None else blocked_width)
+            pos = blocked_end
+            bb += 1
+        if close != -1 and text.find('\n', start + 1, close) == -1:
+            spans.append((start, close + 1))
+            start = text.find(marker, close + 1)
+        else:
+            start = text.find(marker, start + 1)
+    return spans
 
-# '%' で囲まれた箇所をスキップするための正規表現
-PERCENT_PATTERN = re.compile(r'%(.{1,50}?)%')
-def find_percent_enclosed_strings_for_skipping_replacement(text: str) -> List[str]:
-    """'%foo%' の形を全て抽出。50文字以内に限定。"""
-    matches = []
-    used_indices = set()
-    for match in PERCENT_PATTERN.finditer(text):
-        start, end = match.span()
-        if start not in used_indices and end-2 not in used_indices:
-            matches.append(match.group(1))
-            used_indices.update(range(start, end))
-    return matches
+def split_marked_segments(text: str) -> List[Tuple[str, str]]:
+    """
+    text を1回の走査で (種類, 文字列) の並びに分ける。種類は
+    - 'plain': 通常どおり置換する部分
+    - 'skip' : '%...%' の中身 (置換しない)
+    - 'local': '@...@' の中身 (局所置換用のリストだけで置換する)
+    '%...%' を先に確定させ、'@...@' はその外側の '@' だけで探す (従来の処理順と同じ)。
+    '@...@' の文字数の上限を調べるとき、中の '%...%' は SKIP_SPAN_COUNTED_CHARS 文字として数える。
+    '@...@' の中に '%...%' がある場合は 'local', 'skip', 'local' のように分けて並べる。
+    囲み記号自体は含めない。全ての文字列を順に繋ぐと、囲み記号を除いた text になる。
+    """
+    skip_spans = find_marker_spans(text, SKIP_MARKER, SKIP_SPAN_MAX_CHARS)
+    local_spans = find_marker_spans(text, LOCAL_MARKER, LOCAL_SPAN_MAX_CHARS, skip_spans, SKIP_SPAN_COUNTED_CHARS)
+
+    segments = []
+    pos = 0
+    s = 0
+    for local_start, local_end in local_spans:
+        # '@...@' より前の部分 (通常部分と '%...%')
+        while s < len(skip_spans) and skip_spans[s][1] <= local_start:
+            skip_start, skip_end = skip_spans[s]
+            if pos < skip_start:
+                segments.append(('plain', text[pos:skip_start]))
+            segments.append(('skip', text[skip_start + 1:skip_end - 1]))
+            pos = skip_end
+            s += 1
+        if pos < local_start:
+            segments.append(('plain', text[pos:local_start]))
+        # '@...@' の中身 (中にある '%...%' は 'skip' として分ける)
+        pos = local_start + 1
+        while s < len(skip_spans) and skip_spans[s][1] <= local_end:
+            skip_start, skip_end = skip_spans[s]
+            segments.append(('local', text[pos:skip_start]))
+            segments.append(('skip', text[skip_start + 1:skip_end - 1]))
+            pos = skip_end
+            s += 1
+        segments.append(('local', text[pos:local_end - 1]))
+        pos = local_end
+    for skip_start, skip_end in skip_spans[s:]:
+        if pos < skip_start:
+            segments.append(('plain', text[pos:skip_start]))
+        segments.append(('skip', text[skip_start + 1:skip_end - 1]))
+        pos = skip_end
+    if pos < len(text):
+        segments.append(('plain', text[pos:]))
+    return segments
 
-def create_replacements_list_for_intact_parts(text: str, placeholders: List[str]) -> List[Tuple[str, str]]:
+# ================================
+# 4-2) 大域置換用の多パターン照合器
+# ================================
+# replacements_final_list は数十万件あり、1件ずつ `old in text` → text.replace() を
+# 繰り返すと「ルール数 × 文字数」の計算量になる。
+# そこで old の文字列を辞書に登録した照合器を1度だけ作り、テキストを左から1回走査して
+# 全ルールの出現位置をまとめて拾う。その後、リストの並び順(=優先順位)どおりに
+# 出現位置を確定させることで、従来の逐次置換と同じ結果を得る。
+#
+# 前提: old は placeholder を構成する文字($ や数字)を含まない。
+#       (含む場合、従来方式では placeholder の内部に誤マッチしてしまう)
+
+def build_multi_pattern_matcher(replacements: List[Tuple[str, str, str]]) -> Dict[str, object]:
     """
-    '%xxx%' で囲まれた箇所を検出し、
-    ( '%xxx%', placeholder ) という形で対応させるリストを作る
+    (old, new, placeholder) のリストから照合器を作る。
+    - table : old → その old を持つ最初のルールの添字
+    - dups  : 複数のルールが同じ old を持つ場合の、old → 全ルールの添字(優先順位順)のタプル
+    - heads : old の先頭2文字 → その先頭を持つ old の長さ(昇順)のタプル (2文字以上の old)
+    - single: 1文字だけの old が存在するかどうか
+
+    (Aho-Corasick のようなオートマトンは作らない。数十万件の old から Python で遷移表を作ると
+     構築だけで数秒かかり、照合もどのみち1文字ずつの Python のループになるため、
+     「先頭2文字 → 候補の長さ」の辞書と、部分文字列をキーにした辞書引き (ハッシュ計算は C 側) で代用している。
+     find_prioritized_matches の走査は、本文の文字数 n と、各位置の先頭2文字が持つ候補の長さの数 k に対して
+     O(n·k) (同梱の置換用JSONでは k は最大18・平均7程度)。その後、拾った出現位置を優先順位順に確定させる処理が出現数に比例してかかる。
+     照合器は文字列と整数だけの辞書なので、.esprules のヘッダにそのまま保存できる)
     """
-    matches = find_percent_enclosed_strings_for_skipping_replacement(text)
-    replacements_list_for_intact_parts = []
-    for i, match in enumerate(matches):
-        if i < len(placeholders):
-            replacements_list_for_intact_parts.append([f"%{match}%", placeholders[i]])
+    table: Dict[str, int] = {}
+    dups: Dict[str, List[int]] = {}
+    heads: Dict[str, set] = {}
+    single = False
+    for idx, (old, new, placeholder) in enumerate(replacements):
+        if not old:
+            continue
+        if old in table:
+            dups.setdefault(old, [table[old]]).append(idx)
+            continue
+        table[old] = idx
+        if len(old) == 1:
+            single = True
         else:
-            break
-    return replacements_list_for_intact_parts
+            heads.setdefault(old[:2], set()).add(len(old))
+    return {
+        "table": table,
+        "dups": {old: tuple(idxs) for old, idxs in dups.items()},
+        "heads": {head: tuple(sorted(lengths)) for head, lengths in heads.items()},
+        "single": single,
+    }
 
-# '@' で囲まれた箇所を局所置換するための正規表現
-AT_PATTERN = re.compile(r'@(.{1,18}?)@')
-def find_at_enclosed_strings_for_localized_replacement(text: str) -> List[str]:
-    """'@foo@' の形を全て抽出。18文字以内に限定。"""
+# 照合器のキャッシュ (同じリストオブジェクトに対しては1度だけ構築する)
+# Streamlit では各セッションが別スレッドから参照・登録するので、参照・登録・破棄はロックで守る
+# (構築そのものはロックの外で行う。同時に同じリストの照合器を作った場合は後から登録した方が残る)。
+# 2文字語根用の照合器のキャッシュ (_TWO_CHAR_MATCHER_CACHE) も同じロックを使う。
+_MATCHER_CACHE: "collections.OrderedDict[int, Tuple[list, Dict[str, object]]]" = collections.OrderedDict()
+_MATCHER_CACHE_SIZE = 4
+_MATCHER_CACHE_LOCK = threading.Lock()
+
+def _get_cached_matcher(cache: "collections.OrderedDict", replacements: list):
+    """cache から replacements の照合器を探し、(照合器, 見つかったか) を返す (2文字語根用の照合器は None もあり得る)。"""
+    with _MATCHER_CACHE_LOCK:
+        cached = cache.get(id(replacements))
+        if cached is None or cached[0] is not replacements:
+            return None, False
+        cache.move_to_end(id(replacements))
+        return cached[1], True
+
+def _register_cached_matcher(cache: "collections.OrderedDict", replacements: list, matcher) -> None:
+    with _MATCHER_CACHE_LOCK:
+        # リスト本体も保持しておき、id の再利用による取り違えを防ぐ
+        cache[id(replacements)] = (replacements, matcher)
+        cache.move_to_end(id(replacements))
+        while len(cache) > _MATCHER_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def get_multi_pattern_matcher(replacements: List[Tuple[str, str, str]]) -> Dict[str, object]:
+    """
+    replacements に対応する照合器を返す。リストの同一性(id)をキーにキャッシュする。
+    """
+    matcher, found = _get_cached_matcher(_MATCHER_CACHE, replacements)
+    if found:
+        return matcher
+    matcher = build_multi_pattern_matcher(replacements)
+    register_multi_pattern_matcher(replacements, matcher)
+    return matcher
+
+def register_multi_pattern_matcher(replacements: List[Tuple[str, str, str]], matcher: Dict[str, object]) -> None:
+    """
+    事前に構築済みの照合器(コンパイル済みファイルから読み込んだもの等)をキャッシュに登録する。
+    """
+    _register_cached_matcher(_MATCHER_CACHE, replacements, matcher)
+
+def context_widths(old: str, new: str, placeholder: str) -> Tuple[int, int]:
+    """
+    old の前後の半角スペースが placeholder と new にもそのまま残るルール
+    (例: ' amo' → ' $20897$')について、その前後スペースの文字数を返す。
+    そのスペースは置換後も本文に残るため、他のルールの一部としても使われ得る。
+    """
+    lead = 1 if len(old) > 1 and old[0] == ' ' and placeholder[:1] == ' ' and new[:1] == ' ' else 0
+    trail = 1 if len(old) > lead + 1 and old[-1] == ' ' and placeholder[-1:] == ' ' and new[-1:] == ' ' else 0
+    return lead, trail
+
+def find_prioritized_matches(text: str,
+                             replacements: List[Tuple[str, str, str]],
+                             matcher: Dict[str, object]) -> List[Tuple[int, int, int]]:
+    """
+    text を1回走査して全ルールの出現位置を集め、replacements の並び順に
+    「old in text → text.replace(old, placeholder)」を繰り返した場合と同じ箇所を確定させる。
+    戻り値は (開始位置, 終了位置, ルールの添字) のリスト(開始位置順)。
+    開始/終了位置は、前後に残るスペース(context_widths)を除いた部分を指す。
+    """
+    table = matcher["table"]
+    dups = matcher["dups"]
+    heads = matcher["heads"]
+    single = matcher["single"]
+    n = len(text)
+
+    # (1) 出現位置の収集: ルールの添字 → 開始位置(昇順)のリスト
+    hits: Dict[int, List[int]] = {}
+    for i in range(n):
+        lengths = heads.get(text[i:i + 2])
+        if lengths:
+            for length in lengths:
+                if i + length > n:
+                    break
+                sub = text[i:i + length]
+                idx = table.get(sub)
+                if idx is not None:
+                    for idx in dups.get(sub, (idx,)):
+                        hits.setdefault(idx, []).append(i)
+        if single:
+            idx = table.get(text[i])
+            if idx is not None:
+                for idx in dups.get(text[i], (idx,)):
+                    hits.setdefault(idx, []).append(i)
+
+    # (2) 優先順位順に確定させる
+    #     - 既に他のルールで置換された文字を含む出現は無視する
+    #     - 同じルールの出現同士は str.replace と同様に左から重ならないものだけ採用する
+    consumed = bytearray(n)
     matches = []
-    used_indices = set()
-    for match in AT_PATTERN.finditer(text):
-        start, end = match.span()
-        if start not in used_indices and end-2 not in used_indices:
-            matches.append(match.group(1))
-            used_indices.update(range(start, end))
+    for idx in sorted(hits):
+        old, new, placeholder = replacements[idx]
+        length = len(old)
+        lead, trail = context_widths(old, new, placeholder)
+        last_end = -1
+        for start in hits[idx]:
+            end = start + length
+            if start < last_end or consumed.find(1, start, end) != -1:
+                continue
+            last_end = end
+            core_start, core_end = start + lead, end - trail
+            consumed[core_start:core_end] = b'\x01' * (core_end - core_start)
+            matches.append((core_start, core_end, idx))
+    matches.sort()
     return matches
 
-def create_replacements_list_for_localized_replacement(text, placeholders: List[str],
-                                                       replacements_list_for_localized_string: List[Tuple[str, str, str]]
-                                                       ) -> List[List[str]]:
+def split_by_prioritized_matches(text: str,
+                                 replacements: List[Tuple[str, str, str]],
+                                 matcher: Dict[str, object]) -> Tuple[List[str], List[str]]:
     """
-    '@xxx@' で囲まれた箇所を検出し、
-    その内部文字列 'xxx' を replacements_list_for_localized_string で置換した結果を
-    placeholder に置き換える。
+    find_prioritized_matches で確定した箇所で text を分割し、
+    (置換されない部分のリスト, 置換後文字列のリスト) を返す。
+    前者は後者より1つ多く、交互に並べて join すると
+    「old → placeholder → new」の段階置換と同じ文字列になる。
     """
-    matches = find_at_enclosed_strings_for_localized_replacement(text)
-    tmp_list = []
-    for i, match in enumerate(matches):
-        if i < len(placeholders):
-            replaced_match = safe_replace(match, replacements_list_for_localized_string)
-            tmp_list.append([f"@{match}@", placeholders[i], replaced_match])
-        else:
-            break
-    return tmp_list
+    plain_pieces = []
+    replaced_pieces = []
+    prev_end = 0
+    for start, end, idx in find_prioritized_matches(text, replacements, matcher):
+        old, new, placeholder = replacements[idx]
+        lead, trail = context_widths(old, new, placeholder)
+        plain_pieces.append(text[prev_end:start])
+        replaced_pieces.append(new[lead:len(new) - trail])
+        prev_end = end
+    plain_pieces.append(text[prev_end:])
+    return plain_pieces, replaced_pieces
 
-# ================================
-# 5) メインの複合文字列(漢字)置換関数
-# ================================
-def orchestrate_comprehensive_esperanto_text_replacement(
-    text, 
-    placeholders_for_skipping_replacements: List[str],
-    replacements_list_for_localized_string: List[Tuple[str, str, str]],
-    placeholders_for_localized_replacement: List[str],
-    replacements_final_list: List[Tuple[str, str, str]],
-    replacements_list_for_2char: List[Tuple[str, str, str]],
-    format_type: str
-) -> str:
+def choose_token_mark_char(text: str) -> str:
     """
-    複数の変換ルールに従ってエスペラント文を文字列(漢字)置換するメイン関数。
-
-    1) 空白の正規化 → 2) エスペラント文字(ĉ等)の字上符形式統一
-    3) %で囲まれた部分をスキップ
-    4) @で囲まれた部分を局所置換
-    5) 大域置換
-    6) 2文字語根の置換を2回
-    7) プレースホルダ復元
-    8) HTML形式が指定なら追加整形
+    text 中に現れない私用領域(U+E000〜)の文字を1つ選んで返す。
+    置換箇所を作業用文字列の中で表す目印に使う。
     """
-    # 1, 2) 空白の正規化 + エスペラント字上符への変換
-    text = unify_halfwidth_spaces(text)
-    text = convert_to_circumflex(text)
-
-    # 3) %...% スキップ部の一時置換
-    replacements_list_for_intact_parts = create_replacements_list_for_intact_parts(text, placeholders_for_skipping_replacements)
-    # 文字数長い順にsort (衝突を避けるため)
-    sorted_replacements_list_for_intact_parts = sorted(replacements_list_for_intact_parts, key=lambda x: len(x[0]), reverse=True)
-    for original, place_holder_ in sorted_replacements_list_for_intact_parts:
-        text = text.replace(original, place_holder_)
-
-    # 4) @...@ 局所置換
-    tmp_replacements_list_for_localized_string_2 = create_replacements_list_for_localized_replacement(
-        text, placeholders_for_localized_replacement, replacements_list_for_localized_string
-    )
-    sorted_replacements_list_for_localized_string = sorted(tmp_replacements_list_for_localized_string_2, key=lambda x: len(x[0]), reverse=True)
-    for original, place_holder_, replaced_original in sorted_replacements_list_for_localized_string:
-        text = text.replace(original, place_holder_)
+    for code in range(0xE000, 0xF900):
+        if chr(code) not in text:
+            return chr(code)
+    raise ValueError("目印に使える私用領域の文字が見つかりません。")
 
-    # 5) 大域置換 (old, new, placeholder)
-    valid_replacements = {}
-    for old, new, placeholder in replacements_final_list:
-        if old in text:
-            text = text.replace(old, placeholder)
-            valid_replacements[placeholder] = new
+# ================================
+# 4-3) 2文字語根置換用の照合器
+# ================================
+# replacements_list_for_2char のルールは次の3種類だけから成る。
+#   単体   ' xx ' → ' $N$ '  (前後のスペースは残る)
+#   接尾辞 '$xx'  → '$$N$'   (前の '$' は残る)
+#   接頭辞 'xx$'  → '$N$$'   (後ろの '$' は残る)
+# どれも語根の2文字を '$N$' に置き換えるだけなので、置換済みの語根が新たな '$' の境界となり、
+# 隣の語根('$adig' の 'ig' 等)が次のルールで置換できるようになる。従来はこれを
+# 「全ルールで1回目の置換 → '!' で囲んだ placeholder で2回目の置換 → 逆順に復元」で処理していた。
+#
+# 語根どうしが影響し合うのは、スペース1つで区切られた単体語根の並び(' al de ')と、
+# '$' に接した語根の文字の並び('$adig' / 'realen$')の中だけである。
+# そこで、これらの「領域」を1つの正規表現で本文から1回の走査で拾い、
+# 領域ごとに従来の2回置換を行った結果を記憶しておいて使い回す
+# (同じ語・同じ並びは本文中に何度も現れるので、ほとんどは辞書を引くだけで済む)。
+# 領域の外に影響が及ぶ特殊な入力(本文中の '$' など)では、本文全体に従来の方式を使う。
 
-    # 6) 2文字語根置換(2回)
+TWO_CHAR_ROOT_MEMO_SIZE = 1 << 16
+
+def replace_2char_roots_by_two_passes(text: str, replacements_list_for_2char: List[Tuple[str, str, str]],
+                                      return_count: bool = False):
+    """
+    従来どおりの2文字語根置換(全ルールで2回置換し、placeholder を逆順に復元する)。
+    return_count=True なら (置換後の文字列, 2回の置換で一致した箇所の数) を返す。
+    """
+    count = 0
     valid_replacements_for_2char_roots = {}
     for old, new, placeholder in replacements_list_for_2char:
         if old in text:
+            if return_count:
+                count += text.count(old)
             text = text.replace(old, placeholder)
             valid_replacements_for_2char_roots[placeholder] = new
 
     valid_replacements_for_2char_roots_2 = {}
     for old, new, placeholder in replacements_list_for_2char:
         if old in text:
+            if return_count:
+                count += text.count(old)
             place_holder_second = "!" + placeholder + "!"
             text = text.replace(old, place_holder_second)
             valid_replacements_for_2char_roots_2[place_holder_second] = new
 
-    # 7) placeholderを最終的な文字列に戻す
+    # placeholderを最終的な文字列に戻す
     for place_holder_second, new in reversed(valid_replacements_for_2char_roots_2.items()):
         text = text.replace(place_holder_second, new)
 
     for placeholder, new in reversed(valid_replacements_for_2char_roots.items()):
         text = text.replace(placeholder, new)
+    return (text, count) if return_count else text
 
-    for placeholder, new in valid_replacements.items():
-        text = text.replace(placeholder, new)
+def _two_char_root_kind(old: str, new: str, placeholder: str) -> Optional[Tuple[str, str, str]]:
+    """
+    ルールが単体('standalone')・接尾辞('suffix')・接頭辞('prefix')のどれかの形をしていれば
+    (種類, 語根の2文字, placeholder の '$N$' の部分) を返す。どれでもなければ None。
+    """
+    if len(old) == 4 and old[0] == ' ' and old[3] == ' ':
+        if placeholder[:1] == ' ' and placeholder[-1:] == ' ' and new[:1] == ' ' and new[-1:] == ' ' and '$' not in new:
+            return 'standalone', old[1:3], placeholder[1:-1]
+    elif len(old) == 3 and old[0] == '$':
+        if placeholder[:1] == '$' and new[:1] == '$' and '$' not in new[1:]:
+            return 'suffix', old[1:], placeholder[1:]
+    elif len(old) == 3 and old[2] == '$':
+        if placeholder[-1:] == '$' and new[-1:] == '$' and '$' not in new[:-1]:
+            return 'prefix', old[:2], placeholder[:-1]
+    return None
+
+def build_two_char_root_matcher(replacements_list_for_2char: List[Tuple[str, str, str]]) -> Optional[Dict[str, object]]:
+    """
+    2文字語根の領域を拾う正規表現などをまとめた照合器を作る。
+    - pattern : 単体語根の並び / '$' に接した語根の文字の並び を拾う正規表現
+    - fallback: 本文全体を従来の方式で置換すべき入力を見つける正規表現
+    - memo    : 領域 → (置換後の文字列, 一致した箇所の数) の LRU (件数の上限は TWO_CHAR_ROOT_MEMO_SIZE)
+    - memo_lock: memo を守るロック (照合器は Streamlit の複数のセッションのスレッドから共有される)
+    ルールが上の3種類の形になっていない等、領域ごとの置換が従来と一致する保証がない場合は None を返す。
+    """
+    standalone_roots = set()
+    affix_chars = set()
+    affix_roots = {'suffix': set(), 'prefix': set()}
+    cores = []
+    for old, new, placeholder in replacements_list_for_2char:
+        kind = _two_char_root_kind(old, new, placeholder)
+        if kind is None:
+            return None
+        kind_name, root, core = kind
+        # 語根に境界の文字が含まれたり、'$N$' の部分に他の文字が混ざったりすると領域の前提が崩れる
+        if set(root) & set(" $!") or len(core) < 3 or core[0] != '$' or core[-1] != '$' or set(core[1:-1]) & set(" $!"):
+            return None
+        cores.append(core)
+        if kind_name == 'standalone':
+            standalone_roots.add(root)
+        else:
+            affix_roots[kind_name].add(root)
+            affix_chars.update(root)
+    # '$N$' の中の文字列が接尾辞・接頭辞の語根として拾われてしまう組み合わせも対象外
+    for core in cores:
+        if core[1:3] in affix_roots['suffix'] or core[-3:-1] in affix_roots['prefix']:
+            return None
+
+    alternatives = []
+    if standalone_roots:
+        alternatives.append(" (?:(?:" + "|".join(map(re.escape, sorted(standalone_roots))) + ") )+")
+    if affix_chars:
+        letters = "[" + "".join(map(re.escape, sorted(affix_chars))) + "]+"
+        alternatives.append(r"\$" + letters + r"\$|\$" + letters + "|" + letters + r"\$")
+    if not alternatives:
+        return {"pattern": None, "fallback": None, "memo": collections.OrderedDict(), "memo_lock": threading.Lock()}
+
+    # '! xx !' の単体語根は、置換後に2回目の placeholder('! $N$ !')と同じ並びになり、
+    # 従来の方式では前後の '!' ごと復元されてしまうため、その結果に合わせる
+    fallback = re.compile("! (?:" + "|".join(map(re.escape, sorted(standalone_roots))) + ") !") \
+        if standalone_roots else None
+    return {"pattern": re.compile("|".join(alternatives)), "fallback": fallback,
+            "memo": collections.OrderedDict(), "memo_lock": threading.Lock()}
+
+# 照合器のキャッシュ (同じリストオブジェクトに対しては1度だけ構築する。ロックは _MATCHER_CACHE_LOCK)
+_TWO_CHAR_MATCHER_CACHE: "collections.OrderedDict[int, Tuple[list, Optional[Dict[str, object]]]]" = collections.OrderedDict()
+
+def get_two_char_root_matcher(replacements_list_for_2char: List[Tuple[str, str, str]]) -> Optional[Dict[str, object]]:
+    """
+    replacements_list_for_2char に対応する照合器を返す。リストの同一性(id)をキーにキャッシュする。
+    """
+    matcher, found = _get_cached_matcher(_TWO_CHAR_MATCHER_CACHE, replacements_list_for_2char)
+    if found:
+        return matcher
+    matcher = build_two_char_root_matcher(replacements_list_for_2char)
+    register_two_char_root_matcher(replacements_list_for_2char, matcher)
+    return matcher
+
+def register_two_char_root_matcher(replacements_list_for_2char: List[Tuple[str, str, str]],
+                                   matcher: Optional[Dict[str, object]]) -> None:
+    """
+    構築済みの2文字語根用の照合器をキャッシュに登録する。
+    """
+    _register_cached_matcher(_TWO_CHAR_MATCHER_CACHE, replacements_list_for_2char, matcher)
+
+def replace_2char_roots(text: str, replacements_list_for_2char: List[Tuple[str, str, str]], token_mark: str,
+                        match_counter: Optional[List[int]] = None) -> str:
+    """
+    大域置換箇所を token_mark ('$<目印>$') で表した作業用文字列 text に2文字語根置換を行う。
+    結果は replace_2char_roots_by_two_passes と同じになる。
+    match_counter ([0] のようなリスト) を渡すと、一致した箇所の数をその先頭に足し込む。
+    """
+    matcher = get_two_char_root_matcher(replacements_list_for_2char)
+    if matcher is None or text.count('$') != 2 * text.count(token_mark) or \
+            (matcher["fallback"] is not None and matcher["fallback"].search(text)):
+        text, count = replace_2char_roots_by_two_passes(text, replacements_list_for_2char, return_count=True)
+        if match_counter is not None:
+            match_counter[0] += count
+        return text
+    pattern = matcher["pattern"]
+    if pattern is None:
+        return text
+    memo = matcher["memo"]
+    memo_lock = matcher["memo_lock"]
+
+    def replace_region(m) -> str:
+        region = m.group()
+        with memo_lock:
+            entry = memo.get(region)
+            if entry is not None:
+                memo.move_to_end(region)
+        if entry is None:
+            # 置換そのものはロックの外で行い、覚えるときだけロックを取る (最も長く使われていない領域から捨てる)
+            entry = replace_2char_roots_by_two_passes(region, replacements_list_for_2char, return_count=True)
+            with memo_lock:
+                memo[region] = entry
+                memo.move_to_end(region)
+                while len(memo) > TWO_CHAR_ROOT_MEMO_SIZE:
+                    memo.popitem(last=False)
+        if match_counter is not None:
+            match_counter[0] += entry[1]
+        return entry[0]
+
+    return pattern.sub(replace_region, text)
+
+# ================================
+# 4-4) 置換の段ごとの計測
+# ================================
+# orchestrate_comprehensive_esperanto_text_replacement に stage_stats
+# (new_replacement_stage_stats() の dict) を渡すと、段ごとに
+#   calls     : その段を実行した呼び出しの回数 (localized / global / 2char は対象の部分がある時だけ数える)
+#   seconds   : 経過時間の合計 (並列処理ではワーカーごとの時間の合計)
+#   matches   : 一致した置換ルールの箇所数 (skip は %...% の部分の数、html は変換した空白・改行の数)
+#   bytes_in  : 段に入った文字列の UTF-8 バイト数
+#   bytes_out : 段から出た文字列の UTF-8 バイト数
+# を足し込む。バイト数は計測時間に含めない。stage_stats=None (既定) なら何も記録しない。
+REPLACEMENT_STAGES = ("normalize", "split", "skip", "localized", "global", "2char", "restore", "html")
+
+def new_replacement_stage_stats() -> Dict[str, Dict[str, float]]:
+    """全ての段の値を 0 にした計測用の dict を返す。"""
+    return {
+        stage: {"calls": 0, "seconds": 0.0, "matches": 0, "bytes_in": 0, "bytes_out": 0}
+        for stage in REPLACEMENT_STAGES
+    }
+
+def _utf8_size(text) -> int:
+    """文字列 (または文字列のリスト・リストの組) の UTF-8 バイト数。"""
+    if isinstance(text, str):
+        return len(text.encode("utf-8"))
+    return sum(_utf8_size(piece) for piece in text)
+
+def _record_stage(stage_stats: Optional[Dict[str, Dict[str, float]]], stage: str, started: float,
+                  matches: int, text_in, text_out, calls: int = 1) -> None:
+    """
+    started (time.perf_counter() の値) から今までを stage の時間として stage_stats に足し込む。
+    1回の呼び出しの中で同じ段を何か所かに分けて計測する場合は、2か所目以降を calls=0 で記録する。
+    """
+    if stage_stats is None:
+        return
+    seconds = time.perf_counter() - started
+    record = stage_stats[stage]
+    record["calls"] += calls
+    record["seconds"] += seconds
+    record["matches"] += matches
+    record["bytes_in"] += _utf8_size(text_in)
+    record["bytes_out"] += _utf8_size(text_out)
+
+def merge_replacement_stage_stats(total: Dict[str, Dict[str, float]], part: Dict[str, Dict[str, float]]) -> None:
+    """part (ワーカー等で記録した計測結果) を total に足し込む。"""
+    for stage, record in part.items():
+        target = total.setdefault(stage, {key: 0 for key in record})
+        for key, value in record.items():
+            target[key] += value
+
+def format_replacement_stage_stats(stage_stats: Dict[str, Dict[str, float]]) -> List[str]:
+    """計測結果を表の行にする (1行目は見出し、最後の行は合計)。"""
+    lines = [f"{'stage':<10} {'calls':>7} {'seconds':>10} {'matches':>10} {'bytes_in':>12} {'bytes_out':>12}"]
+    total_seconds = 0.0
+    for stage, record in stage_stats.items():
+        total_seconds += record["seconds"]
+        lines.append(
+            f"{stage:<10} {record['calls']:>7} {record['seconds']:>10.4f} {record['matches']:>10}"
+            f" {record['bytes_in']:>12} {record['bytes_out']:>12}"
+        )
+    lines.append(f"{'total':<10} {'':>7} {total_seconds:>10.4f}")
+    return lines
+
+# ================================
+# 5) メインの複合文字列(漢字)置換関数
+# ================================
+def orchestrate_comprehensive_esperanto_text_replacement(
+    text, 
+    replacements_list_for_localized_string: List[Tuple[str, str, str]],
+    replacements_final_list: List[Tuple[str, str, str]],
+    replacements_list_for_2char: List[Tuple[str, str, str]],
+    format_type: str,
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> str:
+    """
+    複数の変換ルールに従ってエスペラント文を文字列(漢字)置換するメイン関数。
+
+    1) 空白の正規化 → 2) エスペラント文字(ĉ等)の字上符形式統一
+    3) %で囲まれた部分をスキップ
+    4) @で囲まれた部分を局所置換 (replace_localized_segments)
+    5) 大域置換 (replace_plain_segments)
+    6) 2文字語根の置換を2回 (replace_plain_segments)
+    7) 各部分を元の順に繋ぎ直す
+    8) HTML形式が指定なら追加整形
+
+    3), 4) は split_marked_segments で本文を1回だけ走査して「通常」「%...%」「@...@」の部分に分け、
+    各段はその段が扱う種類の部分だけを処理する (5), 6) は通常の部分、局所置換は @...@ の部分)。
+    最後に全ての部分を元の順に1回で繋ぐ。
+    (%...% / @...@ の部分を placeholder に置き換えないので、そのための占位符の表は使わない)
+
+    stage_stats (new_replacement_stage_stats() の dict) を渡すと、各段の時間・一致数・入出力のバイト数を
+    足し込む (段の名前は REPLACEMENT_STAGES)。
+    """
+    # 1, 2) 空白の正規化 + エスペラント字上符への変換
+    started = time.perf_counter()
+    normalized_text = unify_halfwidth_spaces_and_convert_to_circumflex(text)
+    _record_stage(stage_stats, "normalize", started, 0, text, normalized_text)
+    text = normalized_text
+
+    # 3, 4) %...% (スキップ) と @...@ (局所置換) の部分を切り分ける
+    started = time.perf_counter()
+    segments = split_marked_segments(text)
+    # 同じ種類の部分同士は、どのルールにも現れない区切り文字を挟んで繋ぎ、種類ごとに1回で処理する
+    # (%...% / @...@ をまたいで置換ルールが一致しないようにするため)
+    segment_separator = choose_token_mark_char(text)
+    plain_segments = [segment for kind, segment in segments if kind == 'plain']
+    local_segments = [segment for kind, segment in segments if kind == 'local']
+    skip_segments = [segment for kind, segment in segments if kind == 'skip']
+    _record_stage(stage_stats, "split", started, len(local_segments) + len(skip_segments), text, text)
+
+    # %...% の部分は囲み記号を外すだけ
+    started = time.perf_counter()
+    skip_results = [segment.replace("%", "") for segment in skip_segments]
+    _record_stage(stage_stats, "skip", started, len(skip_segments), skip_segments, skip_results)
+
+    # 5), 6) は通常の部分だけ、局所置換は @...@ の部分だけ
+    results_by_kind = {
+        'plain': iter(replace_plain_segments(
+            plain_segments, segment_separator,
+            replacements_final_list, replacements_list_for_2char, stage_stats
+        )),
+        'local': iter(replace_localized_segments(
+            local_segments, segment_separator,
+            replacements_list_for_localized_string, stage_stats
+        )),
+        'skip': iter(skip_results),
+    }
 
-    # 局所(@)・スキップ(%) の復元
-    for original, place_holder_, replaced_original in sorted_replacements_list_for_localized_string:
-        text = text.replace(place_holder_, replaced_original.replace("@",""))
-    for original, place_holder_ in sorted_replacements_list_for_intact_parts:
-        text = text.replace(place_holder_, original.replace("%",""))
+    # 7) 各部分の結果を元の順に1回で繋ぐ
+    #    (通常の部分の中で大域置換の結果を埋め込む処理と合わせて restore として計測する)
+    started = time.perf_counter()
+    joined_text = ''.join(next(results_by_kind[kind]) for kind, _ in segments)
+    _record_stage(stage_stats, "restore", started, 0, joined_text, joined_text)
+    text = joined_text
 
     # 8) HTML形式であれば、改行を <br> に変換 + スペースを &nbsp; に置換
     if "HTML" in format_type:
-        text = text.replace("\n", "<br>\n")
         # text = wrap_text_with_ruby(text, chunk_size=10) # (過去の関数/不要)
-        text = re.sub(r"   ", "&nbsp;&nbsp;&nbsp;", text)  # 3つ以上の空白を変換
-        text = re.sub(r"  ", "&nbsp;&nbsp;", text)  # 2つ以上の空白を変換
+        started = time.perf_counter()
+        html_text, converted = convert_whitespace_for_html(text, return_count=True)
+        _record_stage(stage_stats, "html", started, converted, text, html_text)
+        text = html_text
 
     return text
 
+def replace_plain_segments(
+    plain_segments: List[str],
+    segment_separator: str,
+    replacements_final_list: List[Tuple[str, str, str]],
+    replacements_list_for_2char: List[Tuple[str, str, str]],
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> List[str]:
+    """
+    通常の部分(%...% / @...@ 以外)に大域置換と2文字語根置換を行い、同じ順番のリストで返す。
+    各部分は segment_separator を挟んで繋ぎ、まとめて1回で処理する。
+    stage_stats を渡すと global / 2char / restore の各段を計測する。
+    """
+    if not plain_segments:
+        return []
+    started = time.perf_counter()
+    text = segment_separator.join(plain_segments)
+
+    # 5) 大域置換 (old, new, placeholder)
+    #    多パターン照合器で1回だけ走査し、置換箇所と置換後文字列を記録する。
+    #    (本文を placeholder に書き換えて後で new に戻す、という往復は行わない)
+    plain_pieces, replaced_pieces = split_by_prioritized_matches(
+        text, replacements_final_list, get_multi_pattern_matcher(replacements_final_list)
+    )
+    _record_stage(stage_stats, "global", started, len(replaced_pieces), plain_segments, (plain_pieces, replaced_pieces))
+
+    # 6) 2文字語根置換
+    #    2文字語根のルール('$ad', 'al$' 等)は大域置換箇所の境界 '$' を手掛かりにするため、
+    #    大域置換箇所を「$<区切り文字>$」という短い目印で表した作業用文字列の上で行う。
+    #    語根の領域だけを1回の走査で拾って置換する (replace_2char_roots)。
+    started = time.perf_counter()
+    token_mark = '$' + choose_token_mark_char(text + segment_separator) + '$'
+    working_text = token_mark.join(plain_pieces)
+    match_counter = [0] if stage_stats is not None else None
+    text = replace_2char_roots(working_text, replacements_list_for_2char, token_mark, match_counter)
+    if stage_stats is not None:
+        _record_stage(stage_stats, "2char", started, match_counter[0], working_text, text)
+
+    # 大域置換の結果は、目印で区切って1回の join で埋め込む
+    started = time.perf_counter()
+    plain_pieces = text.split(token_mark)
+    output_pieces = [plain_pieces[0]]
+    for replaced, plain in zip(replaced_pieces, plain_pieces[1:]):
+        output_pieces.append(replaced)
+        output_pieces.append(plain)
+    output_segments = ''.join(output_pieces).split(segment_separator)
+    # バイト数は本文全体を繋ぐ所 (orchestrate_comprehensive_esperanto_text_replacement の 7) でまとめて数える
+    _record_stage(stage_stats, "restore", started, len(replaced_pieces), (), (), calls=0)
+    return output_segments
+
+def replace_localized_segments(
+    local_segments: List[str],
+    segment_separator: str,
+    replacements_list_for_localized_string: List[Tuple[str, str, str]],
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> List[str]:
+    """
+    @...@ の中身に局所置換用のリストで置換を行い、'@' を取り除いたものを同じ順番のリストで返す。
+    各部分ごとの safe_replace と同じ結果になるが、全ての部分を繋いで多パターン照合器で1回だけ走査する
+    (本文中の placeholder と同じ文字列を誤って置換してしまうこともない)。
+    stage_stats を渡すと localized の段として計測する。
+    """
+    if not local_segments:
+        return []
+    started = time.perf_counter()
+    plain_pieces, replaced_pieces = split_by_prioritized_matches(
+        segment_separator.join(local_segments),
+        replacements_list_for_localized_string,
+        get_multi_pattern_matcher(replacements_list_for_localized_string)
+    )
+    output_pieces = [plain_pieces[0]]
+    for replaced, plain in zip(replaced_pieces, plain_pieces[1:]):
+        output_pieces.append(replaced)
+        output_pieces.append(plain)
+    output_segments = ''.join(output_pieces).replace("@", "").split(segment_separator)
+    _record_stage(stage_stats, "localized", started, len(replaced_pieces), local_segments, output_segments)
+    return output_segments
+
+# HTML形式での改行・連続スペースの変換 (3つの空白を優先し、残った2つの空白も変換する)
+HTML_WHITESPACE_PATTERN = re.compile(r"\n|   |  ")
+HTML_WHITESPACE_REPLACEMENTS = {
+    "\n": "<br>\n",
+    "   ": "&nbsp;&nbsp;&nbsp;",
+    "  ": "&nbsp;&nbsp;",
+}
+
+def convert_whitespace_for_html(text: str, return_count: bool = False):
+    """
+    改行を <br> 付きに、連続する空白を &nbsp; に変換する。
+    text.replace("\n", "<br>\n") → 3つの空白 → 2つの空白 の順に置換するのと同じ結果を1回の走査で得る。
+    return_count=True なら (変換後の文字列, 変換した箇所の数) を返す。
+    """
+    converted = HTML_WHITESPACE_PATTERN.subn(lambda m: HTML_WHITESPACE_REPLACEMENTS[m.group()], text)
+    return converted if return_count else converted[0]
+
+# ================================
+# 5-2) 変換結果のキャッシュ
+# ================================
+# 同じ本文を同じ規則集合・同じ出力形式で置換し直すことは多い
+# (出力文字形式だけを変えて再送信する、結果を再ダウンロードする等)。
+# 置換結果は (本文の sha256, 規則集合のハッシュ, format_type) で決まるので、そのキーで保持しておく。
+# 出力文字形式(字上符/^形式)の変換は軽い後処理なので、キャッシュした結果に毎回かける。
+DEFAULT_RESULT_CACHE_BUDGET_BYTES = 256 << 20
+
+def replacement_result_key(text: str, rule_set_key: str, format_type: str) -> Tuple[str, str, str]:
+    """変換結果のキャッシュのキー (本文はハッシュにして持つ)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), rule_set_key, format_type
+
+class ReplacementResultCache:
+    """
+    キー → 置換結果(文字列) の LRU キャッシュ。
+    結果の文字数(UTF-8 換算のおおよそのバイト数)の合計が budget_bytes を超えたら、
+    最も長く使われていないものから捨てる。上限より大きい結果は保持しない。
+    """
+    def __init__(self, budget_bytes: int = DEFAULT_RESULT_CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries: "collections.OrderedDict[Tuple[str, str, str], str]" = collections.OrderedDict()
+        self._total_nbytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _nbytes(result: str) -> int:
+        # 韓国語・漢字の多い結果でも上限を甘く見積もらないよう、1文字3バイトで数える
+        return 3 * len(result)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.stats["misses"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            return result
+
+    def put(self, key: Tuple[str, str, str], result: str) -> None:
+        nbytes = self._nbytes(result)
+        if nbytes > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_nbytes -= self._nbytes(old)
+            self._entries[key] = result
+            self._total_nbytes += nbytes
+            while self._total_nbytes > self.budget_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_nbytes -= self._nbytes(evicted)
+                self.stats["evictions"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_nbytes(self) -> int:
+        return self._total_nbytes
+
+# 長い本文の一部だけを直して再送信した場合は、段落(行)ごとに結果を使い回す。
+# どの置換も改行をまたがないので(parallel_process が改行の直後で分割するのと同じ前提)、
+# 段落ごとの結果を繋いだものは本文全体を一度に置換した結果と一致する。
+def split_paragraphs(text: str) -> List[str]:
+    """text を改行の直後で分ける (各段落は末尾の改行を含む。最後の段落だけは含まないこともある)"""
+    paragraphs = text.split("\n")
+    last = paragraphs.pop()
+    paragraphs = [paragraph + "\n" for paragraph in paragraphs]
+    if last:
+        paragraphs.append(last)
+    return paragraphs
+
+def convert_paragraphs_incrementally(
+    text: str,
+    convert,
+    cache: ReplacementResultCache,
+    rule_set_key: str,
+    format_type: str
+) -> Tuple[str, int]:
+    """
+    text を段落に分け、cache にある段落は結果を使い回し、無い段落だけを convert (本文 → 置換結果 の関数。
+    orchestrate_comprehensive_esperanto_text_replacement や parallel_process に引数を束ねたもの) で置換する。
+    変わった段落はまとめて1回の convert に渡す。戻り値は (置換結果, 使い回した段落数)。
+    """
+    paragraphs = split_paragraphs(text)
+    keys = [replacement_result_key(paragraph, rule_set_key, format_type) for paragraph in paragraphs]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        converted = split_paragraphs(convert(''.join(paragraphs[i] for i in missing)))
+        if len(converted) != len(missing):
+            # 置換後の文字列が改行を含む等で段落の対応が取れない場合は、1段落ずつ置換する
+            converted = [convert(paragraphs[i]) for i in missing]
+        for i, result in zip(missing, converted):
+            results[i] = result
+            cache.put(keys[i], result)
+    return ''.join(results), len(paragraphs) - len(missing)
+
 # ================================
 # 6) multiprocessing 関連
 # ================================
 
 def process_segment(
     lines: List[str],
-    placeholders_for_skipping_replacements: List[str],
     replacements_list_for_localized_string: List[Tuple[str, str, str]],
-    placeholders_for_localized_replacement: List[str],
     replacements_final_list: List[Tuple[str, str, str]],
     replacements_list_for_2char: List[Tuple[str, str, str]],
     format_type: str
@@ -275,9 +998,7 @@ def process_segment(
     segment = ''.join(lines)
     result = orchestrate_comprehensive_esperanto_text_replacement(
         segment,
-        placeholders_for_skipping_replacements,
         replacements_list_for_localized_string,
-        placeholders_for_localized_replacement,
         replacements_final_list,
         replacements_list_for_2char,
         format_type
@@ -285,75 +1006,357 @@ def process_segment(
     return result
 
 
+# 並列処理用のチャンク分割
+#  - 行数ではなく文字数がほぼ均等になるように分割し、ワーカー数より多いチャンクを
+#    imap で順に配ることで、長い段落を受け持ったワーカーだけが遅れるのを防ぐ。
+#  - 分割してよいのは、分割しても置換結果が変わらない位置だけ:
+#      * 改行の直後 (%...% / @...@ の検出も、どの置換ルールも改行をまたがない)
+#      * 行が長すぎる場合は、どの置換ルールの old にも含まれない区切り文字(「,」等)の直後。
+#        ただし前後 MARKER_SPAN_LIMIT 文字以内の両側に '%' か '@' がある位置は
+#        %...% / @...@ の途中かもしれないので使わない。
+CHUNKS_PER_PROCESS = 4
+IMAP_CHUNKSIZE = 1
+SPLIT_CHAR_CANDIDATES = ",;:?。、，；：？"
+MARKER_SPAN_LIMIT = 51  # '%' + 50文字以内 + '%' の最大幅 - 1 ('@' は 18 文字以内なのでこれに収まる)
+
+
+def find_safe_split_chars(*replacement_lists: List[Tuple[str, str, str]]) -> str:
+    """
+    SPLIT_CHAR_CANDIDATES のうち、どの置換ルールの old にも現れない文字を返す
+    (その文字の直後で本文を分割しても、置換結果が変わらない)。
+    """
+    split_chars = SPLIT_CHAR_CANDIDATES
+    for replacements in replacement_lists:
+        olds = replacements.column(0) if hasattr(replacements, "column") else [old for old, _, _ in replacements]
+        joined = "\n".join(olds)
+        split_chars = "".join(c for c in split_chars if c not in joined)
+    return split_chars
+
+
+def _is_outside_marker_span(text: str, pos: int) -> bool:
+    """pos の位置で分割しても、%...% / @...@ を途中で切らないことが確実かどうか。"""
+    before = text[max(pos - MARKER_SPAN_LIMIT, 0):pos]
+    after = text[pos:pos + MARKER_SPAN_LIMIT]
+    return not (('%' in before or '@' in before) and ('%' in after or '@' in after))
+
+
+def plan_balanced_chunks(text: str, num_chunks: int, split_chars: str = "") -> List[str]:
+    """
+    text を文字数がほぼ均等な num_chunks 個程度のチャンクに分割する (結合すると元の text に戻る)。
+    分割位置は改行の直後か、split_chars のいずれかの文字の直後 (%...% / @...@ の外側) に限る。
+    """
+    n = len(text)
+    if num_chunks <= 1 or n == 0:
+        return [text]
+    target = -(-n // num_chunks)
+    split_pattern = re.compile('[' + re.escape(split_chars) + ']') if split_chars else None
+
+    chunks = []
+    start = 0
+    while start < n:
+        want = start + target
+        if want >= n:
+            chunks.append(text[start:])
+            break
+        # 目標位置以降で最初の改行の直後
+        newline = text.find('\n', want - 1)
+        end = n if newline == -1 else newline + 1
+        # 改行より手前に安全な区切り文字があればそちらで切る
+        if split_pattern is not None:
+            search_from = want - 1
+            while True:
+                m = split_pattern.search(text, search_from, end - 1)
+                if m is None:
+                    break
+                if _is_outside_marker_span(text, m.end()):
+                    end = m.end()
+                    break
+                search_from = m.end()
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+# 常駐ワーカープール
+#  - 置換規則はプール生成時に共有メモリへ1回だけ書き込み (SharedRuleSet)、
+#    各ワーカーは initializer でその名前だけを受け取ってコピーせずに参照する。
+#    以降のタスクではテキスト断片と format_type だけを送る。
+#  - (プロセス数, 規則集合) ごとのプールを最大 REPLACEMENT_POOL_CACHE_SIZE 個まで使い回す。
+#    Streamlit では各セッションが別スレッドから呼ぶので、表の操作はロックで守り、
+#    プールを使用中のセッション数(users)が 0 のものだけを古い順に閉じる
+#    (他のセッションが imap で結果を待っているプールを途中で終了させない)。
+_WORKER_RULES: Dict[str, object] = {}
+REPLACEMENT_POOL_CACHE_SIZE = 2
+_REPLACEMENT_POOLS: "collections.OrderedDict[Tuple[int, str], Dict[str, object]]" = collections.OrderedDict()
+_REPLACEMENT_POOL_LOCK = threading.Lock()
+
+
+def _init_replacement_worker(shared_rule_set_name: str) -> None:
+    """
+    ワーカープロセスの初期化関数。共有メモリ上の置換規則に接続してプロセス内に保持する。
+    大域置換用の照合器も共有メモリのヘッダから復元される。
+    """
+    # esp_replacement_binary_module はこのモジュールを import しているので、ここで読み込む
+    from esp_replacement_binary_module import attach_shared_rule_set
+    (replacements_final_list,
+     replacements_list_for_localized_string,
+     replacements_list_for_2char) = attach_shared_rule_set(shared_rule_set_name)
+    _WORKER_RULES.update(
+        replacements_list_for_localized_string=replacements_list_for_localized_string,
+        replacements_final_list=replacements_final_list,
+        replacements_list_for_2char=replacements_list_for_2char,
+    )
+
+
+def _process_segment_in_worker(segment: str, format_type: str, collect_stage_stats: bool = False):
+    """
+    常駐ワーカー側の下請け関数。初期化時に受け取った規則で segment を置換する。
+    collect_stage_stats=True なら (置換結果, この断片の段ごとの計測結果) を返す。
+    """
+    stage_stats = new_replacement_stage_stats() if collect_stage_stats else None
+    result = orchestrate_comprehensive_esperanto_text_replacement(
+        segment,
+        _WORKER_RULES["replacements_list_for_localized_string"],
+        _WORKER_RULES["replacements_final_list"],
+        _WORKER_RULES["replacements_list_for_2char"],
+        format_type,
+        stage_stats
+    )
+    return (result, stage_stats) if collect_stage_stats else result
+
+
+def _collect_worker_result(worker_result, stage_stats: Optional[Dict[str, Dict[str, float]]]) -> str:
+    """
+    ワーカーの戻り値から置換結果を取り出す。stage_stats があれば、ワーカー側の計測結果を足し込む。
+    """
+    if stage_stats is None:
+        return worker_result
+    result, part = worker_result
+    merge_replacement_stage_stats(stage_stats, part)
+    return result
+
+
+def _create_replacement_pool_entry(
+    num_processes: int,
+    rules: Tuple[list, list, list]
+) -> Dict[str, object]:
+    """置換規則を共有メモリに置き、それを読み込むワーカープールを作る。"""
+    replacements_list_for_localized_string, replacements_final_list, replacements_list_for_2char = rules
+    from esp_replacement_binary_module import SharedRuleSet  # 循環 import を避けるためここで読み込む
+    shared = SharedRuleSet(
+        (replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char),
+        matcher=get_multi_pattern_matcher(replacements_final_list)
+    )
+    try:
+        pool = multiprocessing.Pool(
+            processes=num_processes,
+            initializer=_init_replacement_worker,
+            initargs=(shared.name,)
+        )
+    except Exception:
+        shared.close()
+        raise
+    # リスト本体も保持しておき、id の再利用による取り違えを防ぐ
+    return {
+        "pool": pool,
+        "rules": rules,
+        "shared": shared,
+        "split_chars": find_safe_split_chars(
+            replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char
+        ),
+        "users": 0,
+    }
+
+
+def _close_replacement_pool_entry(entry: Dict[str, object]) -> None:
+    entry["pool"].terminate()
+    entry["pool"].join()
+    entry["shared"].close()
+
+
+def _pop_idle_replacement_pools() -> List[Dict[str, object]]:
+    """
+    (_REPLACEMENT_POOL_LOCK を取った状態で呼ぶ)
+    プールの数が REPLACEMENT_POOL_CACHE_SIZE を超えている間、使用中でないものを古い順に表から外して返す。
+    """
+    idle = []
+    for key in list(_REPLACEMENT_POOLS):
+        if len(_REPLACEMENT_POOLS) <= REPLACEMENT_POOL_CACHE_SIZE:
+            break
+        if _REPLACEMENT_POOLS[key]["users"] == 0:
+            idle.append(_REPLACEMENT_POOLS.pop(key))
+    return idle
+
+
+@contextlib.contextmanager
+def borrow_replacement_worker_pool(
+    num_processes: int,
+    replacements_list_for_localized_string: List[Tuple[str, str, str]],
+    replacements_final_list: List[Tuple[str, str, str]],
+    replacements_list_for_2char: List[Tuple[str, str, str]],
+    rule_set_key: Optional[str] = None
+) -> Iterator[Tuple[object, str]]:
+    """
+    置換規則を読み込み済みの常駐ワーカープールを借りる with 文用の関数。
+    (プール, 分割に使える文字) を返し、with を抜けるまでそのプールは閉じられない。
+    rule_set_key (規則集合のハッシュ等) が与えられればそれで規則集合の同一性を判定し、
+    無ければ各リストの同一性(id)で判定する。
+    """
+    rules = (
+        replacements_list_for_localized_string,
+        replacements_final_list,
+        replacements_list_for_2char,
+    )
+    if rule_set_key is None:
+        rule_set_key = ":".join(str(id(r)) for r in rules)
+    key = (num_processes, rule_set_key)
+    with _REPLACEMENT_POOL_LOCK:
+        entry = _REPLACEMENT_POOLS.get(key)
+        if entry is None:
+            # 同時に同じ規則集合で呼ばれても1つしか作らないよう、ロックを持ったまま作る
+            entry = _create_replacement_pool_entry(num_processes, rules)
+            _REPLACEMENT_POOLS[key] = entry
+        else:
+            _REPLACEMENT_POOLS.move_to_end(key)
+        entry["users"] += 1
+        idle = _pop_idle_replacement_pools()
+    for idle_entry in idle:
+        _close_replacement_pool_entry(idle_entry)
+    try:
+        yield entry["pool"], entry["split_chars"]
+    finally:
+        with _REPLACEMENT_POOL_LOCK:
+            entry["users"] -= 1
+            idle = _pop_idle_replacement_pools()
+        for idle_entry in idle:
+            _close_replacement_pool_entry(idle_entry)
+
+
+def shutdown_replacement_worker_pool() -> None:
+    """
+    常駐ワーカープールをすべて終了させ、置換規則の共有メモリも解放する (プロセス終了時にも自動で呼ばれる)。
+    """
+    with _REPLACEMENT_POOL_LOCK:
+        entries = list(_REPLACEMENT_POOLS.values())
+        _REPLACEMENT_POOLS.clear()
+    for entry in entries:
+        _close_replacement_pool_entry(entry)
+
+atexit.register(shutdown_replacement_worker_pool)
+
+
 def parallel_process(
     text: str,
     num_processes: int,
-    placeholders_for_skipping_replacements: List[str],
     replacements_list_for_localized_string: List[Tuple[str, str, str]],
-    placeholders_for_localized_replacement: List[str],
     replacements_final_list: List[Tuple[str, str, str]],
     replacements_list_for_2char: List[Tuple[str, str, str]],
-    format_type: str
+    format_type: str,
+    rule_set_key: Optional[str] = None,
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None
 ) -> str:
     """
-    与えられた text を行単位で分割し、process_segment を
-    マルチプロセスで並列実行した結果を結合する。
+    与えられた text を文字数がほぼ均等なチャンクに分割し (plan_balanced_chunks)、常駐ワーカープール上で
+    orchestrate_comprehensive_esperanto_text_replacement を並列実行した結果を結合する。
+    置換規則はプール生成時に1回だけ共有メモリに置かれる (borrow_replacement_worker_pool)。
+    rule_set_key には規則集合を識別する文字列 (JSONのハッシュ等) を渡せる。
+    stage_stats を渡すと、各ワーカーでの段ごとの計測結果をそこに足し込む (時間は全ワーカーの合計)。
     """
     if num_processes <= 1:
         # シングルコアで直接orchestrate_comprehensive_esperanto_text_replacementを呼ぶ
         return orchestrate_comprehensive_esperanto_text_replacement(
             text,
-            placeholders_for_skipping_replacements,
             replacements_list_for_localized_string,
-            placeholders_for_localized_replacement,
             replacements_final_list,
             replacements_list_for_2char,
-            format_type
+            format_type,
+            stage_stats
         )
 
-    # 行ごとに分割 (改行込み)
-    lines = re.findall(r'.*?\n|.+$', text)
-    num_lines = len(lines)
-    if num_lines <= 1:
-        # 行数が1以下なら並列化しても意味ないのでシングルで
-        return orchestrate_comprehensive_esperanto_text_replacement(
-            text,
-            placeholders_for_skipping_replacements,
-            replacements_list_for_localized_string,
-            placeholders_for_localized_replacement,
-            replacements_final_list,
-            replacements_list_for_2char,
-            format_type
-        )
+    with borrow_replacement_worker_pool(
+        num_processes,
+        replacements_list_for_localized_string,
+        replacements_final_list,
+        replacements_list_for_2char,
+        rule_set_key
+    ) as (pool, split_chars):
+        # 文字数でほぼ均等に、ワーカー数より多いチャンクに分割する
+        chunks = plan_balanced_chunks(text, num_processes * CHUNKS_PER_PROCESS, split_chars)
+        if len(chunks) <= 1:
+            # 分割できなければ並列化しても意味ないのでシングルで
+            return orchestrate_comprehensive_esperanto_text_replacement(
+                text,
+                replacements_list_for_localized_string,
+                replacements_final_list,
+                replacements_list_for_2char,
+                format_type,
+                stage_stats
+            )
 
-    lines_per_process = max(num_lines // num_processes, 1)
-    ranges = [(i * lines_per_process, (i + 1) * lines_per_process) for i in range(num_processes)]
-    # 最後のプロセスに残りを全部割り当てる
-    ranges[-1] = (ranges[-1][0], num_lines)
-
-    with multiprocessing.Pool(processes=num_processes) as pool:
-        results = pool.starmap(
-            process_segment,
-            [
-                (
-                    lines[start:end],
-                    placeholders_for_skipping_replacements,
-                    replacements_list_for_localized_string,
-                    placeholders_for_localized_replacement,
-                    replacements_final_list,
-                    replacements_list_for_2char,
-                    format_type
-                )
-                for (start, end) in ranges
-            ]
+        # imap は結果をチャンクの順に返す
+        results = pool.imap(
+            functools.partial(_process_segment_in_worker, format_type=format_type,
+                              collect_stage_stats=stage_stats is not None),
+            chunks,
+            chunksize=IMAP_CHUNKSIZE
         )
-    return ''.join(results)
+        return ''.join(_collect_worker_result(result, stage_stats) for result in results)
 
 
-def apply_ruby_html_header_and_footer(processed_text: str, format_type: str) -> str:
+def parallel_process_stream(
+    segments: Iterable[str],
+    num_processes: int,
+    replacements_list_for_localized_string: List[Tuple[str, str, str]],
+    replacements_final_list: List[Tuple[str, str, str]],
+    replacements_list_for_2char: List[Tuple[str, str, str]],
+    format_type: str,
+    rule_set_key: Optional[str] = None,
+    max_pending: Optional[int] = None,
+    stage_stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> Iterator[str]:
     """
-    指定された出力形式に応じて、processed_text に対するHTMLヘッダーとフッターを適用する。
+    segments (改行の直後など、安全な位置で区切ったテキスト断片の列) を順に置換し、
+    置換結果を入力と同じ順番で1つずつ返すジェネレータ。
+    常駐ワーカープールに最大 max_pending 個 (既定はプロセス数の2倍) までしか先行投入しないので、
+    入力全体を一度にメモリに載せずに済む (ファイル→ファイルの逐次変換用)。
+    stage_stats を渡すと、段ごとの計測結果をそこに足し込む (parallel_process と同じ)。
+    """
+    if num_processes <= 1:
+        for segment in segments:
+            yield orchestrate_comprehensive_esperanto_text_replacement(
+                segment,
+                replacements_list_for_localized_string,
+                replacements_final_list,
+                replacements_list_for_2char,
+                format_type,
+                stage_stats
+            )
+        return
+
+    if max_pending is None:
+        max_pending = num_processes * 2
+    collect_stage_stats = stage_stats is not None
+    with borrow_replacement_worker_pool(
+        num_processes,
+        replacements_list_for_localized_string,
+        replacements_final_list,
+        replacements_list_for_2char,
+        rule_set_key
+    ) as (pool, _):
+        pending = collections.deque()
+        for segment in segments:
+            pending.append(pool.apply_async(_process_segment_in_worker, (segment, format_type, collect_stage_stats)))
+            if len(pending) >= max_pending:
+                yield _collect_worker_result(pending.popleft().get(), stage_stats)
+        while pending:
+            yield _collect_worker_result(pending.popleft().get(), stage_stats)
+
+
+def get_ruby_html_header_and_footer(format_type: str) -> Tuple[str, str]:
+    """
+    指定された出力形式に応じた (HTMLヘッダー, HTMLフッター) を返す。
     例: ルビサイズ調整用の<style> を挿入するなど。
+    (本文を少しずつファイルに書き出す場合は、先にヘッダー、最後にフッターを書く)
     """
     if format_type in ('HTML格式_Ruby文字_大小调整','HTML格式_Ruby文字_大小调整_汉字替换'):
         # html形式におけるルビサイズの変更形式
@@ -470,4 +1473,12 @@ ruby rt {
         ruby_style_head = ""
         ruby_style_tail = ""
     
+    return ruby_style_head, ruby_style_tail
+
+
+def apply_ruby_html_header_and_footer(processed_text: str, format_type: str) -> str:
+    """
+    指定された出力形式に応じて、processed_text に対するHTMLヘッダーとフッターを適用する。
+    """
+    ruby_style_head, ruby_style_tail = get_ruby_html_header_and_footer(format_type)
     return ruby_style_head + processed_text + ruby_style_tail
\ No newline at end of file
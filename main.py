@@ -2,11 +2,9 @@
 # main.py (メインの Streamlit アプリ/機能拡充版202502)
 
 import streamlit as st
-import re
-import io
-import json
-import pandas as pd  # 必要なら使う
-from typing import List, Dict, Tuple, Optional
+import os
+import hashlib
+from typing import Optional
 import streamlit.components.v1 as components
 import multiprocessing
 
@@ -25,47 +23,106 @@ except RuntimeError:
 # esp_text_replacement_module.py内に定義されているツールをまとめて呼び出す
 #=================================================================
 from esp_text_replacement_module import (
-    x_to_circumflex,
-    x_to_hat,
-    hat_to_circumflex,
-    circumflex_to_hat,
-    replace_esperanto_chars,
-    import_placeholders,
+    convert_to_circumflex,
+    convert_to_hat,
     orchestrate_comprehensive_esperanto_text_replacement,
     parallel_process,
-    apply_ruby_html_header_and_footer
+    apply_ruby_html_header_and_footer,
+    ReplacementResultCache,
+    replacement_result_key,
+    convert_paragraphs_incrementally,
+    new_replacement_stage_stats,
+    format_replacement_stage_stats
 )
+from esp_replacement_binary_module import (
+    CompiledRuleSet,
+    RuleSetCache,
+    compute_file_sha256
+)
+
+# アップロードされた規則集合をサーバー上に保持するメモリの上限 (目安)
+UPLOADED_RULE_SET_CACHE_BUDGET_BYTES = 1 << 30
+# 変換結果をサーバー上に保持するメモリの上限 (目安。本文全体の結果用と段落ごとの結果用)
+RESULT_CACHE_BUDGET_BYTES = 256 << 20
+PARAGRAPH_CACHE_BUDGET_BYTES = 256 << 20
+# 同梱の置換用JSONの隣にコンパイル済みファイル(.esprules)を作るか
+# (共有サーバーではデータの置き場所が読み取り専用・共有のことがあるので、既定では作らない。
+#  事前に `python esp_replacement_binary_module.py <置換用JSON>` で作っておけば読み込みには使われる)
+WRITE_COMPILED_RULE_SET = False
 
 #=================================================================
-# Streamlit の @st.cache_data デコレータを使い、読み込み結果をキャッシュして
-# JSONファイルのロード高速化を図る。大きなJSON(50MB程度)を都度読むと遅いので、
-# ここで呼び出す関数をキャッシュする作り。
+# 置換ルールは、照合器まで構築した CompiledRuleSet として
+# Streamlit の @st.cache_resource でキャッシュし、JSONの内容ハッシュ(rule_set_key)ごとに
+# 1回だけ作る。@st.cache_data と違い、再実行のたびに数十MBのリストがコピーされることはない。
+# (下線で始まる引数はキャッシュのキーに含まれない)
 #=================================================================
-@st.cache_data
-def load_replacements_lists(json_path: str) -> Tuple[List, List, List]:
+@st.cache_resource(max_entries=2)
+def load_compiled_rule_set_from_file(rule_set_key: str, _json_path: str) -> CompiledRuleSet:
     """
-    JSONファイルをロードし、以下の3つのリストをタプルとして返す:
-    1) replacements_final_list
-    2) replacements_list_for_localized_string
-    3) replacements_list_for_2char
+    置換用JSONから CompiledRuleSet を作る。
+    同じ場所に事前コンパイル済みの規則集合(.esprules)があり、JSONと内容が一致すれば
+    そちらを読み込む(無い・古い場合はJSONを読む。WRITE_COMPILED_RULE_SET=True なら .esprules を作り直しておく)。
     """
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    replacements_final_list = data.get(
-        "全域替换用のリスト(列表)型配列(replacements_final_list)", []
-    )
-    replacements_list_for_localized_string = data.get(
-        "局部文字替换用のリスト(列表)型配列(replacements_list_for_localized_string)", []
-    )
-    replacements_list_for_2char = data.get(
-        "二文字词根替换用のリスト(列表)型配列(replacements_list_for_2char)", []
-    )
-    return (
-        replacements_final_list,
-        replacements_list_for_localized_string,
-        replacements_list_for_2char,
+    return CompiledRuleSet.from_json_file(_json_path, key=rule_set_key, write_compiled=WRITE_COMPILED_RULE_SET)
+
+@st.cache_resource
+def get_uploaded_rule_set_cache() -> RuleSetCache:
+    """
+    アップロードされた置換用JSONから作った CompiledRuleSet のキャッシュ (サーバー全体で1つ)。
+    内容ハッシュごとに1回だけ作り、メモリの上限を超えたら最も長く使われていないものから捨てる。
+    """
+    return RuleSetCache(UPLOADED_RULE_SET_CACHE_BUDGET_BYTES)
+
+def fingerprint_uploaded_file(uploaded_file) -> str:
+    """
+    アップロードされたファイルの内容ハッシュ(sha256)を返す。
+    同じアップロード(file_id)については session_state に覚えておき、再実行のたびに計算し直さない。
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    fingerprints = st.session_state.setdefault("uploaded_json_fingerprints", {})
+    if file_id is not None and file_id in fingerprints:
+        return fingerprints[file_id]
+    fingerprint = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    if file_id is not None:
+        fingerprints.clear()  # 覚えておくのは直近のアップロードだけでよい
+        fingerprints[file_id] = fingerprint
+    return fingerprint
+
+def load_compiled_rule_set_from_upload(uploaded_file) -> CompiledRuleSet:
+    """
+    アップロードされた置換用JSONの CompiledRuleSet を返す。
+    同じ内容のJSONなら(別のセッションでアップロードされたものでも)、パースし直さずにキャッシュから返す。
+    """
+    rule_set_key = fingerprint_uploaded_file(uploaded_file)
+    return get_uploaded_rule_set_cache().get_or_build(
+        rule_set_key,
+        lambda: CompiledRuleSet.from_json_bytes(uploaded_file.getvalue(), key=rule_set_key)
     )
 
+@st.cache_resource
+def get_result_cache() -> ReplacementResultCache:
+    """
+    変換結果のキャッシュ (サーバー全体で1つ)。
+    (本文のハッシュ, 規則集合のハッシュ, 出力形式) ごとに、出力文字形式の変換前の結果を持つ。
+    """
+    return ReplacementResultCache(RESULT_CACHE_BUDGET_BYTES)
+
+@st.cache_resource
+def get_paragraph_cache() -> ReplacementResultCache:
+    """
+    段落ごとの変換結果のキャッシュ (サーバー全体で1つ)。
+    長い本文の一部だけを直して再送信したとき、変わっていない段落の結果を使い回す。
+    """
+    return ReplacementResultCache(PARAGRAPH_CACHE_BUDGET_BYTES)
+
+@st.cache_data
+def compute_rule_set_key(json_path: str, mtime_ns: int) -> str:
+    """
+    置換用JSONの内容ハッシュを返す (並列処理の常駐ワーカープールを使い回す判定に使う)。
+    mtime_ns はファイル更新時にキャッシュを無効化するためだけの引数。
+    """
+    return compute_file_sha256(json_path)
+
 #=================================================================
 # Streamlit ページの見た目設定
 # page_title: ブラウザタブに表示されるタイトル
@@ -100,20 +157,16 @@ with st.expander("샘플 JSON(치환용 JSON 파일)"):
         )
 
 #=================================================================
-# 置換ルールとして使うリスト3種を初期化しておく。
-# (JSONファイル読み込み後に代入される)
+# 置換ルール (JSONファイル読み込み後に代入される)
 #=================================================================
-replacements_final_list: List[Tuple[str, str, str]] = []
-replacements_list_for_localized_string: List[Tuple[str, str, str]] = []
-replacements_list_for_2char: List[Tuple[str, str, str]] = []
+compiled_rule_set: Optional[CompiledRuleSet] = None
 
 # JSONファイルの読み込み方を分岐
 if selected_option == "기본값 사용":
     default_json_path = "./Appの运行に使用する各类文件/最终的な替换用リスト(列表)(合并3个JSON文件).json"
     try:
-        (replacements_final_list,
-         replacements_list_for_localized_string,
-         replacements_list_for_2char) = load_replacements_lists(default_json_path)
+        rule_set_key = compute_rule_set_key(default_json_path, os.stat(default_json_path).st_mtime_ns)
+        compiled_rule_set = load_compiled_rule_set_from_file(rule_set_key, default_json_path)
         st.success("기본 JSON을 성공적으로 불러왔습니다.")
     except Exception as e:
         st.error(f"JSON 파일 불러오기에 실패했습니다: {e}")
@@ -122,13 +175,7 @@ else:
     uploaded_file = st.file_uploader("JSON 파일을 업로드하십시오 (합병된 3개 JSON 파일).json 형식", type="json")
     if uploaded_file is not None:
         try:
-            combined_data = json.load(uploaded_file)
-            replacements_final_list = combined_data.get(
-                "全域替换用のリスト(列表)型配列(replacements_final_list)", [])
-            replacements_list_for_localized_string = combined_data.get(
-                "局部文字替换用のリスト(列表)型配列(replacements_list_for_localized_string)", [])
-            replacements_list_for_2char = combined_data.get(
-                "二文字词根替换用のリスト(列表)型配列(replacements_list_for_2char)", [])
+            compiled_rule_set = load_compiled_rule_set_from_upload(uploaded_file)
             st.success("업로드한 JSON을 성공적으로 불러왔습니다.")
         except Exception as e:
             st.error(f"업로드한 JSON 파일 불러오기에 실패했습니다: {e}")
@@ -138,15 +185,10 @@ else:
         st.stop()
 
 #=================================================================
-# 2) placeholders (占位符) の読み込み
-#    %...% や @...@ で囲った文字列を守るために使用する文字列群を読み込む
+# 2) 置換用リスト
+#    (%...% や @...@ で囲った部分は置換の前に切り分けるので、占位符の表は使わない)
 #=================================================================
-placeholders_for_skipping_replacements: List[str] = import_placeholders(
-    './Appの运行に使用する各类文件/占位符(placeholders)_%1854%-%4934%_文字列替换skip用.txt'
-)
-placeholders_for_localized_replacement: List[str] = import_placeholders(
-    './Appの运行に使用する各类文件/占位符(placeholders)_@5134@-@9728@_局部文字列替换结果捕捉用.txt'
-)
+replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = compiled_rule_set.lists
 
 st.write("---")
 
@@ -162,6 +204,8 @@ with st.expander("병렬 처리 설정을 열기"):
     """)
     use_parallel = st.checkbox("병렬 처리를 사용하기", value=False)
     num_processes = st.number_input("동시 프로세스 수", min_value=2, max_value=4, value=4, step=1)
+    # 置換の段ごとの時間・一致数・バイト数を計測して表示する (並列処理ではワーカー分を合算)
+    measure_stages = st.checkbox("치환 단계별 소요 시간을 측정하기", value=False)
 
 st.write("---")
 
@@ -241,36 +285,59 @@ with st.form(key='profile_form'):
 
     if submit_btn:
         st.session_state["text0_value"] = text0
-
-        if use_parallel:
-            processed_text = parallel_process(
-                text=text0,
-                num_processes=num_processes,
-                placeholders_for_skipping_replacements=placeholders_for_skipping_replacements,
-                replacements_list_for_localized_string=replacements_list_for_localized_string,
-                placeholders_for_localized_replacement=placeholders_for_localized_replacement,
-                replacements_final_list=replacements_final_list,
-                replacements_list_for_2char=replacements_list_for_2char,
-                format_type=format_type
-            )
+        # 同じ本文・規則集合・出力形式の結果があればそれを使う (出力文字形式はこの後で変換する)
+        result_cache = get_result_cache()
+        result_key = replacement_result_key(text0, compiled_rule_set.key, format_type)
+        processed_text = result_cache.get(result_key)
+        if processed_text is not None:
+            st.info("같은 문장·설정의 치환 결과를 재사용했습니다.")
         else:
-            processed_text = orchestrate_comprehensive_esperanto_text_replacement(
-                text=text0,
-                placeholders_for_skipping_replacements=placeholders_for_skipping_replacements,
-                replacements_list_for_localized_string=replacements_list_for_localized_string,
-                placeholders_for_localized_replacement=placeholders_for_localized_replacement,
-                replacements_final_list=replacements_final_list,
-                replacements_list_for_2char=replacements_list_for_2char,
-                format_type=format_type
+            # 照合器を作り直さずに済むよう、この規則集合の照合器をキャッシュに登録し直す
+            compiled_rule_set.activate()
+
+            stage_stats = new_replacement_stage_stats() if measure_stages else None
+            if use_parallel:
+                def convert(text: str) -> str:
+                    return parallel_process(
+                        text=text,
+                        num_processes=num_processes,
+                        replacements_list_for_localized_string=replacements_list_for_localized_string,
+                        replacements_final_list=replacements_final_list,
+                        replacements_list_for_2char=replacements_list_for_2char,
+                        format_type=format_type,
+                        rule_set_key=compiled_rule_set.key,
+                        stage_stats=stage_stats
+                    )
+            else:
+                def convert(text: str) -> str:
+                    return orchestrate_comprehensive_esperanto_text_replacement(
+                        text=text,
+                        replacements_list_for_localized_string=replacements_list_for_localized_string,
+                        replacements_final_list=replacements_final_list,
+                        replacements_list_for_2char=replacements_list_for_2char,
+                        format_type=format_type,
+                        stage_stats=stage_stats
+                    )
+
+            # 前回から変わった段落だけを置換し直す
+            processed_text, reused_paragraphs = convert_paragraphs_incrementally(
+                text0, convert, get_paragraph_cache(), compiled_rule_set.key, format_type
             )
+            if reused_paragraphs:
+                st.info(f"변경되지 않은 {reused_paragraphs}개 단락의 치환 결과를 재사용했습니다.")
+            result_cache.put(result_key, processed_text)
+
+            if stage_stats is not None:
+                # 再利用した段落は置換していないので、計測結果には含まれない
+                with st.expander("치환 단계별 소요 시간 (병렬 처리 시에는 모든 프로세스의 합계)"):
+                    st.code("\n".join(format_replacement_stage_stats(stage_stats)))
 
         # letter_type에 따라 최종 에스페란토 문자 표기를 변환
+        # (x→字上符 と ^→字上符 のように2つの変換を、それぞれ1回の走査で行う)
         if letter_type == '상단 첨자':
-            processed_text = replace_esperanto_chars(processed_text, x_to_circumflex)
-            processed_text = replace_esperanto_chars(processed_text, hat_to_circumflex)
+            processed_text = convert_to_circumflex(processed_text)
         elif letter_type == '^ 형식':
-            processed_text = replace_esperanto_chars(processed_text, x_to_hat)
-            processed_text = replace_esperanto_chars(processed_text, circumflex_to_hat)
+            processed_text = convert_to_hat(processed_text)
 
         processed_text = apply_ruby_html_header_and_footer(processed_text, format_type)
 
@@ -0,0 +1,44 @@
+"""
+テスト共通の設定。
+各モジュールはパッケージではなくリポジトリ直下に置かれているので、リポジトリ直下を import パスに加える。
+テストでは同梱の大きなデータファイルは使わず、下記の小さな規則集合だけで確認する。
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+#=================================================================
+# 小さな規則集合 ((old, new, placeholder) のリスト。並び順が優先順位)
+#=================================================================
+SMALL_REPLACEMENTS_FINAL_LIST = [
+    ("amiko", "<AMIKO>", "$20001$"),
+    ("amik", "<AMIK>", "$20002$"),
+    (" kaj ", " <KAJ> ", " $20003$ "),
+    ("lern", "<LERN>", "$20004$"),
+    ("ist", "<IST>", "$20005$"),
+    ("ami", "<AMI>", "$20006$"),
+    ("ko", "<KO>", "$20007$"),
+]
+SMALL_REPLACEMENTS_LIST_FOR_2CHAR = [
+    ("$ad", "$<AD>", "$$13001$"),
+    ("al$", "<AL>$", "$13002$$"),
+    (" de ", " <DE> ", " $13003$ "),
+]
+SMALL_REPLACEMENTS_LIST_FOR_LOCALIZED_STRING = [
+    ("lern", "[LERN]", "@20374@"),
+    ("ist", "[IST]", "@20375@"),
+]
+
+
+@pytest.fixture
+def small_rule_set():
+    """(大域置換用, 局所置換用, 2文字語根用) の小さな規則集合"""
+    return (list(SMALL_REPLACEMENTS_FINAL_LIST),
+            list(SMALL_REPLACEMENTS_LIST_FOR_LOCALIZED_STRING),
+            list(SMALL_REPLACEMENTS_LIST_FOR_2CHAR))
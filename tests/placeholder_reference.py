@@ -0,0 +1,75 @@
+"""
+比較用: 多パターン照合器・1回走査の囲み記号処理を導入する前の置換処理 (placeholder 方式) を再現したもの。
+'%...%' と '@...@' を placeholder に置き換えてから、大域置換用のリストを1件ずつ
+「old in text → text.replace(old, placeholder)」で置換し、最後に placeholder を戻す。
+"""
+
+import re
+from typing import List, Tuple
+
+from esp_text_replacement_module import (
+    convert_to_circumflex,
+    replace_2char_roots_by_two_passes,
+    safe_replace,
+    unify_halfwidth_spaces
+)
+
+PERCENT_PATTERN = re.compile(r'%(.{1,50}?)%')
+AT_PATTERN = re.compile(r'@(.{1,18}?)@')
+
+# 以前は JSON と一緒に配布していた placeholder の一覧の代わり (テストには数件あれば足りる)
+SKIP_PLACEHOLDERS = [f"%{i}%" for i in range(1854, 1870)]
+LOCALIZED_PLACEHOLDERS = [f"@{i}@" for i in range(5134, 5150)]
+
+
+def _find_marked_strings(pattern: re.Pattern, text: str) -> List[str]:
+    matches = []
+    used_indices = set()
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if start not in used_indices and end - 2 not in used_indices:
+            matches.append(match.group(1))
+            used_indices.update(range(start, end))
+    return matches
+
+
+def placeholder_orchestrate(text: str,
+                            replacements_list_for_localized_string: List[Tuple[str, str, str]],
+                            replacements_final_list: List[Tuple[str, str, str]],
+                            replacements_list_for_2char: List[Tuple[str, str, str]],
+                            format_type: str) -> str:
+    """以前の orchestrate_comprehensive_esperanto_text_replacement と同じ手順で置換する。"""
+    text = unify_halfwidth_spaces(text)
+    text = convert_to_circumflex(text)
+
+    skipped = [[f"%{s}%", SKIP_PLACEHOLDERS[i]]
+               for i, s in enumerate(_find_marked_strings(PERCENT_PATTERN, text)) if i < len(SKIP_PLACEHOLDERS)]
+    skipped.sort(key=lambda x: len(x[0]), reverse=True)
+    for original, placeholder in skipped:
+        text = text.replace(original, placeholder)
+
+    localized = [[f"@{s}@", LOCALIZED_PLACEHOLDERS[i], safe_replace(s, replacements_list_for_localized_string)]
+                 for i, s in enumerate(_find_marked_strings(AT_PATTERN, text)) if i < len(LOCALIZED_PLACEHOLDERS)]
+    localized.sort(key=lambda x: len(x[0]), reverse=True)
+    for original, placeholder, _ in localized:
+        text = text.replace(original, placeholder)
+
+    valid_replacements = {}
+    for old, new, placeholder in replacements_final_list:
+        if old in text:
+            text = text.replace(old, placeholder)
+            valid_replacements[placeholder] = new
+    text = replace_2char_roots_by_two_passes(text, replacements_list_for_2char)
+    for placeholder, new in valid_replacements.items():
+        text = text.replace(placeholder, new)
+
+    for _, placeholder, replaced in localized:
+        text = text.replace(placeholder, replaced.replace("@", ""))
+    for original, placeholder in skipped:
+        text = text.replace(placeholder, original.replace("%", ""))
+
+    if "HTML" in format_type:
+        text = text.replace("\n", "<br>\n")
+        text = re.sub(r"   ", "&nbsp;&nbsp;&nbsp;", text)
+        text = re.sub(r"  ", "&nbsp;&nbsp;", text)
+    return text
@@ -0,0 +1,57 @@
+"""
+esp_replacement_json_make_module の文字幅表 (load_char_width_table) のテスト。
+JSON生成ページのように複数のスレッドが同時に表を作って保存しても、一時ファイルが残らず、
+保存できない場所でも表を返すことを確かめる。
+"""
+
+import json
+import os
+import threading
+
+from esp_replacement_json_make_module import (
+    DEFAULT_CHAR_WIDTH,
+    char_width_table_path,
+    load_char_width_table
+)
+
+
+def _write_width_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"a": 9, "ĉ": 10, "漢": 16}, f, ensure_ascii=False)
+
+
+def test_char_width_table_from_many_threads(tmp_path):
+    json_path = str(tmp_path / "widths.json")
+    _write_width_json(json_path)
+    table_path = char_width_table_path(json_path)
+    errors = []
+
+    def run():
+        try:
+            for _ in range(20):
+                # 保存済みの表を消して、毎回作り直して保存させる
+                try:
+                    os.remove(table_path)
+                except FileNotFoundError:
+                    pass
+                table = load_char_width_table(json_path)
+                assert (table[ord("a")], table[ord("ĉ")], table[ord("漢")]) == (9, 10, 16)
+        except Exception as e:  # スレッド内の失敗を本体に伝える
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == ["widths.json", "widths.widths"]
+
+
+def test_char_width_table_without_writable_location(tmp_path):
+    json_path = str(tmp_path / "widths.json")
+    _write_width_json(json_path)
+    table = load_char_width_table(json_path, table_path="/dev/null/widths.widths")
+    assert table[ord("a")] == 9
+    assert table[ord("b")] == DEFAULT_CHAR_WIDTH
+    assert os.listdir(tmp_path) == ["widths.json"]
@@ -0,0 +1,125 @@
+"""
+esp_replacement_binary_module のコンパイル済み置換ファイル (.esprules) のテスト。
+書き出し・読み込みの往復と、元JSONが変わった場合の鮮度判定、書き出しに失敗した場合の後始末を確かめる。
+"""
+
+import json
+import mmap
+import os
+
+import pytest
+
+from esp_replacement_binary_module import (
+    REPLACEMENT_LIST_KEYS,
+    CompiledRuleList,
+    CompiledRuleSet,
+    _read_header,
+    compile_replacements_json,
+    compiled_rule_set_path,
+    is_compiled_rule_set_fresh,
+    load_compiled_rule_set,
+    load_replacements_lists_preferring_compiled
+)
+
+
+def _write_rules_json(path, lists):
+    data = {key: [list(rule) for rule in rules] for key, rules in zip(REPLACEMENT_LIST_KEYS, lists)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _as_tuples(lists):
+    return [[tuple(rule) for rule in rules] for rules in lists]
+
+
+def _read_compiled_header(path):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, _ = _read_header(mm)
+    return header
+
+
+@pytest.fixture
+def rules_json(tmp_path, small_rule_set):
+    # JSON 内の並びは (大域置換用, 局所置換用, 2文字語根用) (REPLACEMENT_LIST_KEYS の順)
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    lists = (replacements_final_list + [("ĉevalo", "<ĈEVALO>", "$20008$")],
+             replacements_list_for_localized_string,
+             replacements_list_for_2char)
+    path = str(tmp_path / "rules.json")
+    _write_rules_json(path, lists)
+    return path, lists
+
+
+def test_compiled_rule_set_round_trip(rules_json):
+    json_path, lists = rules_json
+    compiled_path = compile_replacements_json(json_path)
+    assert compiled_path == compiled_rule_set_path(json_path)
+    loaded = load_compiled_rule_set(compiled_path, source_json_path=json_path)
+    assert _as_tuples(loaded) == _as_tuples(lists)
+    # 大域置換用のリストは添字・スライスでも元のリストと同じ規則を返す
+    assert loaded[0][-1] == ("ĉevalo", "<ĈEVALO>", "$20008$")
+    assert list(loaded[0][1:3]) == [tuple(rule) for rule in lists[0][1:3]]
+
+
+def test_compiled_rule_set_is_fresh_after_touch(rules_json):
+    json_path, _ = rules_json
+    compiled_path = compile_replacements_json(json_path)
+    # 更新時刻だけが変わった場合(コピーや git checkout 等)は sha256 で内容を照合して新しいとみなす
+    stat = os.stat(json_path)
+    os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert is_compiled_rule_set_fresh(_read_compiled_header(compiled_path), json_path)
+
+
+@pytest.mark.parametrize("same_size", [True, False])
+def test_compiled_rule_set_detects_stale_json(rules_json, same_size):
+    json_path, lists = rules_json
+    compiled_path = compile_replacements_json(json_path)
+    changed_final_list = list(lists[0])
+    # 同じサイズのまま内容だけ変える場合と、サイズも変わる場合
+    changed_final_list[0] = ("amiko", "<AMIKA>", "$20001$") if same_size else ("amiko", "<AMIKOJ>", "$20001$")
+    changed_lists = (changed_final_list, lists[1], lists[2])
+    old_size = os.path.getsize(json_path)
+    _write_rules_json(json_path, changed_lists)
+    assert (os.path.getsize(json_path) == old_size) == same_size
+
+    assert not is_compiled_rule_set_fresh(_read_compiled_header(compiled_path), json_path)
+    with pytest.raises(ValueError):
+        load_compiled_rule_set(compiled_path, source_json_path=json_path)
+    # 古いコンパイル済みファイルは無視して JSON を読む (refresh_compiled を指定しなければ作り直さない)
+    assert _as_tuples(load_replacements_lists_preferring_compiled(json_path)) == _as_tuples(changed_lists)
+    assert not is_compiled_rule_set_fresh(_read_compiled_header(compiled_path), json_path)
+    load_replacements_lists_preferring_compiled(json_path, refresh_compiled=True)
+    assert is_compiled_rule_set_fresh(_read_compiled_header(compiled_path), json_path)
+
+
+def test_compile_leaves_no_temp_file(rules_json, tmp_path, monkeypatch):
+    json_path, _ = rules_json
+    compile_replacements_json(json_path)
+    compile_replacements_json(json_path)
+    assert sorted(os.listdir(tmp_path)) == ["rules.esprules", "rules.json"]
+
+    # 置き換えに失敗しても一時ファイルを残さず、既存のコンパイル済みファイルもそのまま
+    def fail_replace(src, dst):
+        raise OSError("書き込み失敗")
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        compile_replacements_json(json_path)
+    assert sorted(os.listdir(tmp_path)) == ["rules.esprules", "rules.json"]
+    monkeypatch.undo()
+    assert load_compiled_rule_set(compiled_rule_set_path(json_path), source_json_path=json_path)
+
+
+def test_compiled_rule_set_from_json_file_writes_only_when_asked(rules_json):
+    json_path, lists = rules_json
+    compiled_path = compiled_rule_set_path(json_path)
+    # 既定ではデータの置き場所に .esprules を作らない
+    rule_set = CompiledRuleSet.from_json_file(json_path)
+    assert _as_tuples(rule_set.lists) == _as_tuples(lists)
+    assert not os.path.exists(compiled_path)
+    CompiledRuleSet.from_json_file(json_path, write_compiled=True)
+    assert is_compiled_rule_set_fresh(_read_compiled_header(compiled_path), json_path)
+    # 作っておいた .esprules は、書き込まない設定でも読み込みに使う
+    rule_set = CompiledRuleSet.from_json_file(json_path)
+    assert isinstance(rule_set.replacements_final_list, CompiledRuleList)
@@ -0,0 +1,90 @@
+"""
+esp_text_replacement_module の大域置換 (多パターン照合器) のテスト。
+find_prioritized_matches が、replacements_final_list の並び順に
+「old in text → text.replace(old, placeholder)」を繰り返した場合と同じ箇所を確定させることと、
+置換処理全体が以前の placeholder 方式 (placeholder_reference.py) と同じ結果になることを小さな規則集合で確かめる。
+"""
+
+import pytest
+
+from esp_text_replacement_module import (
+    find_prioritized_matches,
+    get_multi_pattern_matcher,
+    orchestrate_comprehensive_esperanto_text_replacement
+)
+from placeholder_reference import placeholder_orchestrate
+from text_samples import PLAIN_TEXT_ATOMS, random_texts
+
+FORMAT_TYPES_FOR_TEST = ['HTML格式', '括弧(号)格式', '替换后文字列のみ(仅)保留(简单替换)']
+
+
+def _sequential_replace_counts(text, replacements):
+    """「old in text → text.replace(old, placeholder)」を順に繰り返し、置換された (old, 出現回数) を返す。"""
+    counts = {}
+    for old, _, placeholder in replacements:
+        if old in text:
+            counts[old] = text.count(old)
+            text = text.replace(old, placeholder)
+    return counts
+
+
+def test_find_prioritized_matches_follows_list_order(small_rule_set):
+    replacements_final_list, _, _ = small_rule_set
+    matcher = get_multi_pattern_matcher(replacements_final_list)
+    text = "amikoj amiko lernisto ko kaj amiko"
+    matches = find_prioritized_matches(text, replacements_final_list, matcher)
+    found = [replacements_final_list[idx][0] for _, _, idx in matches]
+    # 'amiko' が 'amik'・'ami'・'ko' より先に確定し、その内部の 'ko' は拾わない
+    assert found == ["amiko", "amiko", "lern", "ist", "ko", " kaj ", "amiko"]
+    # ' kaj ' は前後のスペースを除いた部分を指す
+    assert [text[start:end] for start, end, _ in matches] == ["amiko", "amiko", "lern", "ist", "ko", "kaj", "amiko"]
+    assert matches == sorted(matches)
+
+
+def test_find_prioritized_matches_counts_match_sequential_replace(small_rule_set):
+    replacements_final_list, _, _ = small_rule_set
+    matcher = get_multi_pattern_matcher(replacements_final_list)
+    for text in random_texts(seed=1, count=500, atoms=PLAIN_TEXT_ATOMS):
+        matches = find_prioritized_matches(text, replacements_final_list, matcher)
+        counts = {}
+        for _, _, idx in matches:
+            old = replacements_final_list[idx][0]
+            counts[old] = counts.get(old, 0) + 1
+        assert counts == _sequential_replace_counts(text, replacements_final_list), text
+
+
+@pytest.mark.parametrize("format_type", FORMAT_TYPES_FOR_TEST)
+def test_orchestrate_matches_placeholder_path(small_rule_set, format_type):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    for text in random_texts(seed=2, count=2000):
+        expected = placeholder_orchestrate(text, replacements_list_for_localized_string,
+                                           replacements_final_list, replacements_list_for_2char, format_type)
+        actual = orchestrate_comprehensive_esperanto_text_replacement(
+            text, replacements_list_for_localized_string, replacements_final_list,
+            replacements_list_for_2char, format_type)
+        assert actual == expected, text
+
+
+def test_orchestrate_marked_spans(small_rule_set):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    text = "amiko %amiko% @lernisto@ kaj amiko"
+    result = orchestrate_comprehensive_esperanto_text_replacement(
+        text, replacements_list_for_localized_string, replacements_final_list,
+        replacements_list_for_2char, '括弧(号)格式')
+    # '%...%' の中は置換せず、'@...@' の中は局所置換用のリストだけで置換する
+    assert result == "<AMIKO> amiko [LERN][IST]o <KAJ> <AMIKO>"
+
+
+def test_orchestrate_documented_divergence_from_placeholder_path(small_rule_set):
+    # 以前の処理では、'%...%' を戻した後の文字列が別の '%...%' の placeholder の一部と重なると、
+    # placeholder の数字が本文に漏れていた ('%longa%de%' の後ろの '%' と次行の '%de%' の組)。
+    # 新しい処理は '%...%' を位置で扱うので、囲み記号を外しただけの文字列になる。
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    text = "%longa%de%\n%de%"
+    old_result = placeholder_orchestrate(text, replacements_list_for_localized_string,
+                                         replacements_final_list, replacements_list_for_2char, '括弧(号)格式')
+    new_result = orchestrate_comprehensive_esperanto_text_replacement(
+        text, replacements_list_for_localized_string, replacements_final_list,
+        replacements_list_for_2char, '括弧(号)格式')
+    assert "1855%" in old_result
+    assert new_result == "longade%\nde"
@@ -0,0 +1,104 @@
+"""
+esp_replacement_json_make_module の増分ビルドのテスト。
+前回のキャッシュを使い回して作った pre_replacements_dict_1 が、キャッシュ無しで作り直したものと一致することを確かめる。
+"""
+
+import json
+
+import pytest
+
+from esp_replacement_json_make_module import (
+    build_pre_replacements_dict_1_incremental,
+    find_changed_rule_olds
+)
+from esp_text_replacement_module import safe_replace
+
+# 語根の置換ルール (old, new, placeholder) と、語幹・品詞の一覧 (PEJVO の行に相当)
+ROOT_REPLACEMENTS = [
+    ("amik", "<ruby>amik<rt>友</rt></ruby>", "$10001$"),
+    ("lern", "<ruby>lern<rt>学</rt></ruby>", "$10002$"),
+    ("ist", "<ruby>ist<rt>者</rt></ruby>", "$10003$"),
+    ("hund", "<ruby>hund<rt>犬</rt></ruby>", "$10004$"),
+    ("dom", "<ruby>dom<rt>家</rt></ruby>", "$10005$"),
+    ("am", "<ruby>am<rt>愛</rt></ruby>", "$10006$"),
+]
+STEMS_WITH_PART_OF_SPEECH = [
+    ["amik", "名詞"], ["amik", "動詞"], ["lernist", "名詞"], ["hunddom", "名詞"],
+    ["amlern", "動詞"], ["dom", "名詞"], ["kat", "名詞"], ["a", "名詞"], ["amikdom"],
+]
+
+
+def _full_build(stems, replacements, tmp_path):
+    """キャッシュの無い状態から作った結果 (比較の基準)"""
+    result, stats = build_pre_replacements_dict_1_incremental(stems, replacements, str(tmp_path / "full.json"))
+    assert stats["reused"] == 0
+    return result
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    path = str(tmp_path / "cache.json")
+    build_pre_replacements_dict_1_incremental(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, path)
+    return path
+
+
+def test_full_build_matches_safe_replace(tmp_path):
+    result = _full_build(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, tmp_path)
+    # 1文字の語幹・品詞の無い行は除き、同じ語幹の品詞はカンマ区切りでまとめる
+    assert set(result) == {"amik", "lernist", "hunddom", "amlern", "dom", "kat"}
+    assert result["amik"] == [safe_replace("amik", ROOT_REPLACEMENTS), "名詞,動詞"]
+    for stem, (replaced, _) in result.items():
+        assert replaced == safe_replace(stem, ROOT_REPLACEMENTS)
+
+
+def test_incremental_build_without_changes_reuses_everything(cache_path, tmp_path):
+    result, stats = build_pre_replacements_dict_1_incremental(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, cache_path)
+    assert result == _full_build(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, tmp_path)
+    assert stats == {"reused": len(result), "recomputed": 0, "changed_roots": 0}
+
+
+@pytest.mark.parametrize("edit", ["change", "add", "delete", "reorder"])
+def test_incremental_build_matches_full_build_after_rule_edits(cache_path, tmp_path, edit):
+    replacements = list(ROOT_REPLACEMENTS)
+    if edit == "change":
+        replacements[3] = ("hund", "<ruby>hund<rt>狗</rt></ruby>", "$10004$")
+    elif edit == "add":
+        replacements.insert(0, ("kat", "<ruby>kat<rt>猫</rt></ruby>", "$10007$"))
+    elif edit == "delete":
+        del replacements[1]
+    else:
+        # 'am' を 'amik' より先に適用すると、'amik' を含む語幹の結果が変わる
+        replacements.insert(0, replacements.pop())
+    result, stats = build_pre_replacements_dict_1_incremental(STEMS_WITH_PART_OF_SPEECH, replacements, cache_path)
+    assert result == _full_build(STEMS_WITH_PART_OF_SPEECH, replacements, tmp_path)
+    assert 0 < stats["recomputed"] < len(result)
+    assert stats["reused"] + stats["recomputed"] == len(result)
+
+
+def test_incremental_build_matches_full_build_after_stem_edits(cache_path, tmp_path):
+    stems = [row for row in STEMS_WITH_PART_OF_SPEECH if row[0] != "lernist"]
+    stems[0] = ["amik", "形容詞"]
+    stems.append(["hundist", "名詞"])
+    result, stats = build_pre_replacements_dict_1_incremental(stems, ROOT_REPLACEMENTS, cache_path)
+    assert result == _full_build(stems, ROOT_REPLACEMENTS, tmp_path)
+    assert stats["recomputed"] == 1
+    # 一覧から消えた語幹はキャッシュにも残さない
+    with open(cache_path, encoding="utf-8") as f:
+        assert set(json.load(f)["stems"]) == set(result)
+
+
+def test_incremental_build_ignores_broken_cache(cache_path, tmp_path):
+    with open(cache_path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    result, stats = build_pre_replacements_dict_1_incremental(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, cache_path)
+    assert result == _full_build(STEMS_WITH_PART_OF_SPEECH, ROOT_REPLACEMENTS, tmp_path)
+    assert stats["reused"] == 0
+
+
+def test_find_changed_rule_olds():
+    previous = [["a", "A"], ["b", "B"], ["c", "C"], ["d", "D"]]
+    assert find_changed_rule_olds(previous, previous) == set()
+    assert find_changed_rule_olds(previous, [["a", "A"], ["b", "X"], ["c", "C"], ["d", "D"]]) == {"b"}
+    assert find_changed_rule_olds(previous, [["a", "A"], ["c", "C"], ["d", "D"], ["e", "E"]]) == {"b", "e"}
+    # 前後関係が入れ替わったものだけを含める ('d' を先頭に移しても 'a'〜'c' の順番は保たれる)
+    assert find_changed_rule_olds(previous, [["d", "D"], ["a", "A"], ["b", "B"], ["c", "C"]]) == {"d"}
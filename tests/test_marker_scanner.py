@@ -0,0 +1,70 @@
+"""
+esp_text_replacement_module の囲み記号 ('%...%' / '@...@') の走査のテスト。
+find_marker_spans が以前の正規表現と同じ箇所を拾い、split_marked_segments が閉じていない記号・
+隣り合う組・入れ子の組を正しく分けることを確かめる。
+"""
+
+import re
+
+import pytest
+
+from esp_text_replacement_module import (
+    LOCAL_MARKER,
+    LOCAL_SPAN_MAX_CHARS,
+    SKIP_MARKER,
+    SKIP_SPAN_COUNTED_CHARS,
+    SKIP_SPAN_MAX_CHARS,
+    find_marker_spans,
+    split_marked_segments
+)
+from text_samples import random_texts
+
+
+def _regex_marker_spans(text, marker, max_chars):
+    escaped = re.escape(marker)
+    return [m.span() for m in re.finditer(escaped + '(.{1,' + str(max_chars) + '}?)' + escaped, text)]
+
+
+@pytest.mark.parametrize("marker,max_chars", [(SKIP_MARKER, SKIP_SPAN_MAX_CHARS),
+                                              (LOCAL_MARKER, LOCAL_SPAN_MAX_CHARS),
+                                              ("%", 3)])
+def test_find_marker_spans_matches_regex(marker, max_chars):
+    atoms = [marker, marker * 2, "a", "bc", " ", "\n", "defgh"]
+    for text in random_texts(seed=3, count=2000, atoms=atoms):
+        assert find_marker_spans(text, marker, max_chars) == _regex_marker_spans(text, marker, max_chars), text
+
+
+def test_find_marker_spans_unclosed_and_adjacent():
+    # 閉じていない記号・空の '%%'・改行をまたぐ組は無視する
+    assert find_marker_spans("abc %def", "%", 50) == []
+    assert find_marker_spans("%%", "%", 50) == []
+    assert find_marker_spans("%a\nb%", "%", 50) == []
+    # 隣接する組はそれぞれ別の組になり、'%a%%b%' の真ん中の '%%' は1つの組の中身にはならない
+    assert find_marker_spans("%a%%b%", "%", 50) == [(0, 3), (3, 6)]
+    # 中身は1文字以上なので、'%%a%' は '%a%' ではなく中身が '%a' の1組になる (正規表現と同じ)
+    assert find_marker_spans("%%a%", "%", 50) == [(0, 4)] == _regex_marker_spans("%%a%", "%", 50)
+    # 上限の文字数を超える組は無視し、閉じる側の記号から探し直す
+    assert find_marker_spans("%abcd%e%", "%", 3) == [(5, 8)]
+
+
+def test_split_marked_segments_unclosed_and_adjacent():
+    assert split_marked_segments("abc %def") == [('plain', "abc %def")]
+    assert split_marked_segments("%a%%b%") == [('skip', "a"), ('skip', "b")]
+    assert split_marked_segments("@a@@b@") == [('local', "a"), ('local', "b")]
+    assert split_marked_segments("x%a%@b@y") == [('plain', "x"), ('skip', "a"), ('local', "b"), ('plain', "y")]
+    # '@...@' の中の '%...%' は 'local', 'skip', 'local' に分け、'%...%' の中の '@' は囲み記号とみなさない
+    assert split_marked_segments("@a%b%c@") == [('local', "a"), ('skip', "b"), ('local', "c")]
+    assert split_marked_segments("%a@b%c@") == [('skip', "a@b"), ('plain', "c@")]
+    assert split_marked_segments("@abc") == [('plain', "@abc")]
+
+
+def test_split_marked_segments_keeps_all_text():
+    for text in random_texts(seed=4, count=2000):
+        skip_spans = find_marker_spans(text, SKIP_MARKER, SKIP_SPAN_MAX_CHARS)
+        local_spans = find_marker_spans(text, LOCAL_MARKER, LOCAL_SPAN_MAX_CHARS, skip_spans, SKIP_SPAN_COUNTED_CHARS)
+        marker_positions = {pos for start, end in skip_spans + local_spans for pos in (start, end - 1)}
+        segments = split_marked_segments(text)
+        # 全ての文字列を順に繋ぐと、囲み記号を除いた text になる
+        assert "".join(s for _, s in segments) == "".join(
+            c for i, c in enumerate(text) if i not in marker_positions), text
+        assert sum(1 for kind, _ in segments if kind == 'skip') == len(skip_spans)
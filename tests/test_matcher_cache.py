@@ -0,0 +1,54 @@
+"""
+esp_text_replacement_module の照合器キャッシュのテスト。
+Streamlit のセッションのように複数のスレッドが別々のリストの照合器を同時に作っても、
+例外を出さずに正しい照合器を返し、キャッシュが上限を超えないことを確かめる。
+"""
+
+import threading
+
+import esp_text_replacement_module
+from esp_text_replacement_module import (
+    build_multi_pattern_matcher,
+    build_two_char_root_matcher,
+    get_multi_pattern_matcher,
+    get_two_char_root_matcher,
+    register_multi_pattern_matcher
+)
+
+
+def test_matcher_cache_from_many_threads(small_rule_set):
+    replacements_final_list, _, replacements_list_for_2char = small_rule_set
+    expected_final = build_multi_pattern_matcher(replacements_final_list)
+    expected_2char = build_two_char_root_matcher(replacements_list_for_2char)
+    errors = []
+
+    def run():
+        try:
+            for _ in range(300):
+                # 毎回別のリストオブジェクトにして、登録と破棄を繰り返させる
+                final_list = list(replacements_final_list)
+                two_char_list = list(replacements_list_for_2char)
+                assert get_multi_pattern_matcher(final_list) == expected_final
+                register_multi_pattern_matcher(final_list, expected_final)
+                assert get_two_char_root_matcher(two_char_list)["pattern"] == expected_2char["pattern"]
+        except Exception as e:  # スレッド内の失敗を本体に伝える
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(esp_text_replacement_module._MATCHER_CACHE) <= esp_text_replacement_module._MATCHER_CACHE_SIZE
+    assert len(esp_text_replacement_module._TWO_CHAR_MATCHER_CACHE) <= esp_text_replacement_module._MATCHER_CACHE_SIZE
+
+
+def test_matcher_cache_keeps_recently_used(small_rule_set):
+    replacements_final_list, _, _ = small_rule_set
+    kept = list(replacements_final_list)
+    matcher = get_multi_pattern_matcher(kept)
+    for _ in range(esp_text_replacement_module._MATCHER_CACHE_SIZE * 2):
+        # 他のリストを登録する間も使い続けているリストの照合器は作り直さない
+        get_multi_pattern_matcher(list(replacements_final_list))
+        assert get_multi_pattern_matcher(kept) is matcher
@@ -0,0 +1,61 @@
+"""
+esp_text_replacement_module の段落単位の増分置換 (convert_paragraphs_incrementally) のテスト。
+一部の段落だけを直して再送信した場合も、本文全体を一度に置換した結果と一致することを確かめる。
+"""
+
+import random
+
+from esp_text_replacement_module import (
+    ReplacementResultCache,
+    convert_paragraphs_incrementally,
+    orchestrate_comprehensive_esperanto_text_replacement,
+    replacement_result_key
+)
+from text_samples import random_texts
+
+
+def test_convert_paragraphs_incrementally_matches_full_conversion(small_rule_set):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    format_type = 'HTML格式'
+
+    def convert(text):
+        return orchestrate_comprehensive_esperanto_text_replacement(
+            text, replacements_list_for_localized_string, replacements_final_list,
+            replacements_list_for_2char, format_type)
+
+    cache = ReplacementResultCache()
+    paragraphs = ["amiko kaj lernisto\n", "%amiko% de amiko\n", "@lernisto@ ad al\n", "\n", "ko  ami"]
+    text = "".join(paragraphs)
+    result, reused = convert_paragraphs_incrementally(text, convert, cache, "rules", format_type)
+    assert result == convert(text)
+    assert reused == 0
+
+    # 1段落だけ直して再送信すると、残りの段落は結果を使い回す
+    edited = "".join(paragraphs[:2] + ["@lernisto@ de amikoj\n"] + paragraphs[3:])
+    result, reused = convert_paragraphs_incrementally(edited, convert, cache, "rules", format_type)
+    assert result == convert(edited)
+    assert reused == len(paragraphs) - 1
+
+    # 規則集合のキーや出力形式が違えば使い回さない
+    _, reused = convert_paragraphs_incrementally(edited, convert, cache, "other-rules", format_type)
+    assert reused == 0
+    assert replacement_result_key(edited, "rules", format_type) != replacement_result_key(edited, "rules", '括弧(号)格式')
+
+
+def test_convert_paragraphs_incrementally_random_edits(small_rule_set):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    format_type = '括弧(号)格式'
+
+    def convert(text):
+        return orchestrate_comprehensive_esperanto_text_replacement(
+            text, replacements_list_for_localized_string, replacements_final_list,
+            replacements_list_for_2char, format_type)
+
+    cache = ReplacementResultCache(budget_bytes=3 * 200)
+    rng = random.Random(5)
+    paragraphs = random_texts(seed=6, count=12)
+    for _ in range(50):
+        paragraphs[rng.randrange(len(paragraphs))] = random_texts(seed=rng.random(), count=1)[0]
+        text = "\n".join(paragraphs)
+        result, _ = convert_paragraphs_incrementally(text, convert, cache, "rules", format_type)
+        assert result == convert(text)
@@ -0,0 +1,32 @@
+"""
+esp_text_replacement_module の置換結果のキャッシュ (ReplacementResultCache) のテスト。
+結果の大きさの合計が上限を超えたら最も長く使われていないものから捨て、上限より大きい結果は保持しないことを確かめる。
+"""
+
+from esp_text_replacement_module import ReplacementResultCache
+
+
+def test_replacement_result_cache_evicts_least_recently_used():
+    cache = ReplacementResultCache(budget_bytes=3 * 10)
+    cache.put(("a", "r", "f"), "aaaa")
+    cache.put(("b", "r", "f"), "bbbb")
+    assert cache.get(("a", "r", "f")) == "aaaa"  # 'a' を最近使ったものにする
+    cache.put(("c", "r", "f"), "cccc")
+    assert cache.get(("b", "r", "f")) is None
+    assert cache.get(("a", "r", "f")) == "aaaa"
+    assert cache.get(("c", "r", "f")) == "cccc"
+    assert len(cache) == 2
+    assert cache.total_nbytes == 3 * 8
+    assert cache.stats["evictions"] == 1
+
+
+def test_replacement_result_cache_skips_results_over_budget():
+    cache = ReplacementResultCache(budget_bytes=3 * 4)
+    cache.put(("a", "r", "f"), "aaaa")
+    cache.put(("b", "r", "f"), "bbbbb")
+    assert cache.get(("b", "r", "f")) is None
+    assert cache.get(("a", "r", "f")) == "aaaa"
+    # 同じキーを上書きした場合は古い結果の分を差し引く
+    cache.put(("a", "r", "f"), "aa")
+    assert len(cache) == 1
+    assert cache.total_nbytes == 3 * 2
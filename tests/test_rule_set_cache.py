@@ -0,0 +1,58 @@
+"""
+esp_replacement_binary_module の規則集合のキャッシュ (RuleSetCache) のテスト。
+内容ハッシュごとの CompiledRuleSet を、メモリ上限を超えたら最も長く使われていないものから捨てることを確かめる。
+"""
+
+import json
+
+from esp_replacement_binary_module import (
+    REPLACEMENT_LIST_KEYS,
+    CompiledRuleSet,
+    RuleSetCache
+)
+
+
+def _rule_set_bytes(small_rule_set, extra_old):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    data = {
+        REPLACEMENT_LIST_KEYS[0]: [list(rule) for rule in replacements_final_list] + [[extra_old, f"<{extra_old}>", "$29999$"]],
+        REPLACEMENT_LIST_KEYS[1]: [list(rule) for rule in replacements_list_for_localized_string],
+        REPLACEMENT_LIST_KEYS[2]: [list(rule) for rule in replacements_list_for_2char],
+    }
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def test_rule_set_cache_evicts_least_recently_used(small_rule_set):
+    rule_sets = [CompiledRuleSet.from_json_bytes(_rule_set_bytes(small_rule_set, extra_old))
+                 for extra_old in ("kato", "muso", "bovo")]
+    assert len({rule_set.key for rule_set in rule_sets}) == 3
+    # 2件分だけ入る上限
+    cache = RuleSetCache(budget_bytes=rule_sets[0].estimated_nbytes + rule_sets[1].estimated_nbytes)
+    cache.put(rule_sets[0])
+    cache.put(rule_sets[1])
+    assert cache.get(rule_sets[0].key) is rule_sets[0]  # 1件目を最近使ったものにする
+    cache.put(rule_sets[2])
+    assert cache.get(rule_sets[1].key) is None
+    assert cache.get(rule_sets[0].key) is rule_sets[0]
+    assert cache.get(rule_sets[2].key) is rule_sets[2]
+    assert len(cache) == 2
+    assert cache.stats["evictions"] == 1
+    assert cache.total_nbytes == rule_sets[0].estimated_nbytes + rule_sets[2].estimated_nbytes
+
+
+def test_rule_set_cache_keeps_latest_entry_over_budget(small_rule_set):
+    data = _rule_set_bytes(small_rule_set, "kato")
+    cache = RuleSetCache(budget_bytes=1)
+    built = []
+
+    def build():
+        built.append(1)
+        return CompiledRuleSet.from_json_bytes(data)
+
+    key = CompiledRuleSet.from_json_bytes(data).key
+    rule_set = cache.get_or_build(key, build)
+    # 上限を超えていても直近の1件は残し、2回目は作り直さない
+    assert cache.get_or_build(key, build) is rule_set
+    assert len(built) == 1
+    assert len(cache) == 1
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
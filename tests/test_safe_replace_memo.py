@@ -0,0 +1,32 @@
+"""
+esp_replacement_json_make_module の safe_replace のメモのテスト。
+メモが上限を超えたら最も長く使われていない結果から捨てられ、結果は safe_replace と一致することを確かめる。
+"""
+
+import esp_replacement_json_make_module
+from esp_replacement_json_make_module import (
+    build_memoized_safe_replacer,
+    clear_safe_replace_memo,
+    get_safe_replace_memo_stats
+)
+from esp_text_replacement_module import safe_replace
+
+ROOT_REPLACEMENTS = [
+    ("amik", "<ruby>amik<rt>友</rt></ruby>", "$10001$"),
+    ("lern", "<ruby>lern<rt>学</rt></ruby>", "$10002$"),
+    ("ist", "<ruby>ist<rt>者</rt></ruby>", "$10003$"),
+    ("hund", "<ruby>hund<rt>犬</rt></ruby>", "$10004$"),
+    ("dom", "<ruby>dom<rt>家</rt></ruby>", "$10005$"),
+]
+
+
+def test_memoized_safe_replacer_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(esp_replacement_json_make_module, "SAFE_REPLACE_MEMO_SIZE", 2)
+    clear_safe_replace_memo()
+    replace = build_memoized_safe_replacer(ROOT_REPLACEMENTS)
+    for stem in ["amik", "lernist", "amik", "hunddom", "amik", "lernist"]:
+        assert replace(stem) == safe_replace(stem, ROOT_REPLACEMENTS)
+    # 'lernist' は 'hunddom' を覚えた時点で捨てられ、最後にもう一度計算し直す
+    stats = get_safe_replace_memo_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 4, 2, 2)
+    clear_safe_replace_memo()
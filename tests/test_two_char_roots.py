@@ -0,0 +1,28 @@
+"""
+esp_text_replacement_module の2文字語根の置換 (1回の走査で領域を拾う照合器) のテスト。
+領域ごとのメモを小さく制限しても、以前の placeholder 方式と同じ結果になり、メモが上限を超えないことを確かめる。
+"""
+
+import esp_text_replacement_module
+from esp_text_replacement_module import (
+    get_two_char_root_matcher,
+    orchestrate_comprehensive_esperanto_text_replacement
+)
+from placeholder_reference import placeholder_orchestrate
+from text_samples import random_texts
+
+
+def test_two_char_root_memo_is_bounded(small_rule_set, monkeypatch):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    monkeypatch.setattr(esp_text_replacement_module, "TWO_CHAR_ROOT_MEMO_SIZE", 2)
+    memo = get_two_char_root_matcher(replacements_list_for_2char)["memo"]
+    memo.clear()
+    for text in random_texts(seed=7, count=300):
+        expected = placeholder_orchestrate(text, replacements_list_for_localized_string,
+                                           replacements_final_list, replacements_list_for_2char, 'HTML格式')
+        actual = orchestrate_comprehensive_esperanto_text_replacement(
+            text, replacements_list_for_localized_string, replacements_final_list,
+            replacements_list_for_2char, 'HTML格式')
+        assert actual == expected, text
+        assert len(memo) <= 2
+    memo.clear()
@@ -0,0 +1,68 @@
+"""
+esp_text_replacement_module の常駐ワーカープールのテスト。
+Streamlit のように複数のスレッドが別々の規則集合で parallel_process を呼んでも、
+使用中のプールが閉じられず、結果が1プロセスで置換した場合と一致することを確かめる。
+"""
+
+import threading
+
+import pytest
+
+import esp_text_replacement_module
+from esp_text_replacement_module import (
+    orchestrate_comprehensive_esperanto_text_replacement,
+    parallel_process,
+    parallel_process_stream,
+    shutdown_replacement_worker_pool
+)
+
+TEXT = "\n".join(["amiko kaj lernisto de %amiko% @lernisto@ ad al amikoj"] * 40) + "\n"
+
+
+@pytest.fixture
+def two_rule_sets(small_rule_set):
+    replacements_final_list, replacements_list_for_localized_string, replacements_list_for_2char = small_rule_set
+    other_final_list = [(old, new.lower(), placeholder) for old, new, placeholder in replacements_final_list]
+    return {
+        "rules-a": (replacements_list_for_localized_string, replacements_final_list, replacements_list_for_2char),
+        "rules-b": (replacements_list_for_localized_string, other_final_list, replacements_list_for_2char),
+    }
+
+
+@pytest.fixture(autouse=True)
+def _shutdown_pools():
+    yield
+    shutdown_replacement_worker_pool()
+
+
+@pytest.mark.parametrize("pool_cache_size", [1, 2])
+def test_parallel_process_from_two_threads_with_different_rule_sets(two_rule_sets, monkeypatch, pool_cache_size):
+    # pool_cache_size=1 では、もう一方のスレッドが使用中のプールを閉じようとする状況になる
+    monkeypatch.setattr(esp_text_replacement_module, "REPLACEMENT_POOL_CACHE_SIZE", pool_cache_size)
+    expected = {key: orchestrate_comprehensive_esperanto_text_replacement(TEXT, *rules, 'HTML格式')
+                for key, rules in two_rule_sets.items()}
+    assert expected["rules-a"] != expected["rules-b"]
+    errors = []
+
+    def run(key):
+        try:
+            for _ in range(5):
+                result = parallel_process(TEXT, 2, *two_rule_sets[key], 'HTML格式', rule_set_key=key)
+                assert result == expected[key]
+                streamed = ''.join(parallel_process_stream(
+                    TEXT.splitlines(keepends=True), 2, *two_rule_sets[key], 'HTML格式', rule_set_key=key))
+                assert streamed == expected[key]
+        except Exception as e:  # スレッド内の失敗を本体に伝える
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(key,)) for key in two_rule_sets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    # 使い終わったプールは上限の数まで閉じられ、使用中のものは残っていない
+    pools = esp_text_replacement_module._REPLACEMENT_POOLS
+    assert len(pools) <= pool_cache_size
+    assert all(entry["users"] == 0 for entry in pools.values())
@@ -0,0 +1,20 @@
+"""
+テスト用の文章を乱数で作る補助関数。
+置換対象の語根・囲み記号・改行などの部品を組み合わせるので、短い文章でも規則どうしの重なりや
+囲み記号の組み合わせが多く現れる。
+"""
+
+import random
+from typing import List
+
+# 置換対象の語根・囲み記号・改行などを組み合わせて乱数で文章を作るための部品
+TEXT_ATOMS = ["amiko", "amik", "lern", "ist", "ad", "al", " kaj ", " de ", "o", " ", "\n",
+              "x", "cx", "ĉ", "de", "a", "%", "@"]
+# 囲み記号を含まない部品
+PLAIN_TEXT_ATOMS = [atom for atom in TEXT_ATOMS if atom not in ("%", "@")]
+
+
+def random_texts(seed, count: int, atoms: List[str] = TEXT_ATOMS) -> List[str]:
+    """atoms を1〜16個ずつ繋いだ文章を count 個返す (seed が同じなら同じ文章になる)。"""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(atoms) for _ in range(rng.randint(1, 16))) for _ in range(count)]